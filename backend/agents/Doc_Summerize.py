@@ -1,9 +1,22 @@
 import os
+import sys
+import contextvars
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 from langchain_community.document_loaders import PyPDFLoader
 
+# Sibling agent modules are imported flat (like medical_workflow does)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from report_compression import compress_report, count_tokens, TOKEN_BUDGET, BOILERPLATE_PAGE_SHARE
+from lab_extractor import structured_report_input, MIN_ROWS, MIN_ROW_SHARE
+
+# Project root, for LLM usage accounting shared with the API (backend/utils/usage.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.usage import record_crew_usage, record_message_usage
+
 # Load environment variables
 load_dotenv()
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
@@ -13,15 +26,40 @@ if not os.environ['OPENAI_API_KEY']:
 # Define the LLM
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
 
+# Version of the summarization prompts and model; bump it whenever either changes so
+# cached summaries (see summary_cache.py) produced by the old ones are no longer used
+SUMMARY_PROMPT_VERSION = "gpt-4o-mini/3"
+
+# Reports above this many tokens are summarized map-reduce instead of in one prompt
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_MAP_REDUCE_TOKENS", "6000"))
+# Target size of one page group in the map step
+MAP_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+# Page groups summarized concurrently
+MAP_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "8"))
+# Lab panels are summarized from a locally parsed table (see lab_extractor.py)
+LAB_FAST_PATH = os.getenv("SUMMARY_LAB_FAST_PATH", "true").lower() == "true"
+
+# Settings that change what prepare_report_input hands to the summarizer; part of the
+# summary cache key, so summaries of differently prepared input are not reused
+SUMMARY_INPUT_SETTINGS = (
+    f"budget={TOKEN_BUDGET};boilerplate={BOILERPLATE_PAGE_SHARE};"
+    f"map_reduce={MAP_REDUCE_THRESHOLD_TOKENS};chunk={MAP_CHUNK_TOKENS};"
+    f"lab={LAB_FAST_PATH}/{MIN_ROWS}/{MIN_ROW_SHARE}"
+)
+
 # Custom Function: PDF Text Extraction
+def read_pdf_pages(file_path: str) -> list:
+    """Text of each page of a PDF; raises if the file cannot be read"""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} does not exist.")
+    loader = PyPDFLoader(file_path)
+    return [doc.page_content for doc in loader.load()]
+
 def read_pdf(file_path: str) -> str:
     if not os.path.exists(file_path):
         return f"Error: File {file_path} does not exist."
     try:
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        full_text = "\n".join([doc.page_content for doc in documents])
-        return full_text
+        return "\n".join(read_pdf_pages(file_path))
     except Exception as e:
         return f"Error loading PDF: {str(e)}"
 
@@ -85,6 +123,115 @@ crew = Crew(
     verbose=True
 )
 
+# Map step prompt: factual notes for one page group, merged later by the crew
+MAP_PROMPT = (
+    "You are reading pages {pages} of a longer medical report. Extract the facts from this part only, "
+    "as short bullet points under these headings:\n"
+    "Symptoms and Tests: (keep test names, values, units and reference ranges exactly)\n"
+    "Diagnosis:\n"
+    "Treatments:\n"
+    "Recommendations:\n"
+    "Write 'None' under a heading with nothing in this part. Do not assess the patient or add a disclaimer.\n\n"
+    "Report pages {pages}:\n{text}"
+)
+
+def split_page_groups(pages: list, max_tokens: int = MAP_CHUNK_TOKENS) -> list:
+    """Group consecutive pages into [(first_page, last_page, text)] of at most about max_tokens each"""
+    groups = []
+    current, current_tokens, first = [], 0, 1
+    for number, page in enumerate(pages, start=1):
+        page_tokens = count_tokens(page)
+        if current and current_tokens + page_tokens > max_tokens:
+            groups.append((first, number - 1, "\n".join(current)))
+            current, current_tokens = [], 0
+        if not current:
+            first = number
+        # A single oversized page is cut into pieces of roughly max_tokens
+        if page_tokens > max_tokens:
+            step = max(1, len(page) * max_tokens // page_tokens)
+            for start in range(0, len(page), step):
+                groups.append((number, number, page[start:start + step]))
+            continue
+        current.append(page)
+        current_tokens += page_tokens
+    if current:
+        groups.append((first, len(pages), "\n".join(current)))
+    return groups
+
+def text_to_pages(text: str) -> list:
+    """Pseudo-pages for pasted text (paragraphs), so it can be grouped like a PDF"""
+    return [p for p in text.split("\n\n") if p.strip()] or [text]
+
+def summarize_page_group(group) -> str:
+    first, last, text = group
+    pages = str(first) if first == last else f"{first}-{last}"
+    response = llm.invoke(MAP_PROMPT.format(pages=pages, text=text))
+    record_message_usage("summary_map", response)
+    return f"Notes from pages {pages}:\n{response.content.strip()}"
+
+def map_page_groups(groups: list) -> list:
+    """Summarize page groups concurrently, keeping report order"""
+    if len(groups) == 1:
+        return [summarize_page_group(groups[0])]
+    # One context copy per group so usage is recorded to the caller's request
+    contexts = [contextvars.copy_context() for _ in groups]
+    with ThreadPoolExecutor(max_workers=min(MAP_MAX_WORKERS, len(groups)), thread_name_prefix="summarize") as pool:
+        return list(pool.map(lambda ctx, group: ctx.run(summarize_page_group, group), contexts, groups))
+
+def run_summary_crew(text: str) -> str:
+    """Run the seven-section summarization task on text"""
+    # A copy per call: concurrent requests neither share task prompts nor token counters
+    run = crew.copy()
+    result = run.kickoff(inputs={"pdf_text": text})
+    record_crew_usage("summary", run, result)
+    task_result = result.tasks_output[0]
+    return getattr(task_result, "content", getattr(task_result, "raw", str(task_result)))
+
+def prepare_report_input(text: str = None, pages: list = None) -> str:
+    """Text the final summarization prompt receives for a report.
+
+    The report is first compressed locally (see report_compression.py); reports
+    that are map-reduced only lose their boilerplate, so no content is cut. Lab
+    panels become a compact table of parsed rows with out-of-range values
+    flagged (see lab_extractor.py). Other short reports are returned as they are. Longer ones are split into page groups
+    that are summarized in parallel (map), and their notes are returned for the
+    final prompt to merge (reduce), so wall-clock time follows the slowest group
+    rather than the report length.
+    """
+    pages = pages if pages is not None else text_to_pages(text or "")
+    pages, compression = compress_report(pages, max_tokens=MAP_REDUCE_THRESHOLD_TOKENS)
+    print(
+        f"Report compression: {compression['original_tokens']} -> {compression['compressed_tokens']} tokens "
+        f"({compression['compression_ratio']}x) in {compression['seconds']}s"
+    )
+    if LAB_FAST_PATH:
+        table, lab = structured_report_input(pages)
+        if table is not None:
+            print(
+                f"Lab fast path: {lab['lab_rows']} row(s), {lab['out_of_range']} out of range, "
+                f"{count_tokens(table)} tokens in {lab['seconds']}s"
+            )
+            return table
+
+    full_text = "\n".join(pages)
+    if count_tokens(full_text) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        return full_text
+
+    groups = split_page_groups(pages)
+    print(f"Map-reduce summarization: {len(pages)} page(s) in {len(groups)} group(s)")
+    notes = map_page_groups(groups)
+    # Very long reports can produce more notes than fit one prompt; collapse them again
+    while len(notes) > 1 and count_tokens("\n\n".join(notes)) > MAP_REDUCE_THRESHOLD_TOKENS:
+        groups = split_page_groups(notes)
+        if len(groups) >= len(notes):
+            break
+        notes = map_page_groups(groups)
+    return "\n\n".join(notes)
+
+def summarize_report(text: str = None, pages: list = None) -> str:
+    """Summarize a report into the fixed seven-section structure"""
+    return run_summary_crew(prepare_report_input(text=text, pages=pages))
+
 
 if __name__ == "__main__":
     report_file_path = "D:\\Hospital-AI-Support\\Agentic-AI-Based-Customer-Support-System\\backend\\medi.pdf" 
@@ -94,7 +241,7 @@ if __name__ == "__main__":
         print(pdf_text) 
     else:
         try:
-            result = crew.kickoff(inputs={"pdf_text": pdf_text})
+            result = summarize_report(pages=read_pdf_pages(report_file_path))
             print(result)
         except Exception as e:
             print(f"Error running crew: {str(e)}")
\ No newline at end of file
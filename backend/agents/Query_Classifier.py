@@ -1,9 +1,15 @@
 import os
+import sys
 import json
+from pathlib import Path
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+# Project root, for LLM usage accounting shared with the API (backend/utils/usage.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.usage import record_crew_usage
+
 # Setup
 load_dotenv()
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
@@ -129,10 +135,13 @@ class QueryClassifierAgent:
         if chat_history is None:
             chat_history = []
             
-        result = self.crew.kickoff(inputs={
+        # A copy per call: concurrent requests neither share task prompts nor token counters
+        crew = self.crew.copy()
+        result = crew.kickoff(inputs={
             "patient_query": patient_query,
             "chat_history": chat_history
         })
+        record_crew_usage("classifier", crew, result)
         
         # Extract the agent's response
         task_result = result.tasks_output[0]
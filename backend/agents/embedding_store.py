@@ -0,0 +1,130 @@
+# ---------------------------------------------------------------
+# Content-addressed embedding store
+# ---------------------------------------------------------------
+# - Keyed by (embedding model, SHA-256 of the chunk text)
+# - Shared across documents and re-ingests: boilerplate that repeats
+#   between PDFs, or survives a chunking change, is embedded once
+# - Backed by SQLite next to the Chroma store
+# ---------------------------------------
+
+import os
+import sqlite3
+import hashlib
+import threading
+from array import array
+from pathlib import Path
+
+# Persist under backend/chroma_mediconnect regardless of CWD
+PERSIST_DIR = str(Path(__file__).resolve().parents[1] / "chroma_mediconnect")
+STORE_FILE = "embedding_store.sqlite3"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def text_hash(text):
+    """SHA-256 of a chunk text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    """SQLite-backed map of (model, text hash) -> embedding vector."""
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_sha256 TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_sha256))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """Return {hash: vector} for the hashes present in the store."""
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_sha256, vector FROM embeddings WHERE model = ? AND text_sha256 IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model, vectors_by_hash):
+        """Store {hash: vector}; existing entries are left untouched."""
+        rows = [
+            (model, h, len(vec), array("f", vec).tobytes())
+            for h, vec in vectors_by_hash.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_sha256, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def count(self, model=None):
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+def get_embedding_store(persist_dir=PERSIST_DIR):
+    """Process-wide store for persist_dir."""
+    with _stores_lock:
+        store = _stores.get(persist_dir)
+        if store is None:
+            os.makedirs(persist_dir, exist_ok=True)
+            store = EmbeddingStore(os.path.join(persist_dir, STORE_FILE))
+            _stores[persist_dir] = store
+        return store
+
+def model_name(embeddings):
+    """Identify the embedding model so vectors from different models never mix."""
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+class CachedEmbeddings:
+    """Wraps an embeddings client so only texts missing from the store are sent to the model."""
+    def __init__(self, embeddings, store):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = model_name(embeddings)
+
+    def embed_with_stats(self, texts):
+        """Embed texts, returning (vectors, stats) where stats include the dedup ratio."""
+        hashes = [text_hash(t) for t in texts]
+        unique = dict(zip(hashes, texts))
+        vectors_by_hash = self.store.get_many(self.model, unique.keys())
+        hits = len(vectors_by_hash)
+
+        missing = [h for h in unique if h not in vectors_by_hash]
+        if missing:
+            fresh = self.embeddings.embed_documents([unique[h] for h in missing])
+            new_vectors = dict(zip(missing, fresh))
+            self.store.put_many(self.model, new_vectors)
+            vectors_by_hash.update(new_vectors)
+
+        stats = {
+            "model": self.model,
+            "chunks": len(texts),
+            "unique_texts": len(unique),
+            "cache_hits": hits,
+            "embedded": len(missing),
+            # Share of chunks that did not need an embedding call
+            "dedup_ratio": round(1 - len(missing) / len(texts), 3) if texts else 0.0,
+        }
+        return [vectors_by_hash[h] for h in hashes], stats
+
+    def embed_documents(self, texts):
+        return self.embed_with_stats(texts)[0]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -2,11 +2,17 @@
 # Provides context-aware questions without repetition
 
 import os
+import sys
 import json
+from pathlib import Path
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+# Project root, for LLM usage accounting shared with the API (backend/utils/usage.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.usage import record_crew_usage
+
 # Setup environment
 load_dotenv()
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
@@ -103,12 +109,15 @@ class FollowUpAgent:
         if chat_history is None:
             chat_history = []
             
-        result = self.crew.kickoff(inputs={
+        # A copy per call: concurrent requests neither share task prompts nor token counters
+        crew = self.crew.copy()
+        result = crew.kickoff(inputs={
             "solution": solution,
             "original_query": original_query,
             "classification": classification,
             "chat_history": chat_history
         })
+        record_crew_usage("followup", crew, result)
         
         # Extract the agent's response
         task_result = result.tasks_output[0]
@@ -0,0 +1,98 @@
+# Fused Document Agent - summary, guidance and follow-up in one generation
+# Replaces the Doc_Summarize → Solution_Agent → Follow-up_Agent chain for documents
+# with a single structured LLM call; the workflow falls back to the chain when the
+# output cannot be parsed
+
+import os
+import re
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+# Project root, for LLM usage accounting shared with the API (backend/utils/usage.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.usage import record_message_usage
+
+# Setup environment
+load_dotenv()
+os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
+
+llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+
+# The seven summary sections, as produced by Doc_Summerize
+SUMMARY_SECTIONS = (
+    "Symptoms and Tests",
+    "Diagnosis",
+    "Treatments",
+    "Recommendations",
+    "Health Status Assessment",
+    "Doctor Recommendation",
+    "Disclaimer",
+)
+
+# Version of FUSED_PROMPT and its model; bump it whenever either changes so cached
+# summaries produced by the old ones are no longer used (see summary_cache.py)
+FUSED_PROMPT_VERSION = "gpt-4o-mini/1"
+
+FUSED_PROMPT = (
+    "You are MediConnect Medical Center's customer support assistant. A patient shared the medical report below.\n"
+    "Chat history: {chat_history}\n"
+    "Conversation stage: {conversation_stage}\n\n"
+    "Medical report:\n{report}\n\n"
+    "Write exactly three parts, each starting with its marker line, and nothing else:\n\n"
+    "### SUMMARY\n"
+    "A structured summary with these sections exactly, each on its own line followed by its content:\n"
+    + "".join(f"{section}:\n" for section in SUMMARY_SECTIONS) +
+    "Rules for the summary:\n"
+    "- If no Treatments are mentioned and the health is good, write 'None reported'.\n"
+    "- Health Status Assessment says whether the report suggests the patient is stable, improving or concerning.\n"
+    "- Doctor Recommendation is always written by you based on the health status.\n"
+    "- The Disclaimer strongly states that this summary may contain errors and the patient must consult a doctor.\n\n"
+    "### GUIDANCE\n"
+    "One brief, empathetic conversational reply to the patient about what the report means for them, as the "
+    "medical center's receptionist. Do not repeat the summary, do not repeat anything from the chat history, and "
+    "do not invent doctors, schedules or locations. Recommend consulting a doctor when the report shows issues.\n\n"
+    "### FOLLOW_UP\n"
+    "ONE simple, direct follow-up question of 10-15 words that is not already asked in the chat history. "
+    "Avoid generic questions like 'Is there anything else I can help you with?'."
+)
+
+MARKER = re.compile(r"^\s*#{2,4}\s*(SUMMARY|GUIDANCE|FOLLOW[_ -]?UP)\s*:?\s*$", re.IGNORECASE | re.MULTILINE)
+
+class FusedParseError(ValueError):
+    """The fused generation did not contain all required parts"""
+
+def parse_fused_response(text: str) -> dict:
+    """Split a fused generation into {"summary", "guidance", "followup"}"""
+    parts = {}
+    matches = list(MARKER.finditer(text))
+    for i, match in enumerate(matches):
+        name = re.sub(r"[^A-Z]", "", match.group(1).upper())
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        parts.setdefault(name, text[match.end():end].strip())
+
+    missing = [name for name in ("SUMMARY", "GUIDANCE", "FOLLOWUP") if not parts.get(name)]
+    if missing:
+        raise FusedParseError(f"Fused response is missing: {', '.join(missing)}")
+    summary = parts["SUMMARY"]
+    missing_sections = [s for s in SUMMARY_SECTIONS if s.lower() not in summary.lower()]
+    if missing_sections:
+        raise FusedParseError(f"Fused summary is missing sections: {', '.join(missing_sections)}")
+    return {"summary": summary, "guidance": parts["GUIDANCE"], "followup": parts["FOLLOWUP"]}
+
+class FusedDocumentAgent:
+    """Produces the document summary, guidance and follow-up question in one LLM call"""
+    def __init__(self):
+        self.llm = llm
+
+    def generate(self, report, chat_history=None, conversation_stage="initial"):
+        """Run the fused generation; raises FusedParseError when the output is malformed"""
+        prompt = FUSED_PROMPT.format(
+            report=report,
+            chat_history=chat_history or [],
+            conversation_stage=conversation_stage
+        )
+        response = self.llm.invoke(prompt)
+        record_message_usage("fused_document", response)
+        return parse_fused_response(response.content)
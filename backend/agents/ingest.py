@@ -1,32 +1,58 @@
 # ---------------------------------------------------------------
 # PDF → Chroma VectorStore Ingestion
 # ---------------------------------------------------------------
-# - Detects PDF changes using SHA-256
+# - Detects PDF changes using SHA-256 (tracked per source in the manifest)
 # - Loads and splits into semantic chunks
-# - Creates embeddings using OpenAI
+# - Creates embeddings using OpenAI, reusing vectors for chunk text that was
+#   embedded before (see embedding_store.py)
 # - Saves to persistent Chroma DB
 # - Skips re-indexing if no changes detected
 # - On updates: deletes previous embeddings for the same PDF source
+# - Bulk mode: re-indexes every PDF in data/ with a bounded worker pool
+# - Writes go to a staging index generation that is published atomically
+#   (see vector_index.py), so the running server never sees a half-built index
+# - A generation starts as a copy of the whole current index, so batches of
+#   changes (bulk runs, watcher windows) share one generation
 # ---------------------------------------
 
 import os
+import sys
 import json
+import time
+import uuid
 import hashlib
+import argparse
+import threading
 from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
+
+# Sibling agent modules are imported flat (like medical_workflow does) so the
+# generation registry is shared with rag_agent in the running server
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from vector_index import build_lock, begin_generation, publish_generation, discard_generation, collect_garbage
+from embedding_store import CachedEmbeddings, get_embedding_store
 
 # --- Config ---
 load_dotenv()
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
 
-PDF_PATH = "data/MediConnect_Channeling_Center_KB[1].pdf"
+# Project-root data directory (outside backend and frontend), regardless of CWD
+DATA_DIR = str(Path(__file__).resolve().parents[2] / "data")
+PDF_PATH = os.path.join(DATA_DIR, "MediConnect_Channeling_Center_KB[1].pdf")
 # Always persist under backend/chroma_mediconnect regardless of CWD
 PERSIST_DIR = str(Path(__file__).resolve().parents[1] / "chroma_mediconnect")
 MANIFEST = os.path.join(PERSIST_DIR, "manifest.json")
+# Upper bound on files processed concurrently in bulk mode
+MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "4"))
+
+# Chroma writes and manifest updates are serialized; loading and embedding run in parallel.
+# Whole builds are additionally serialized across processes by vector_index.build_lock().
+_INDEX_LOCK = threading.Lock()
 
 # --- Helper: Hash function ---
 def sha256_of_file(path):
@@ -37,33 +63,56 @@ def sha256_of_file(path):
             h.update(block)
     return h.hexdigest()
 
-# --- Main ingestion function ---
-def ingest(pdf_path=PDF_PATH, persist_dir=PERSIST_DIR, force_reindex=False):
-    """Load PDF, split, embed, and store in Chroma; delete old embeddings for same source when updating.
+# --- Helper: Manifest ---
+def load_manifest(persist_dir=PERSIST_DIR):
+    """Read the manifest, upgrading the legacy single-source layout to per-source entries."""
+    path = os.path.join(persist_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {"sources": {}}
+    with open(path, "r") as mf:
+        data = json.load(mf)
+    if "sources" not in data:
+        data["sources"] = {}
+        if data.get("source"):
+            data["sources"][data["source"]] = {
+                "sha256": data.get("sha256"),
+                "num_chunks": data.get("num_chunks", 0),
+                "source": data["source"],
+            }
+    return data
 
-    Returns a dict with manifest-like info: {sha256, num_chunks, source}.
-    """
-    os.makedirs(persist_dir, exist_ok=True)
-    file_hash = sha256_of_file(pdf_path)
-    source_name = os.path.basename(pdf_path)
+def _record_sources(entries, generation, persist_dir=PERSIST_DIR):
+    """Store source entries in the manifest. Caller must hold _INDEX_LOCK."""
+    data = load_manifest(persist_dir)
+    for entry in entries:
+        data["sources"][entry["source"]] = entry
+    # Top-level fields describe the last ingestion (read by /admin/ingest-status)
+    last = entries[-1]
+    data.update({"sha256": last["sha256"], "num_chunks": last["num_chunks"], "source": last["source"]})
+    _write_manifest(data, generation, persist_dir)
 
-    # Check manifest to skip re-indexing if unchanged
-    if os.path.exists(MANIFEST) and not force_reindex:
-        with open(MANIFEST, "r") as mf:
-            data = json.load(mf)
-            if data.get("sha256") == file_hash:
-                print("✅ No changes detected in PDF. Skipping ingestion.")
-                return {"sha256": file_hash, "num_chunks": data.get("num_chunks", 0), "source": data.get("source", source_name), "skipped": True}
-            else:
-                print("🔄 Change detected in PDF. Re-indexing...")
-
-    # Load the PDF
-    print("📄 Loading PDF...")
+def _forget_source(source_name, generation, persist_dir=PERSIST_DIR):
+    """Drop a source entry from the manifest. Caller must hold _INDEX_LOCK."""
+    data = load_manifest(persist_dir)
+    data["sources"].pop(source_name, None)
+    _write_manifest(data, generation, persist_dir)
+
+def _write_manifest(data, generation, persist_dir):
+    data["generation"] = generation
+    data["total_chunks"] = sum(s.get("num_chunks", 0) for s in data["sources"].values())
+    path = os.path.join(persist_dir, "manifest.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as mf:
+        json.dump(data, mf, indent=2)
+    os.replace(tmp_path, path)
+
+# --- Helper: Load and split ---
+def _load_chunks(pdf_path, source_name):
+    """Load a PDF and split it into chunks tagged with their source name."""
+    print(f"📄 Loading PDF {source_name}...")
     loader = PyPDFLoader(pdf_path)
     docs = loader.load()
 
-    # Split into chunks
-    print("✂️ Splitting into chunks ...")
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=1200,
         chunk_overlap=200,
@@ -71,49 +120,306 @@ def ingest(pdf_path=PDF_PATH, persist_dir=PERSIST_DIR, force_reindex=False):
         add_start_index=True
     )
     chunks = splitter.split_documents(docs)
-    print(f"🧩 Created {len(chunks)} chunks")
+    print(f"🧩 Created {len(chunks)} chunks for {source_name}")
 
     # Normalize metadata: ensure 'source' is the basename for delete queries
     for c in chunks:
         c.metadata = c.metadata or {}
         c.metadata["source"] = source_name
+    return chunks
+
+def _replace_source(vectordb, source_name, chunks, vectors):
+    """Swap a source's chunks in a staging store. Caller must hold _INDEX_LOCK.
+
+    New chunks are added before the old ones are deleted, so a failed add
+    leaves the previous version of the source intact.
+    """
+    old_ids = vectordb._collection.get(where={"source": source_name}, include=[])["ids"]
+    if chunks:
+        vectordb._collection.add(
+            ids=[str(uuid.uuid4()) for _ in chunks],
+            embeddings=vectors,
+            documents=[c.page_content for c in chunks],
+            metadatas=[c.metadata for c in chunks],
+        )
+    if old_ids:
+        vectordb._collection.delete(ids=old_ids)
+        print(f"🗑️ Deleted previous embeddings for {source_name}")
+
+# --- Main ingestion function ---
+def ingest(pdf_path=PDF_PATH, persist_dir=PERSIST_DIR, force_reindex=False, file_hash=None, staging=None):
+    """Load PDF, split, embed, and store in Chroma; delete old embeddings for same source when updating.
+
+    A precomputed file_hash skips re-reading the file for change detection.
+    Without `staging`, the change is built into a new index generation and
+    published; with a (generation, store) pair from begin_generation(), the
+    caller publishes and records the manifest (bulk mode).
+    Returns a dict with manifest-like info: {sha256, num_chunks, source}.
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    file_hash = file_hash or sha256_of_file(pdf_path)
+    source_name = os.path.basename(pdf_path)
 
-    # Create embeddings
+    # Check manifest to skip re-indexing if unchanged
+    if not force_reindex:
+        previous = load_manifest(persist_dir)["sources"].get(source_name)
+        if previous and previous.get("sha256") == file_hash:
+            print(f"✅ No changes detected in {source_name}. Skipping ingestion.")
+            return {"sha256": file_hash, "num_chunks": previous.get("num_chunks", 0), "source": source_name, "skipped": True}
+        elif previous:
+            print(f"🔄 Change detected in {source_name}. Re-indexing...")
+
+    chunks = _load_chunks(pdf_path, source_name)
+
+    # Create embeddings outside the index lock so concurrent ingests overlap their API calls;
+    # only chunk text missing from the embedding store reaches the model
     print("🧠 Creating embeddings...")
     embeddings = OpenAIEmbeddings()
+    cached = CachedEmbeddings(embeddings, get_embedding_store(persist_dir))
+    vectors, embedding_stats = cached.embed_with_stats([c.page_content for c in chunks])
+    print(f"🧠 Embedded {embedding_stats['embedded']} new text(s), reused {embedding_stats['cache_hits']} "
+          f"(dedup ratio {embedding_stats['dedup_ratio']:.0%})")
 
-    # Open persistent DB and delete any existing items for this source
-    vectordb = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
-    try:
-        deleted = vectordb.delete(where={"source": source_name})
-        if deleted:
-            print(f"🗑️ Deleted previous embeddings for {source_name}")
-    except Exception as _:
-        # Some versions return None; proceed regardless
-        pass
-
-    # Add new documents
-    print(f"💾 Saving embeddings to {persist_dir} ...")
-    vectordb = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=persist_dir
-    )
-    vectordb.persist()
-
-    # Write manifest
     manifest = {
         "sha256": file_hash,
         "num_chunks": len(chunks),
         "source": source_name
     }
-    with open(MANIFEST, "w") as mf:
-        json.dump(manifest, mf, indent=2)
+    if staging is not None:
+        with _INDEX_LOCK:
+            print(f"💾 Staging embeddings for {source_name} ...")
+            _replace_source(staging[1], source_name, chunks, vectors)
+        return {**manifest, "embedding_stats": embedding_stats}
+
+    # Build the next generation, then publish it and update the manifest
+    with build_lock(persist_dir), _INDEX_LOCK:
+        generation, vectordb = begin_generation(embeddings, persist_dir)
+        try:
+            print(f"💾 Saving embeddings to {persist_dir} (generation {generation}) ...")
+            _replace_source(vectordb, source_name, chunks, vectors)
+            vectordb.persist()
+        except Exception:
+            discard_generation(vectordb, generation)
+            raise
+        publish_generation(generation, persist_dir)
+        _record_sources([manifest], generation, persist_dir)
+
+    collect_garbage(embeddings, persist_dir)
+    print(f"✅ Ingestion of {source_name} complete. Manifest updated.")
+    return {**manifest, "generation": generation, "embedding_stats": embedding_stats}
+
+def remove_source(source_name, persist_dir=PERSIST_DIR):
+    """Remove every chunk of a source (e.g. a deleted PDF) in a new published generation.
+
+    Like ingest(), this copies the whole index; use ingest_changes() for several files.
+    """
+    if source_name not in load_manifest(persist_dir)["sources"]:
+        return {"source": source_name, "removed": False}
+    embeddings = OpenAIEmbeddings()
+    with build_lock(persist_dir), _INDEX_LOCK:
+        generation, vectordb = begin_generation(embeddings, persist_dir)
+        try:
+            _replace_source(vectordb, source_name, [], [])
+            vectordb.persist()
+        except Exception:
+            discard_generation(vectordb, generation)
+            raise
+        publish_generation(generation, persist_dir)
+        _forget_source(source_name, generation, persist_dir)
+    collect_garbage(embeddings, persist_dir)
+    print(f"✅ Removed {source_name} from the index.")
+    return {"source": source_name, "removed": True, "generation": generation}
+
+# --- Bulk ingestion ---
+def _ingest_for_report(pdf_path, persist_dir, force_reindex, file_hash, staging):
+    """Run ingest() for one file and return its report row instead of raising."""
+    started = time.perf_counter()
+    row = {"source": os.path.basename(pdf_path), "sha256": file_hash}
+    try:
+        manifest = ingest(pdf_path, persist_dir=persist_dir, force_reindex=force_reindex, file_hash=file_hash, staging=staging)
+        row["status"] = "skipped" if manifest.get("skipped") else "ingested"
+        row["num_chunks"] = manifest.get("num_chunks", 0)
+        if "embedding_stats" in manifest:
+            row["embedding_stats"] = manifest["embedding_stats"]
+    except Exception as e:
+        print(f"❌ Failed to ingest {row['source']}: {e}")
+        row["status"] = "failed"
+        row["error"] = str(e)
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+def _finish_generation(staging, rows, persist_dir):
+    """Publish a staging generation with the changes in rows, or discard it when there are none.
+
+    Caller must hold build_lock(). Returns whether the generation was published.
+    """
+    generation, vectordb = staging
+    ingested = [
+        {"sha256": r["sha256"], "num_chunks": r["num_chunks"], "source": r["source"]}
+        for r in sorted(rows, key=lambda r: r["source"]) if r["status"] == "ingested"
+    ]
+    removed = [r["source"] for r in rows if r.get("removed_chunks")]
+    changed = bool(ingested or removed)
+    with _INDEX_LOCK:
+        if changed:
+            vectordb.persist()
+            publish_generation(generation, persist_dir)
+            for source_name in removed:
+                _forget_source(source_name, generation, persist_dir)
+            if ingested:
+                _record_sources(ingested, generation, persist_dir)
+        else:
+            discard_generation(vectordb, generation)
+    return changed
+
+def ingest_changes(pdf_paths=(), removed_sources=(), persist_dir=PERSIST_DIR, force_reindex=False):
+    """Apply a batch of added/changed PDFs and removed sources in one index generation.
+
+    Every build copies the whole current index (see begin_generation), so a
+    burst of changes pays that copy once instead of once per file. Files whose
+    hash is unchanged and removals of sources that were never indexed need no
+    generation at all. Returns one report row per file (status ingested,
+    skipped, failed, removed or ignored), like ingest_directory().
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    indexed_sources = load_manifest(persist_dir)["sources"]
+    rows, changed_paths = [], []
+    for pdf_path in pdf_paths:
+        source_name = os.path.basename(pdf_path)
+        try:
+            file_hash = sha256_of_file(pdf_path)
+        except OSError as e:
+            rows.append({"source": source_name, "status": "failed", "error": str(e)})
+            continue
+        previous = indexed_sources.get(source_name)
+        if not force_reindex and previous and previous.get("sha256") == file_hash:
+            rows.append({"source": source_name, "sha256": file_hash, "status": "skipped",
+                         "num_chunks": previous.get("num_chunks", 0)})
+        else:
+            changed_paths.append((pdf_path, file_hash))
+    removed = [name for name in removed_sources if name in indexed_sources]
+    rows.extend({"source": name, "status": "ignored"} for name in removed_sources if name not in indexed_sources)
+    if not changed_paths and not removed:
+        return rows
+
+    embeddings = OpenAIEmbeddings()
+    with build_lock(persist_dir):
+        with _INDEX_LOCK:
+            staging = begin_generation(embeddings, persist_dir)
+        batch_rows = [
+            _ingest_for_report(pdf_path, persist_dir, force_reindex, file_hash, staging)
+            for pdf_path, file_hash in changed_paths
+        ]
+        for source_name in removed:
+            with _INDEX_LOCK:
+                _replace_source(staging[1], source_name, [], [])
+            batch_rows.append({"source": source_name, "status": "removed", "removed_chunks": True})
+        changed = _finish_generation(staging, batch_rows, persist_dir)
+    if changed:
+        collect_garbage(embeddings, persist_dir)
+    return rows + batch_rows
+
+def ingest_directory(data_dir=DATA_DIR, persist_dir=PERSIST_DIR, force_reindex=False, max_workers=MAX_WORKERS):
+    """Ingest every PDF in data_dir with at most max_workers files in flight.
+
+    Files with identical content (same SHA-256) are ingested once; later copies are
+    reported as duplicates and any chunks they had from earlier runs are removed.
+    All changes land in one staging generation that is published when the run
+    finishes; single-file ingests wait until then. A consolidated per-file report
+    is written to ingest_report.json in persist_dir and returned.
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    pdf_paths = sorted(p for p in Path(data_dir).iterdir() if p.is_file() and p.suffix.lower() == ".pdf")
+    max_workers = max(1, int(max_workers))
+    print(f"📚 Bulk ingestion of {len(pdf_paths)} PDF(s) from {data_dir} with {max_workers} worker(s)...")
+
+    embeddings = OpenAIEmbeddings()
+    # Held for the whole run, so no other build can start from the generation we replace
+    with build_lock(persist_dir):
+        with _INDEX_LOCK:
+            staging = begin_generation(embeddings, persist_dir)
+        indexed_sources = load_manifest(persist_dir)["sources"]
+
+        rows = []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest") as pool:
+            hashes = list(pool.map(sha256_of_file, pdf_paths))
+
+            # Dedupe by content hash; the first file name (sorted) wins
+            first_by_hash = {}
+            futures = []
+            for path, file_hash in zip(pdf_paths, hashes):
+                if file_hash in first_by_hash:
+                    row = {
+                        "source": path.name,
+                        "sha256": file_hash,
+                        "status": "duplicate",
+                        "duplicate_of": first_by_hash[file_hash],
+                    }
+                    if path.name in indexed_sources:
+                        # Indexed before it became a copy: drop its chunks so they are not retrieved twice
+                        with _INDEX_LOCK:
+                            _replace_source(staging[1], path.name, [], [])
+                        row["removed_chunks"] = True
+                    rows.append(row)
+                    continue
+                first_by_hash[file_hash] = path.name
+                futures.append(pool.submit(_ingest_for_report, str(path), persist_dir, force_reindex, file_hash, staging))
+
+            for future in as_completed(futures):
+                rows.append(future.result())
+
+        # Publish once for the whole run; a run with nothing new leaves the index untouched
+        generation = staging[0]
+        changed = _finish_generation(staging, rows, persist_dir)
+    if changed:
+        collect_garbage(embeddings, persist_dir)
+
+    rows.sort(key=lambda r: r["source"])
+    totals = {"files": len(rows), "ingested": 0, "skipped": 0, "duplicate": 0, "failed": 0}
+    for row in rows:
+        totals[row["status"]] += 1
+    totals["chunks"] = sum(r.get("num_chunks", 0) for r in rows if r["status"] in ("ingested", "skipped"))
+    embedded_chunks = sum(r["embedding_stats"]["chunks"] for r in rows if "embedding_stats" in r)
+    embedded = sum(r["embedding_stats"]["embedded"] for r in rows if "embedding_stats" in r)
+    totals["embedding"] = {
+        "chunks": embedded_chunks,
+        "embedded": embedded,
+        "reused": embedded_chunks - embedded,
+        "dedup_ratio": round(1 - embedded / embedded_chunks, 3) if embedded_chunks else 0.0,
+    }
 
-    print("✅ Ingestion complete. Manifest updated.")
-    return manifest
+    report = {
+        "data_dir": str(data_dir),
+        "force_reindex": bool(force_reindex),
+        "max_workers": max_workers,
+        "generation": generation if changed else None,
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "totals": totals,
+        "files": rows,
+    }
+    report_path = os.path.join(persist_dir, "ingest_report.json")
+    with open(report_path, "w") as rf:
+        json.dump(report, rf, indent=2)
+
+    print(f"✅ Bulk ingestion finished in {report['duration_seconds']}s: {totals}")
+    return report
 
 # --- CLI runner ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest MediConnect PDFs into the Chroma vector store")
+    parser.add_argument("pdf_path", nargs="?", default=PDF_PATH, help="PDF to ingest (ignored with --all)")
+    parser.add_argument("--all", action="store_true", help="re-index every PDF in the data directory")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory scanned by --all")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="files processed concurrently with --all")
+    parser.add_argument("--force", action="store_true", help="re-index even if the file hash is unchanged")
+    args = parser.parse_args()
+
     print("📘 Starting MediConnect PDF ingestion...")
-    ingest(force_reindex=False)
+    if args.all:
+        ingest_directory(args.data_dir, force_reindex=args.force, max_workers=args.workers)
+    else:
+        ingest(args.pdf_path, force_reindex=args.force)
@@ -0,0 +1,283 @@
+# ---------------------------------------------------------------
+# Watch-folder ingestion service for the data/ directory
+# ---------------------------------------------------------------
+# - Watches data/ with inotify (via watchdog) and falls back to polling
+# - Debounces bursts of file events until a PDF has been quiet and its
+#   size is stable, so half-copied files are never ingested
+# - Applies every file that settles in the same debounce window as one
+#   batch (ingest_changes): unchanged files are skipped by hash, deleted
+#   files are removed from the index, and the batch shares one generation
+# - Writes its state to chroma_mediconnect/watcher_status.json
+#   (served by GET /admin/watcher-status)
+# ---------------------------------------
+
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # polling fallback only
+    Observer = None
+    FileSystemEventHandler = object
+
+if __package__:
+    from .ingest import ingest_changes, load_manifest, DATA_DIR, PERSIST_DIR
+else:
+    from ingest import ingest_changes, load_manifest, DATA_DIR, PERSIST_DIR
+
+DEBOUNCE_SECONDS = float(os.getenv("INGEST_WATCH_DEBOUNCE_SECONDS", "2.0"))
+POLL_INTERVAL_SECONDS = float(os.getenv("INGEST_WATCH_POLL_SECONDS", "5.0"))
+# With inotify active, a slow rescan still catches events lost on network mounts
+RESCAN_INTERVAL_SECONDS = 60.0
+STATUS_FILE = "watcher_status.json"
+RECENT_RESULTS = 20
+
+def _is_pdf(path):
+    name = os.path.basename(path)
+    return name.lower().endswith(".pdf") and not name.startswith(".")
+
+def _utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events for PDFs to the watcher."""
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path and _is_pdf(path):
+                self.watcher.notify(path)
+
+class IngestWatcher:
+    """Long-running service that keeps the vector index in sync with data_dir."""
+    def __init__(self, data_dir=DATA_DIR, persist_dir=PERSIST_DIR, debounce=DEBOUNCE_SECONDS,
+                 poll_interval=POLL_INTERVAL_SECONDS, use_inotify=True):
+        self.data_dir = os.path.abspath(data_dir)
+        self.persist_dir = persist_dir
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.mode = "inotify" if (use_inotify and Observer is not None) else "polling"
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._pending = {}      # path -> (monotonic time of last event, size seen then)
+        self._snapshot = None   # path -> (mtime_ns, size) from the last scan
+        self._observer = None
+        self._threads = []
+        self._status = {
+            "mode": self.mode,
+            "data_dir": self.data_dir,
+            "running": False,
+            "started_at": None,
+            "last_scan_at": None,
+            "last_event_at": None,
+            "pending": [],
+            "processed": 0,
+            "failed": 0,
+            "recent": [],
+        }
+
+    # --- Lifecycle ---
+    def start(self):
+        """Start watching in background threads."""
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.persist_dir, exist_ok=True)
+        self._stop.clear()
+        # Files that changed while the service was down are caught up by the first scan
+        self._snapshot = None
+        self._scan()
+
+        if self.mode == "inotify":
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_EventHandler(self), self.data_dir, recursive=False)
+                self._observer.start()
+            except Exception as e:
+                print(f"⚠️ inotify unavailable ({e}); falling back to polling")
+                self._observer = None
+                self.mode = "polling"
+
+        self._threads = [
+            threading.Thread(target=self._scan_loop, name="ingest-watch-scan", daemon=True),
+            threading.Thread(target=self._worker_loop, name="ingest-watch-worker", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        self._update_status(mode=self.mode, running=True, started_at=_utcnow())
+        print(f"👀 Watching {self.data_dir} for PDF changes ({self.mode})")
+
+    def stop(self):
+        """Stop watching; an ingest already running is allowed to finish."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        self._update_status(running=False)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    # --- Events ---
+    def notify(self, path):
+        """Record a change to path; processing happens after the debounce window."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None  # deleted or moved away
+        with self._lock:
+            self._pending[os.path.abspath(path)] = (time.monotonic(), size)
+        self._update_status(last_event_at=_utcnow())
+        self._wakeup.set()
+
+    def _scan(self):
+        """Poll data_dir and notify about new, changed and deleted PDFs."""
+        current = {}
+        try:
+            for entry in os.scandir(self.data_dir):
+                if entry.is_file() and _is_pdf(entry.path):
+                    st = entry.stat()
+                    current[entry.path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        if self._snapshot is None:
+            # First scan: every PDF goes through ingest() (unchanged ones are skipped by
+            # hash) and indexed sources that no longer exist on disk are removed
+            indexed = load_manifest(self.persist_dir)["sources"]
+            changed = list(current)
+            deleted = [os.path.join(self.data_dir, name) for name in indexed
+                       if os.path.join(self.data_dir, name) not in current]
+        else:
+            changed = [p for p, sig in current.items() if self._snapshot.get(p) != sig]
+            deleted = [p for p in self._snapshot if p not in current]
+        self._snapshot = current
+        for path in changed + deleted:
+            self.notify(path)
+        self._update_status(last_scan_at=_utcnow())
+
+    def _scan_loop(self):
+        interval = self.poll_interval if self.mode == "polling" else RESCAN_INTERVAL_SECONDS
+        while not self._stop.wait(interval):
+            self._scan()
+
+    # --- Processing ---
+    def _due_paths(self):
+        """Pop paths whose debounce window has passed and whose size is stable."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for path, (last_event, size) in list(self._pending.items()):
+                if now - last_event < self.debounce:
+                    continue
+                try:
+                    current_size = os.path.getsize(path)
+                except OSError:
+                    current_size = None
+                if current_size != size:
+                    # Still being written: restart the window
+                    self._pending[path] = (now, current_size)
+                    continue
+                del self._pending[path]
+                due.append(path)
+        return due
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self.debounce / 2 or 0.5)
+            self._wakeup.clear()
+            due = self._due_paths()
+            if due and not self._stop.is_set():
+                self._process(due)
+            with self._lock:
+                pending = sorted(os.path.basename(p) for p in self._pending)
+            self._update_status(pending=pending)
+
+    def _process(self, paths):
+        """Apply the changes of one debounce window in a single index generation."""
+        at = _utcnow()
+        started = time.perf_counter()
+        existing = sorted(p for p in paths if os.path.exists(p))
+        deleted = sorted(os.path.basename(p) for p in paths if not os.path.exists(p))
+        try:
+            rows = ingest_changes(existing, deleted, persist_dir=self.persist_dir)
+        except Exception as e:
+            print(f"❌ Watcher failed to apply {len(paths)} change(s): {e}")
+            rows = [{"source": os.path.basename(p), "status": "failed", "error": str(e)} for p in paths]
+        seconds = round(time.perf_counter() - started, 3)
+        results = []
+        for row in rows:
+            result = {"source": row["source"], "at": at, "action": row["status"]}
+            result["seconds"] = row.get("seconds", seconds)
+            if "num_chunks" in row:
+                result["num_chunks"] = row["num_chunks"]
+            if "error" in row:
+                result["error"] = row["error"]
+            results.append(result)
+        with self._lock:
+            self._status["processed"] += len(results)
+            self._status["failed"] += sum(1 for r in results if r["action"] == "failed")
+            self._status["recent"] = (results[::-1] + self._status["recent"])[:RECENT_RESULTS]
+        self._update_status()
+
+    # --- Status ---
+    def status(self):
+        with self._lock:
+            return json.loads(json.dumps(self._status))
+
+    def _update_status(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+            self._status["updated_at"] = _utcnow()
+            snapshot = json.dumps(self._status, indent=2)
+        path = os.path.join(self.persist_dir, STATUS_FILE)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as sf:
+                sf.write(snapshot)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write watcher status: {e}")
+
+def read_status(persist_dir=PERSIST_DIR):
+    """Return the last status written by a watcher (in this or another process), or None."""
+    path = os.path.join(persist_dir, STATUS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as sf:
+        return json.load(sf)
+
+# --- CLI runner ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the data directory and ingest PDF changes")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="quiet period before ingesting (s)")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS, help="polling interval (s)")
+    parser.add_argument("--polling", action="store_true", help="force polling instead of inotify")
+    args = parser.parse_args()
+
+    IngestWatcher(
+        data_dir=args.data_dir,
+        debounce=args.debounce,
+        poll_interval=args.poll_interval,
+        use_inotify=not args.polling,
+    ).run_forever()
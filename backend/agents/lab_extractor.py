@@ -0,0 +1,155 @@
+# ---------------------------------------------------------------
+# Deterministic lab-value extraction
+# ---------------------------------------------------------------
+# - Parses name / value / unit / reference range / flag rows of lab
+#   panels (CBC, lipid profile, HbA1c, ...) with regular expressions
+# - Flags out-of-range values locally by comparing the value with the
+#   row's reference range (or the report's own H/L flag)
+# - For structured reports the summarizer gets the parsed results (out-of-range
+#   rows in full, the rest condensed) plus the remaining prose instead of the
+#   raw text
+# ---------------------------------------
+
+import os
+import re
+import time
+
+# Minimum parsed rows, and share of non-empty lines that are lab rows, for a structured report
+MIN_ROWS = int(os.getenv("LAB_TABLE_MIN_ROWS", "3"))
+MIN_ROW_SHARE = float(os.getenv("LAB_TABLE_MIN_SHARE", "0.4"))
+
+NUMBER = re.compile(r"^[<>]?\d+(?:\.\d+)?$")
+RANGE = re.compile(r"^(?P<low>\d+(?:\.\d+)?)-(?P<high>\d+(?:\.\d+)?)$")
+BOUND = re.compile(r"^(?P<op>[<>]=?|≤|≥)(?P<limit>\d+(?:\.\d+)?)$")
+FLAG = re.compile(r"^\(?(?P<flag>h|l|hi|lo|high|low|\*)\)?$", re.IGNORECASE)
+UNIT = re.compile(r"^(?:%|[a-zµ/^0-9.]*[a-zµ%/][a-zµ/^0-9.]*)$", re.IGNORECASE)
+# Leading words of rows that carry numbers but are not results
+NOT_A_TEST = frozenset(
+    "page date age dob mrn tel phone fax sample collected received reported printed ref lab id no patient "
+    "bed ward room invoice".split()
+)
+
+def _normalize(line: str) -> str:
+    line = line.replace("–", "-").replace("—", "-")
+    # "13.0 - 17.0" -> "13.0-17.0", "< 200" -> "<200", "Hemoglobin: 13.2" -> "Hemoglobin 13.2"
+    line = re.sub(r"(\d)\s*-\s*(\d)", r"\1-\2", line)
+    line = re.sub(r"([<>]=?|≤|≥)\s+(\d)", r"\1\2", line)
+    return re.sub(r"\s*:\s*", " ", line)
+
+def parse_lab_line(line: str):
+    """{"test", "value", "unit", "reference", "low", "high", "flag"} for a lab row, or None"""
+    tokens = _normalize(line).split()
+    # The test name runs up to the first bare number (names like HbA1c or Vitamin B12 keep theirs)
+    for i, token in enumerate(tokens):
+        if NUMBER.match(token):
+            break
+    else:
+        return None
+    name = " ".join(tokens[:i]).strip(" .-")
+    if i == 0 or sum(c.isalpha() for c in name) < 2 or tokens[0].lower() in NOT_A_TEST:
+        return None
+
+    row = {"test": name, "value": float(tokens[i].lstrip("<>")), "unit": None,
+           "reference": None, "low": None, "high": None, "flag": None}
+    for token in tokens[i + 1:]:
+        token = token.strip("()[],;")
+        if row["flag"] is None and FLAG.match(token):
+            flag = FLAG.match(token).group("flag").lower()
+            row["flag"] = "high" if flag in ("h", "hi", "high", "*") else "low"
+        elif row["reference"] is None and RANGE.match(token):
+            m = RANGE.match(token)
+            row.update(reference=token, low=float(m.group("low")), high=float(m.group("high")))
+        elif row["reference"] is None and BOUND.match(token):
+            m = BOUND.match(token)
+            limit = float(m.group("limit"))
+            row["reference"] = token
+            if m.group("op") in ("<", "<=", "≤"):
+                row["high"] = limit
+            else:
+                row["low"] = limit
+        elif row["unit"] is None and row["reference"] is None and UNIT.match(token) and not NUMBER.match(token):
+            row["unit"] = token
+    # A number alone is not enough to call a line a result, and without a
+    # reference range long or sentence-like lines are prose ("given 500 mg daily.")
+    if row["reference"] is None and (row["unit"] is None or len(tokens) > 6 or line.rstrip().endswith(".")):
+        return None
+    return row
+
+def classify(row: dict) -> str:
+    """high / low / normal from the reference range, else the report's flag, else unknown"""
+    if row["high"] is not None and row["value"] > row["high"]:
+        return "high"
+    if row["low"] is not None and row["value"] < row["low"]:
+        return "low"
+    if row["low"] is not None or row["high"] is not None:
+        return "normal"
+    return row["flag"] or "unknown"
+
+def extract_lab_results(pages: list):
+    """Parse every lab row in the pages; returns (rows, other non-empty lines)"""
+    rows, other = [], []
+    seen = set()
+    for page in pages:
+        for line in page.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            row = parse_lab_line(line)
+            if row is None:
+                other.append(line)
+                continue
+            key = (row["test"].lower(), row["value"], row["unit"])
+            if key in seen:
+                continue
+            seen.add(key)
+            row["status"] = classify(row)
+            rows.append(row)
+    return rows, other
+
+def _number(value) -> str:
+    return f"{value:g}"
+
+def _value(row: dict) -> str:
+    return f"{row['test']} {_number(row['value'])}" + (f" {row['unit']}" if row["unit"] else "")
+
+def format_lab_results(rows: list) -> str:
+    """Out-of-range rows in full, then the rest on one line without their ranges"""
+    flagged = [r for r in rows if r["status"] in ("high", "low")]
+    rest = [r for r in rows if r["status"] not in ("high", "low")]
+    parts = []
+    if flagged:
+        parts.append("Out of range:\n" + "\n".join(
+            f"{_value(r)} (ref {r['reference'] or '-'}) {r['status'].upper()}" for r in flagged
+        ))
+    if rest:
+        parts.append("Within range: " + "; ".join(
+            _value(r) + (" (no range)" if r["status"] == "unknown" else "") for r in rest
+        ))
+    return "\n".join(parts)
+
+def structured_report_input(pages: list):
+    """Compact summarizer input for a lab report; returns (text or None, stats).
+
+    None means the report is not mostly lab rows and should be summarized as text.
+    """
+    started = time.perf_counter()
+    rows, other = extract_lab_results(pages)
+    total = len(rows) + len(other)
+    stats = {
+        "lab_rows": len(rows),
+        "out_of_range": sum(1 for r in rows if r["status"] in ("high", "low")),
+        "row_share": round(len(rows) / total, 2) if total else 0.0,
+        "structured": False,
+    }
+    if len(rows) < MIN_ROWS or stats["row_share"] < MIN_ROW_SHARE:
+        stats["seconds"] = round(time.perf_counter() - started, 4)
+        return None, stats
+
+    stats["structured"] = True
+    parts = ["Lab results (parsed from the report and compared with their reference ranges):\n" + format_lab_results(rows)]
+    # Headings and comments that are not table headers stay as prose
+    prose = [line for line in other if not re.match(r"^(test|parameter|investigation)\b", line, re.IGNORECASE)]
+    if prose:
+        parts.append("Other report text:\n" + "\n".join(prose))
+    stats["seconds"] = round(time.perf_counter() - started, 4)
+    return "\n\n".join(parts), stats
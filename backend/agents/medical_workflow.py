@@ -2,13 +2,23 @@
 # Coordinates Query_Classifier → RAG → Solution_Agent for natural chat
 
 import os
+import sys
 import json
+from pathlib import Path
 from dotenv import load_dotenv
 from Query_Classifier import QueryClassifierAgent
 from solution_agent import SolutionAgent
 from followup_agent import FollowUpAgent
 from rag_agent import answer_query
-from Doc_Summerize import read_pdf, crew as doc_crew
+from Doc_Summerize import (
+    read_pdf_pages, prepare_report_input, run_summary_crew, SUMMARY_PROMPT_VERSION, SUMMARY_INPUT_SETTINGS,
+)
+from fused_document import FusedDocumentAgent, FUSED_PROMPT_VERSION
+from summary_cache import get_summary_cache, summary_key
+
+# Project root, for the stage spans shared with the API (backend/utils/tracing.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.tracing import span
 
 # Setup environment
 load_dotenv()
@@ -20,23 +30,37 @@ class MedicalWorkflow:
         self.query_classifier = QueryClassifierAgent()
         self.solution_agent = SolutionAgent()
         self.followup_agent = FollowUpAgent()
+        self.fused_document_agent = FusedDocumentAgent()
+        # "fused": one generation for summary, guidance and follow-up (sequential agents as fallback)
+        # "sequential": Doc_Summarize → Solution_Agent → Follow-up_Agent
+        self.document_mode = os.getenv("DOCUMENT_MODE", "fused").lower()
         self.chat_history = []
     
-    def process_query(self, user_input):
-        """Process user query through complete conversational workflow"""
+    def process_query(self, user_input, doc_pages=None, chat_history=None):
+        """Process user query through complete conversational workflow
+
+        doc_pages: page texts of a document already extracted by the caller
+        (e.g. an uploaded PDF), used for 'doc:' queries instead of reading a path
+        chat_history: the session's messages so far; this request's messages are
+        appended to it and also returned as "new_messages". Defaults to the
+        workflow's own history (interactive use); the API passes a list per
+        request because one workflow serves concurrent sessions.
+        """
+        history = self.chat_history if chat_history is None else chat_history
         
         print(f"\n=== Processing: {user_input} ===")
         
         # Handle document summarization requests
         if user_input.startswith("doc:"):
-            return self._handle_document_query(user_input)
+            return self._handle_document_query(user_input, doc_pages, history)
         
         # Update chat history BEFORE processing to provide context
-        self.chat_history.append({"role": "user", "content": user_input})
+        history.append({"role": "user", "content": user_input})
         
         # Step 1: Query Classification (JSON only)
         print("Step 1: Query Classification...")
-        classification = self.query_classifier.classify_query(user_input, self.chat_history)
+        with span("classification"):
+            classification = self.query_classifier.classify_query(user_input, history)
         print(f"Classification: {json.dumps(classification, indent=2)}")
         
         # Check if RAG (knowledge base search) is needed
@@ -47,7 +71,8 @@ class MedicalWorkflow:
                 # Use raw user input as the RAG query to avoid diluting retrieval
                 rag_query = user_input
                 print(f"RAG Query: {rag_query}")
-                rag_result = answer_query(rag_query)
+                with span("retrieval"):
+                    rag_result = answer_query(rag_query)
                 # answer_query returns a dict: {"answer": str, "sources": list}
                 rag_answer = (rag_result or {}).get("answer", "").strip()
                 rag_sources = (rag_result or {}).get("sources", [])
@@ -70,53 +95,51 @@ class MedicalWorkflow:
         response_context = {
             "classification": classification,
             "patient_query": user_input,
-            "chat_history": self.chat_history,
+            "chat_history": history,
             "rag_context": rag_context,
-            "conversation_stage": self._determine_conversation_stage()
+            "conversation_stage": self._determine_conversation_stage(history)
         }
         
-        unified_response = self.solution_agent.generate_unified_response(**response_context)
+        with span("solution"):
+            unified_response = self.solution_agent.generate_unified_response(**response_context)
         print(f"Unified Response: {unified_response}")
         
         # Update chat history
-        self.chat_history.append({"role": "assistant", "content": unified_response})
+        history.append({"role": "assistant", "content": unified_response})
         
         return {
             "classification": classification,
             "rag_context": rag_context,
-            "final_response": unified_response
+            "final_response": unified_response,
+            "new_messages": history[-2:]
         }
     
-    def _handle_document_query(self, user_input):
+    def _handle_document_query(self, user_input, doc_pages=None, chat_history=None):
         """Handle document summarization workflow"""
+        history = self.chat_history if chat_history is None else chat_history
         doc_text = user_input.replace("doc:", "").strip()
         
         print("Step 1: Document Summarization...")
         
-        # Check if it's PDF file or direct text
-        if doc_text.endswith('.pdf'):
-            # Handle PDF file path
-            pdf_content = read_pdf(doc_text)
-            if "Error" in pdf_content:
-                print(f"PDF Error: {pdf_content}")
-                return {"error": pdf_content}
-            doc_input = pdf_content
-        else:
-            # Handle direct text input
-            doc_input = doc_text
-        
-        # Use document summarization agent
-        try:
-            doc_result = doc_crew.kickoff(inputs={"pdf_text": doc_input})
-            task_result = doc_result.tasks_output[0]
-            doc_summary = getattr(task_result, "content", getattr(task_result, "raw", str(task_result)))
-            print(f"Document Summary: {doc_summary}")
-        except Exception as e:
-            print(f"Doc Summarization Error: {e}")
-            doc_summary = f"Document summarization failed: {e}"
+        # Handle PDF file path unless the caller already extracted the pages;
+        # anything else is direct text input
+        if doc_pages is None and doc_text.endswith('.pdf'):
+            # Pages are kept for map-reduce summarization
+            try:
+                doc_pages = read_pdf_pages(doc_text)
+            except Exception as e:
+                pdf_error = f"Error loading PDF: {str(e)}"
+                print(f"PDF Error: {pdf_error}")
+                return {"error": pdf_error}
+        
+        # Repeat uploads of the same report are answered from the summary cache; summaries
+        # are keyed by the prompt that wrote them (fused or sequential summarizer)
+        summary_cache = get_summary_cache()
+        report_text = "\n".join(doc_pages) if doc_pages is not None else doc_text
+        fused_key = summary_key(report_text, FUSED_PROMPT_VERSION, SUMMARY_INPUT_SETTINGS)
+        sequential_key = summary_key(report_text, SUMMARY_PROMPT_VERSION, SUMMARY_INPUT_SETTINGS)
+        doc_summary = None
         
-        # Step 2: Generate Solution based on document summary
-        print("\nStep 2: Generating Solution from Document...")
         classification = {
             "intent": "document_request",
             "urgency": "low",
@@ -124,44 +147,104 @@ class MedicalWorkflow:
             "risk_level": "low"
         }
         
-        solution = self.solution_agent.generate_unified_response(
-            classification=classification,
-            patient_query=f"Please provide guidance based on this document summary: {doc_summary}",
-            chat_history=self.chat_history,
-            rag_context=doc_summary,
-            conversation_stage=self._determine_conversation_stage()
-        )
-        print(f"Solution: {solution}")
-        
-        # Step 3: Follow-up Questions
-        print("\nStep 3: Generating Follow-up...")
-        followup = self.followup_agent.generate_followup(
-            solution=solution,
-            original_query=user_input,
-            classification=classification,
-            chat_history=self.chat_history
-        )
-        print(f"Follow-up: {followup}")
+        # Fused mode: summary, guidance and follow-up from a single generation
+        report_input = None
+        fused = None
+        if self.document_mode == "fused":
+            doc_summary = summary_cache.get(fused_key)
+            if doc_summary is not None:
+                print("Document Summary: served from cache")
+            try:
+                # A cached summary stands in for the report (compressed, map-reduced for long reports)
+                if doc_summary is not None:
+                    report_input = doc_summary
+                else:
+                    with span("document.prepare"):
+                        report_input = prepare_report_input(text=doc_text, pages=doc_pages)
+                with span("document.fused"):
+                    fused = self.fused_document_agent.generate(
+                        report_input,
+                        chat_history=history,
+                        conversation_stage=self._determine_conversation_stage(history)
+                    )
+            except Exception as e:
+                print(f"Fused document response failed, falling back to sequential agents: {e}")
+        
+        if fused is not None:
+            if doc_summary is None:
+                doc_summary = fused["summary"]
+                # The fused prompt includes the chat history, which the cache key does not;
+                # only summaries written without one depend on the report alone
+                if not history:
+                    summary_cache.put(fused_key, doc_summary)
+            solution = fused["guidance"]
+            followup = fused["followup"]
+            print(f"Document Summary: {doc_summary}")
+            print(f"Solution: {solution}")
+            print(f"Follow-up: {followup}")
+        else:
+            # Use document summarization agent (map-reduce for long reports)
+            if doc_summary is None:
+                doc_summary = summary_cache.get(sequential_key)
+                if doc_summary is not None:
+                    print("Document Summary: served from cache")
+            if doc_summary is None:
+                try:
+                    if report_input is None:
+                        with span("document.prepare"):
+                            report_input = prepare_report_input(text=doc_text, pages=doc_pages)
+                    with span("document.summary"):
+                        doc_summary = run_summary_crew(report_input)
+                    summary_cache.put(sequential_key, doc_summary)
+                except Exception as e:
+                    print(f"Doc Summarization Error: {e}")
+                    doc_summary = f"Document summarization failed: {e}"
+            print(f"Document Summary: {doc_summary}")
+        
+            # Step 2: Generate Solution based on document summary
+            print("\nStep 2: Generating Solution from Document...")
+            with span("solution"):
+                solution = self.solution_agent.generate_unified_response(
+                    classification=classification,
+                    patient_query=f"Please provide guidance based on this document summary: {doc_summary}",
+                    chat_history=history,
+                    rag_context=doc_summary,
+                    conversation_stage=self._determine_conversation_stage(history)
+                )
+            print(f"Solution: {solution}")
+        
+            # Step 3: Follow-up Questions
+            print("\nStep 3: Generating Follow-up...")
+            with span("followup"):
+                followup = self.followup_agent.generate_followup(
+                    solution=solution,
+                    original_query=user_input,
+                    classification=classification,
+                    chat_history=history
+                )
+            print(f"Follow-up: {followup}")
         
         # Update chat history
-        self.chat_history.append({"role": "user", "content": user_input})
-        self.chat_history.append({"role": "assistant", "content": f"{solution}\n\n{followup}"})
+        history.append({"role": "user", "content": user_input})
+        history.append({"role": "assistant", "content": f"{solution}\n\n{followup}"})
         
         return {
             "classification": classification,
             "document_summary": doc_summary,
             "solution": solution,
             "followup": followup,
-            "final_response": f"{solution}\n\n{followup}"
+            "final_response": f"{solution}\n\n{followup}",
+            "new_messages": history[-2:]
         }
     
-    def _determine_conversation_stage(self):
+    def _determine_conversation_stage(self, chat_history=None):
         """Determine what stage of conversation we're in"""
-        if not self.chat_history:
+        history = self.chat_history if chat_history is None else chat_history
+        if not history:
             return "initial"
         
         # Count user messages to determine stage
-        user_messages = [msg for msg in self.chat_history if msg["role"] == "user"]
+        user_messages = [msg for msg in history if msg["role"] == "user"]
         
         if len(user_messages) == 1:
             return "first_response"
@@ -1,13 +1,23 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 from crewai import Agent
 from langchain.chat_models import ChatOpenAI
 from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
+from langchain.callbacks import get_openai_callback
 from langchain.prompts import PromptTemplate
 
+# Sibling agent modules are imported flat so the generation registry is shared with ingest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from vector_index import lease_store
+
+# Project root, for the stage spans shared with the API (backend/utils/tracing.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.tracing import span
+from backend.utils.usage import record_usage
+
 # 1. Load environment variables
 load_dotenv()
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
@@ -17,14 +27,10 @@ os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
 PERSIST_DIR = str(Path(__file__).resolve().parents[1] / "chroma_mediconnect")
 K = 15
 
-# 3. Load embeddings and vectorstore
-print("Loading embeddings & vectorstore...")
+# 3. Load embeddings; the vectorstore is leased per query from the published
+#    index generation (vector_index.py), so re-ingests are picked up without a restart
+print("Loading embeddings...")
 embeddings = OpenAIEmbeddings()
-vectordb = Chroma(persist_directory=PERSIST_DIR, embedding_function=embeddings)
-retriever = vectordb.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": K}
-)
 
 # 4. Initialize model
 llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.2)
@@ -74,22 +80,14 @@ Partial answers:
 Final clean answer:"""
 )
 
-# 6. Chain selector
+# 6. Chain selector (retrieval runs separately so embed, search and synthesis are timed apart)
 def get_qa_chain(user_query: str):
     if "doctor" in user_query.lower() or "specialist" in user_query.lower():
         prompt = DOCTOR_PROMPT
     else:
         prompt = GENERAL_PROMPT
 
-    return RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={
-            "prompt": prompt
-        },
-    )
+    return load_qa_chain(llm, chain_type="stuff", prompt=prompt)
 
 # 7. Agent setup
 query_handler_agent = Agent(
@@ -105,11 +103,22 @@ query_handler_agent = Agent(
 
 # 8. Query handler
 def answer_query(user_query: str):
-    qa_chain = get_qa_chain(user_query)
-    result = qa_chain({"query": user_query})
+    # The lease pins this query to one generation even if a new one is published meanwhile
+    with lease_store(embeddings, PERSIST_DIR) as (generation, vectordb):
+        with span("retrieval.embed"):
+            query_vector = embeddings.embed_query(user_query)
+        with span("retrieval.search"):
+            source_docs = vectordb.similarity_search_by_vector(query_vector, k=K)
+
+    # Strict policy: without retrieved sources the model is not asked at all
+    if not source_docs:
+        return {"answer": "No relevant information found.", "sources": []}
 
-    answer = result.get("result", "").strip()
-    source_docs = result.get("source_documents", [])
+    with span("retrieval.synthesize"), get_openai_callback() as usage:
+        result = get_qa_chain(user_query)({"input_documents": source_docs, "question": user_query})
+    record_usage("retrieval", usage.prompt_tokens, usage.completion_tokens, usage.successful_requests)
+
+    answer = result.get("output_text", "").strip()
     sources = []
 
     for i, d in enumerate(source_docs, start=1):
@@ -120,10 +129,6 @@ def answer_query(user_query: str):
             snippet = snippet[:300] + "..."
         sources.append({"source": src, "snippet": snippet})
 
-    # Strict policy: if no retrieved sources, do not return a model-generated answer
-    if not sources:
-        return {"answer": "No relevant information found.", "sources": []}
-
     # If sources exist but the model produced an empty answer, still indicate no info
     if not answer:
         answer = "No relevant information found."
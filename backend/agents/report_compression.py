@@ -0,0 +1,226 @@
+# ---------------------------------------------------------------
+# Extractive pre-compression of report text
+# ---------------------------------------------------------------
+# - Runs locally before the summarization LLM call
+# - Strips boilerplate repeated across pages (letterhead, footers,
+#   page numbers)
+# - Always keeps lab-value lines (name, value, unit, reference range)
+# - Ranks the remaining sentences (sumy LexRank when installed, word
+#   frequency otherwise, plus a boost for clinically salient terms) and
+#   keeps the best ones, in report order, within a token budget
+# - Reports long enough for map-reduce summarization are not cut
+# - spaCy's rule-based sentencizer splits sentences when installed
+# ---------------------------------------
+
+import os
+import re
+import math
+import time
+from collections import Counter
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    from sumy.nlp.tokenizers import Tokenizer
+    from sumy.parsers.plaintext import PlaintextParser
+    from sumy.summarizers.lex_rank import LexRankSummarizer
+except ImportError:
+    LexRankSummarizer = None
+
+try:
+    import spacy
+except ImportError:
+    spacy = None
+
+# Token budget for a report summarized in one prompt (0 disables compression); keep it
+# below SUMMARY_MAP_REDUCE_TOKENS, longer reports are summarized map-reduce instead
+TOKEN_BUDGET = int(os.getenv("SUMMARY_INPUT_TOKEN_BUDGET", "4000"))
+# A line on at least this share of pages (and on two or more) is boilerplate
+BOILERPLATE_PAGE_SHARE = float(os.getenv("SUMMARY_BOILERPLATE_PAGE_SHARE", "0.5"))
+
+_encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+def count_tokens(text: str) -> int:
+    """Token count of text (about 4 characters per token without tiktoken)"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+UNITS = (
+    r"mg/dl|g/dl|g/l|mg/l|mmol/l|µmol/l|umol/l|mEq/l|iu/l|u/l|miu/l|µiu/ml|uiu/ml|ng/ml|ng/dl|pg/ml|pg|fl|"
+    r"x?\s?10\^?\d+/[µu]?l|cells/[µu]l|/[µu]l|/hpf|%|mm/hr|mmhg|bpm|sec|ratio"
+)
+# A number followed by a unit, a numeric reference range, or a high/low flag
+LAB_VALUE = re.compile(
+    rf"\d+(?:\.\d+)?\s*(?:{UNITS})(?![a-z])"
+    r"|(?<![\d./-])\d+(?:\.\d+)?\s*[-–]\s*\d+(?:\.\d+)?(?![\d.]*\s*[-/]\d)"
+    r"|\d+(?:\.\d+)?\s*\(?\b(?:h|l|high|low)\b\)?",
+    re.IGNORECASE,
+)
+# "Page 3", "Page 3 of 7", "3 / 7", "- 3 -"
+PAGE_NUMBER = re.compile(r"^\W*(page\s*\d+(\s*(of|/)\s*\d+)?|\d+\s*(of|/)\s*\d+|-\s*\d+\s*-)\W*$", re.IGNORECASE)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+WORD = re.compile(r"[a-z][a-z-]+")
+
+# Terms that mark sentences a summary must not lose
+SALIENT_TERMS = (
+    "diagnos", "impression", "assessment", "finding", "conclusion", "recommend", "advis", "follow-up",
+    "follow up", "medication", "prescri", "dose", "treat", "therapy", "symptom", "complain", "abnormal",
+    "elevated", "decreased", "positive", "negative", "discharge", "plan", "allerg", "history", "surgery",
+)
+STOPWORDS = frozenset(
+    "the a an and or of to in on for with at by from is are was were be been this that these those it its as "
+    "patient report page date name no not has have had".split()
+)
+
+def is_lab_line(line: str) -> bool:
+    """Whether a line carries a lab value (letters plus a value with unit, range or flag)"""
+    return any(c.isalpha() for c in line) and LAB_VALUE.search(line) is not None
+
+def _line_key(line: str) -> str:
+    # Page numbers, dates and other digits vary between otherwise identical lines
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+def strip_boilerplate(pages: list):
+    """Drop lines repeated across pages and bare page numbers; returns (pages, removed line count)"""
+    page_lines = [[line.strip() for line in page.splitlines() if line.strip()] for page in pages]
+    removed = 0
+    repeated = set()
+    if len(pages) >= 2:
+        seen_on = Counter(key for lines in page_lines for key in {_line_key(line) for line in lines})
+        min_pages = max(2, math.ceil(len(pages) * BOILERPLATE_PAGE_SHARE))
+        repeated = {key for key, count in seen_on.items() if count >= min_pages}
+
+    kept_lab_rows = set()
+    result = []
+    for lines in page_lines:
+        kept = []
+        for line in lines:
+            key = _line_key(line)
+            if PAGE_NUMBER.match(line):
+                removed += 1
+            elif key in repeated:
+                # A lab row repeated verbatim is kept once, anything else is letterhead
+                if is_lab_line(line) and line not in kept_lab_rows:
+                    kept_lab_rows.add(line)
+                    kept.append(line)
+                else:
+                    removed += 1
+            else:
+                kept.append(line)
+        result.append("\n".join(kept))
+    return result, removed
+
+_nlp = None
+
+def split_sentences(text: str) -> list:
+    global _nlp
+    if spacy is not None:
+        if _nlp is None:
+            _nlp = spacy.blank("en")
+            _nlp.add_pipe("sentencizer")
+        return [s.text.strip() for s in _nlp(text).sents if s.text.strip()]
+    return [s.strip() for s in SENTENCE_END.split(text) if s.strip()]
+
+def _lexrank_scores(sentences: list) -> dict | None:
+    """Sentence index -> LexRank rank score (1.0 for the best), or None without sumy"""
+    if LexRankSummarizer is None or len(sentences) < 2:
+        return None
+    try:
+        parser = PlaintextParser.from_string("\n".join(sentences), Tokenizer("english"))
+        ranked = LexRankSummarizer()(parser.document, len(parser.document.sentences))
+    except Exception:
+        # e.g. NLTK tokenizer data not downloaded
+        return None
+    order = {str(s).strip(): rank for rank, s in enumerate(ranked)}
+    return {i: 1.0 - order.get(s, len(order)) / max(1, len(order)) for i, s in enumerate(sentences)}
+
+def _frequency_scores(sentences: list) -> dict:
+    """Sentence index -> mean document frequency of its content words, scaled to 0..1"""
+    words = [[w for w in WORD.findall(s.lower()) if w not in STOPWORDS] for s in sentences]
+    freq = Counter(w for ws in words for w in ws)
+    top = max(freq.values(), default=1)
+    return {i: (sum(freq[w] for w in ws) / len(ws) / top if ws else 0.0) for i, ws in enumerate(words)}
+
+def score_sentences(sentences: list) -> dict:
+    scores = _lexrank_scores(sentences) or _frequency_scores(sentences)
+    for i, sentence in enumerate(sentences):
+        lowered = sentence.lower()
+        scores[i] += sum(0.5 for term in SALIENT_TERMS if term in lowered)
+    return scores
+
+def _report_units(pages: list) -> list:
+    """(page, line, sentence, text, is_lab) for every lab line and prose sentence, in report order.
+
+    Prose lines between two lab lines are joined before sentence splitting, since
+    PDF text wraps sentences across lines.
+    """
+    units = []
+    for page_number, page in enumerate(pages):
+        block, block_start = [], 0
+        lines = page.splitlines()
+        for line_number, line in enumerate(lines + [None]):
+            if line is not None and not is_lab_line(line):
+                if not block:
+                    block_start = line_number
+                block.append(line)
+                continue
+            for sentence_number, sentence in enumerate(split_sentences(" ".join(block)) if block else []):
+                units.append((page_number, block_start, sentence_number, sentence, False))
+            block = []
+            if line is not None:
+                units.append((page_number, line_number, 0, line, True))
+    return units
+
+def compress_report(pages: list, budget: int = None, max_tokens: int = None):
+    """Compress report pages for summarization; returns (pages, stats).
+
+    Boilerplate is always stripped. When the rest is still over budget, lab
+    lines are kept and the highest-scoring sentences fill what is left. Reports
+    still longer than max_tokens are not cut: the caller summarizes those in
+    parts (map-reduce), which sees the whole text.
+    """
+    budget = TOKEN_BUDGET if budget is None else budget
+    started = time.perf_counter()
+    original_tokens = count_tokens("\n".join(pages))
+    stats = {"original_tokens": original_tokens, "boilerplate_lines_removed": 0, "extractive": False}
+    if budget <= 0:
+        stats.update(compressed_tokens=original_tokens, compression_ratio=1.0, seconds=0.0)
+        return pages, stats
+
+    pages, stats["boilerplate_lines_removed"] = strip_boilerplate(pages)
+
+    stripped_tokens = count_tokens("\n".join(pages))
+    if budget < stripped_tokens and (max_tokens is None or stripped_tokens <= max_tokens):
+        stats["extractive"] = True
+        # Lab lines are never ranked out
+        units = _report_units(pages)
+        selected = [u for u in units if u[4]]
+        used = sum(count_tokens(u[3]) for u in selected)
+        prose_units = [u for u in units if not u[4]]
+        scores = score_sentences([u[3] for u in prose_units])
+        for i in sorted(scores, key=scores.get, reverse=True):
+            cost = count_tokens(prose_units[i][3])
+            if used + cost > budget:
+                continue
+            selected.append(prose_units[i])
+            used += cost
+
+        # Back to report order, one text per page
+        selected.sort(key=lambda u: u[:3])
+        pages = [
+            "\n".join(u[3] for u in selected if u[0] == page_number)
+            for page_number in range(len(pages))
+        ]
+        pages = [page for page in pages if page]
+
+    compressed_tokens = count_tokens("\n".join(pages))
+    stats.update(
+        compressed_tokens=compressed_tokens,
+        compression_ratio=round(original_tokens / max(1, compressed_tokens), 2),
+        seconds=round(time.perf_counter() - started, 4),
+    )
+    return pages, stats
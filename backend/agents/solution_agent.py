@@ -2,11 +2,17 @@
 # Acts like a medical center receptionist, provides empathetic responses and doctor info
 
 import os
+import sys
 import json
+from pathlib import Path
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+# Project root, for LLM usage accounting shared with the API (backend/utils/usage.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from backend.utils.usage import record_crew_usage
+
 # Setup environment
 load_dotenv()
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
@@ -108,7 +114,10 @@ class SolutionAgent:
             "conversation_stage": conversation_stage
         }
         
-        result = self.crew.kickoff(inputs=inputs)
+        # A copy per call: concurrent requests neither share task prompts nor token counters
+        crew = self.crew.copy()
+        result = crew.kickoff(inputs=inputs)
+        record_crew_usage("solution", crew, result)
         
         # Extract the agent's response
         task_result = result.tasks_output[0]
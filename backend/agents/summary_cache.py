@@ -0,0 +1,143 @@
+# ---------------------------------------------------------------
+# Document summary cache
+# ---------------------------------------------------------------
+# - Keyed by SHA-256 of (prompt version, input settings, normalized report
+#   text), so a re-uploaded or re-pasted report is answered without the summarizer
+# - Bumping the prompt version retires every older entry; each prompt that
+#   writes summaries (sequential summarizer, fused agent) has its own version
+# - In-memory LRU in front of SQLite next to the Chroma store
+# - Both tiers are size-bounded; least recently used entries go first
+# ---------------------------------------
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+# Persist under backend/chroma_mediconnect regardless of CWD
+PERSIST_DIR = str(Path(__file__).resolve().parents[1] / "chroma_mediconnect")
+CACHE_FILE = "summary_cache.sqlite3"
+
+# Entries kept in process memory, and total summary bytes kept on disk (0 disables a tier)
+MEMORY_ENTRIES = int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", "256"))
+MAX_DISK_MB = float(os.getenv("SUMMARY_CACHE_MAX_MB", "64"))
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def normalize_text(text):
+    """Collapse whitespace and Unicode variants so cosmetic differences hit the same entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+def summary_key(text, prompt_version, input_settings=""):
+    """Cache key for a report text under a prompt version and input preparation settings."""
+    payload = f"{prompt_version}\0{input_settings}\0{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """Two-tier (memory LRU + SQLite) map of summary key -> summary text."""
+    def __init__(self, path, memory_entries=MEMORY_ENTRIES, max_disk_bytes=int(MAX_DISK_MB * 1024 * 1024)):
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._conn = None
+        if max_disk_bytes > 0:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " key TEXT PRIMARY KEY,"
+                " summary TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+            self._conn.commit()
+
+    def _remember(self, key, summary):
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached summary for key, or None."""
+        with self._lock:
+            summary = self._memory.get(key)
+            if summary is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return summary
+            if self._conn is not None:
+                row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    self._remember(key, row[0])
+                    self._stats["disk_hits"] += 1
+                    return row[0]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, summary):
+        with self._lock:
+            self._remember(key, summary)
+            if self._conn is None:
+                return
+            size = len(summary.encode("utf-8"))
+            if size > self.max_disk_bytes:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used rows until the disk tier fits max_disk_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM summaries ORDER BY last_used").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+            total -= size
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            disk_entries, disk_bytes = (0, 0)
+            if self._conn is not None:
+                disk_entries, disk_bytes = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries"
+                ).fetchone()
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": round((lookups - self._stats["misses"]) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
+
+def get_summary_cache(persist_dir=PERSIST_DIR):
+    """Process-wide cache for persist_dir."""
+    with _caches_lock:
+        cache = _caches.get(persist_dir)
+        if cache is None:
+            os.makedirs(persist_dir, exist_ok=True)
+            cache = SummaryCache(os.path.join(persist_dir, CACHE_FILE))
+            _caches[persist_dir] = cache
+        return cache
@@ -0,0 +1,220 @@
+# ---------------------------------------------------------------
+# Versioned Chroma index generations
+# ---------------------------------------------------------------
+# - Each generation lives in its own Chroma collection
+# - Ingestion builds the next generation in a staging collection, starting
+#   from a full copy of the current one (O(index size) per build, so callers
+#   batch their changes into as few generations as possible)
+# - Publishing atomically replaces the pointer file (os.replace)
+# - Readers lease the current generation, so in-flight queries finish
+#   on the generation they started with while new queries see the new one
+# - Superseded generations are garbage-collected once nobody leases them
+# - Builds (begin -> publish/discard) hold build_lock(), a lock file shared by
+#   the API, the watcher service and the CLI, so generations are never
+#   allocated twice or built from a stale pointer
+# ---------------------------------------
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from langchain.vectorstores import Chroma
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Persist under backend/chroma_mediconnect regardless of CWD
+PERSIST_DIR = str(Path(__file__).resolve().parents[1] / "chroma_mediconnect")
+# Collection used before generations existed; treated as generation 0
+LEGACY_COLLECTION = "langchain"
+COLLECTION_PREFIX = "mediconnect_g"
+# Published generations kept on disk (current + previous), so readers in other
+# processes still holding the previous pointer can finish their queries
+KEEP_GENERATIONS = int(os.getenv("INDEX_KEEP_GENERATIONS", "2"))
+COPY_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_leases = {}    # generation -> active readers in this process
+_stores = {}    # generation -> Chroma handle opened for reading
+_pointer_cache = {"key": None, "pointer": None}
+
+def collection_name(generation):
+    """Chroma collection name for a generation."""
+    if generation == 0:
+        return LEGACY_COLLECTION
+    return f"{COLLECTION_PREFIX}{generation:06d}"
+
+def _pointer_path(persist_dir):
+    return os.path.join(persist_dir, "index_pointer.json")
+
+def read_pointer(persist_dir=PERSIST_DIR):
+    """Return the published pointer: {generation, collection, published_at}."""
+    path = _pointer_path(persist_dir)
+    if not os.path.exists(path):
+        return {"generation": 0, "collection": LEGACY_COLLECTION, "published_at": None}
+    with open(path, "r") as pf:
+        return json.load(pf)
+
+def current_pointer(persist_dir=PERSIST_DIR):
+    """Pointer with a stat-based cache; picks up publishes from other processes."""
+    path = _pointer_path(persist_dir)
+    try:
+        st = os.stat(path)
+        key = (persist_dir, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        key = (persist_dir, None, None)
+    if _pointer_cache["key"] != key:
+        _pointer_cache["pointer"] = read_pointer(persist_dir)
+        _pointer_cache["key"] = key
+    return _pointer_cache["pointer"]
+
+def _open(generation, embeddings, persist_dir):
+    return Chroma(
+        collection_name=collection_name(generation),
+        persist_directory=persist_dir,
+        embedding_function=embeddings,
+    )
+
+def _collection_names(store):
+    # list_collections() returns objects in older chromadb and names in newer releases
+    return [getattr(c, "name", c) for c in store._client.list_collections()]
+
+@contextmanager
+def build_lock(persist_dir=PERSIST_DIR):
+    """Hold the index build lock across threads and processes.
+
+    Every begin_generation() ... publish_generation()/discard_generation()
+    sequence must run under it. It blocks while another build is in progress.
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    with _build_lock, open(os.path.join(persist_dir, "index_build.lock"), "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def begin_generation(embeddings, persist_dir=PERSIST_DIR):
+    """Create the next generation as a staging copy of the current one.
+
+    Returns (generation, Chroma store). Nothing is visible to readers until
+    publish_generation() is called. Caller must hold build_lock().
+    Every stored chunk is copied, so the cost grows with the index rather than
+    with the change; apply related changes to one staging generation.
+    """
+    current = read_pointer(persist_dir)["generation"]
+    generation = current + 1
+    source = _open(current, embeddings, persist_dir)
+    # No other build can be running, so a leftover staging collection is from a crashed build
+    if collection_name(generation) in _collection_names(source):
+        source._client.delete_collection(collection_name(generation))
+    staging = _open(generation, embeddings, persist_dir)
+
+    offset = 0
+    while True:
+        batch = source._collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=COPY_BATCH_SIZE,
+            offset=offset,
+        )
+        if not batch["ids"]:
+            break
+        staging._collection.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+        offset += len(batch["ids"])
+    print(f"🧱 Staging generation {generation} created from generation {current} ({offset} chunks)")
+    return generation, staging
+
+def publish_generation(generation, persist_dir=PERSIST_DIR):
+    """Atomically point readers at generation."""
+    pointer = {
+        "generation": generation,
+        "collection": collection_name(generation),
+        "published_at": datetime.now(timezone.utc).isoformat(),
+    }
+    path = _pointer_path(persist_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as pf:
+        json.dump(pointer, pf, indent=2)
+    os.replace(tmp_path, path)
+    print(f"📌 Published index generation {generation}")
+    return pointer
+
+def discard_generation(store, generation):
+    """Drop an unpublished staging generation."""
+    try:
+        store._client.delete_collection(collection_name(generation))
+    except Exception:
+        pass
+
+def collect_garbage(embeddings, persist_dir=PERSIST_DIR, keep=KEEP_GENERATIONS):
+    """Delete generations older than the newest `keep` that are not leased in this process."""
+    current = read_pointer(persist_dir)["generation"]
+    oldest_kept = current - max(1, keep) + 1
+    store = _open(current, embeddings, persist_dir)
+    removed = []
+    for name in _collection_names(store):
+        if name == LEGACY_COLLECTION:
+            generation = 0
+        elif name.startswith(COLLECTION_PREFIX):
+            generation = int(name[len(COLLECTION_PREFIX):])
+        else:
+            continue
+        if generation >= oldest_kept:
+            continue
+        with _lock:
+            if _leases.get(generation):
+                continue
+            _stores.pop(generation, None)
+        store._client.delete_collection(name)
+        removed.append(name)
+    if removed:
+        print(f"🧹 Removed old index generations: {', '.join(removed)}")
+    return removed
+
+@contextmanager
+def lease_store(embeddings, persist_dir=PERSIST_DIR):
+    """Yield (generation, Chroma store) for the published generation.
+
+    The generation is not garbage-collected in this process while the lease is held.
+    """
+    with _lock:
+        generation = current_pointer(persist_dir)["generation"]
+        store = _stores.get(generation)
+        if store is None:
+            store = _open(generation, embeddings, persist_dir)
+            _stores[generation] = store
+        _leases[generation] = _leases.get(generation, 0) + 1
+    try:
+        yield generation, store
+    finally:
+        with _lock:
+            _leases[generation] -= 1
+            # Release handles of superseded generations once their last reader is done
+            if _leases[generation] == 0 and generation != current_pointer(persist_dir)["generation"]:
+                _leases.pop(generation, None)
+                _stores.pop(generation, None)
@@ -7,6 +7,11 @@ from pathlib import Path
 class Settings(BaseSettings):
     """Application settings from environment variables"""
     
+    # Storage backend: "mongo", "memory" (in-process, data is lost on restart)
+    # or "sqlite" (local file at SQLITE_PATH)
+    STORAGE_BACKEND: str = "mongo"
+    SQLITE_PATH: str = "mediconnect.sqlite3"
+
     # MongoDB configuration
     MONGO_URI: str
     MONGO_DB_NAME: str
@@ -14,10 +19,55 @@ class Settings(BaseSettings):
     # JWT authentication configuration
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
+    # Carry email and created_at in access tokens so requests need no users lookup
+    JWT_EMBED_USER_CLAIMS: bool = False
+
+    # Cache of users resolved from access tokens (TTL 0 disables the cache)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_ENTRIES: int = 10000
     
+    # Password hashing: bcrypt cost (existing hashes are upgraded on login) and pool size
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+
     # OpenAI API configuration
     OPENAI_API_KEY: str
 
+    # PDF upload limit for admin and chat uploads (enforced while streaming the upload)
+    MAX_PDF_UPLOAD_MB: int = 25
+
+    # Chat PDF text extraction: worker processes, per-page and per-document time budgets
+    PDF_EXTRACT_WORKERS: int = 2
+    PDF_PAGE_TIMEOUT_SECONDS: float = 5.0
+    PDF_EXTRACT_TIMEOUT_SECONDS: float = 120.0
+
+    # Run the data/ watch-folder ingestion service inside the API process
+    INGEST_WATCHER_ENABLED: bool = False
+
+    # Write-behind queue for chat persistence
+    CHAT_WRITE_BATCH_SIZE: int = 100
+    CHAT_WRITE_FLUSH_INTERVAL_MS: int = 200
+    CHAT_WRITE_MAX_RETRIES: int = 5
+    # Unwritten turns at which chat requests get 503 until the queue drains (0: unbounded)
+    CHAT_WRITE_MAX_QUEUE: int = 10000
+
+    # Server-held chat history for the delta protocol (idle expiry and session bound)
+    CHAT_SESSION_TTL_SECONDS: int = 3600
+    CHAT_SESSION_MAX_ENTRIES: int = 5000
+
+    # Move sessions idle this long to the compressed chat_archive collection
+    CHAT_ARCHIVE_ENABLED: bool = False
+    CHAT_ARCHIVE_IDLE_DAYS: int = 30
+    CHAT_ARCHIVE_INTERVAL_MINUTES: int = 60
+    CHAT_ARCHIVE_BATCH_SIZE: int = 200
+
+    # Delete chat sessions idle for this many days, checked every CHAT_ARCHIVE_INTERVAL_MINUTES (0 keeps history forever)
+    CHAT_RETENTION_DAYS: int = 0
+
+    # OpenTelemetry: OTLP/HTTP traces endpoint (e.g. http://localhost:4318/v1/traces); empty disables export
+    OTEL_TRACES_ENDPOINT: str = ""
+    OTEL_SERVICE_NAME: str = "mediconnect-backend"
+
     # Configuration for settings loading
     model_config = SettingsConfigDict(
         env_file=Path(__file__).parent.parent.parent / ".env",  # Look for .env in project root
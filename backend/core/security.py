@@ -7,18 +7,33 @@ from fastapi.security import OAuth2PasswordBearer
 from starlette.status import HTTP_401_UNAUTHORIZED
 from bson import ObjectId
 from backend.core.config import settings
-from backend.database.mongodb import get_db
+from backend.database.storage import get_storage
+from backend.utils.cache import TTLCache, ExpiringSet
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def create_access_token(subject: str) -> str:
-    """Create JWT access token"""
+# Access tokens are valid for 1 hour
+TOKEN_LIFETIME = timedelta(hours=1)
+
+# Resolved users keyed by user id, so authenticated requests skip the users lookup
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_ENTRIES, ttl=settings.USER_CACHE_TTL_SECONDS)
+# Users deactivated by this process, refused until every token issued before the
+# deactivation has expired. A dedicated set: unlike user_cache it never evicts an
+# entry early and does not depend on the USER_CACHE_* settings.
+# Both are per process: with several workers, the others notice a deactivation
+# only once their cached user expires (USER_CACHE_TTL_SECONDS), and tokens carrying
+# claims (JWT_EMBED_USER_CLAIMS) stay valid there until they expire themselves.
+deactivated_users = ExpiringSet(ttl=TOKEN_LIFETIME.total_seconds())
+
+def create_access_token(subject: str, claims: dict | None = None) -> str:
+    """Create JWT access token, optionally carrying extra user claims"""
     # Set expiration time (1 hour)
-    expire = datetime.now(timezone.utc) + timedelta(hours=1)
+    expire = datetime.now(timezone.utc) + TOKEN_LIFETIME
     
     # Create token payload
     payload = {
+        **(claims or {}),
         "sub": subject,
         "exp": expire
     }
@@ -26,7 +41,7 @@ def create_access_token(subject: str) -> str:
     # Encode JWT token
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), storage=Depends(get_storage)):
     """Validate JWT token and return user"""
     # Credentials exception for auth failures
     credentials_exception = HTTPException(
@@ -49,15 +64,63 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     except jwt.InvalidTokenError:
         raise credentials_exception
 
+    if user_id in deactivated_users:
+        raise credentials_exception
+
+    # Tokens issued with user claims need no database lookup at all
+    if settings.JWT_EMBED_USER_CLAIMS and "email" in payload and "created_at" in payload:
+        return {
+            "id": user_id,
+            "email": payload["email"],
+            "created_at": datetime.fromisoformat(payload["created_at"])
+        }
+
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+
     # Find user in database
-    user = await db["users"].find_one({"_id": ObjectId(user_id)})
+    if storage is None:
+        raise credentials_exception
+    user = await storage.get_user_by_id(user_id)
     
-    if not user:
+    if not user or not user.get("is_active", True):
         raise credentials_exception
 
     # Return user information
-    return {
+    current_user = {
         "id": str(user["_id"]),
         "email": user["email"],
         "created_at": user["created_at"]
     }
+    user_cache.set(user_id, current_user)
+    return dict(current_user)
+
+async def get_current_admin(token: str = Depends(oauth2_scheme)) -> str:
+    """Validate an admin JWT token (issued by /admin/login)"""
+    credentials_exception = HTTPException(
+        status_code=HTTP_401_UNAUTHORIZED,
+        detail="Invalid admin credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        raise credentials_exception
+    if payload.get("sub") != "admin":
+        raise credentials_exception
+    return payload["sub"]
+
+def user_token_claims(user: dict) -> dict:
+    """Claims carried in the token when JWT_EMBED_USER_CLAIMS is enabled"""
+    if not settings.JWT_EMBED_USER_CLAIMS:
+        return {}
+    return {"email": user["email"], "created_at": user["created_at"].isoformat()}
+
+def invalidate_user(user_id: str, deactivated: bool = False):
+    """Drop a cached user; deactivated users are also refused while their tokens live"""
+    user_cache.invalidate(user_id)
+    if deactivated:
+        deactivated_users.add(user_id)
+    else:
+        deactivated_users.discard(user_id)
@@ -0,0 +1,267 @@
+# Cold-session archival and compaction for chat history
+#
+# Sessions idle for CHAT_ARCHIVE_IDLE_DAYS have their turns moved out of the hot
+# chat_turns collection into one compressed document in chat_archive (zstd when
+# the zstandard package is installed, zlib otherwise). The session header stays
+# in chat_details as a small summary row flagged `archived`. Reading a session's
+# turns restores it transparently.
+#
+# With CHAT_RETENTION_DAYS set, sessions idle that long are deleted as a whole
+# (turns, archive and header), so no session is left with a partial hash chain.
+
+import zlib
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import bson
+from bson import Binary
+from pymongo.errors import BulkWriteError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from backend.core.config import settings
+from backend.database.mongodb import get_db, CHAT_SESSIONS, CHAT_TURNS
+from backend.utils.session_history import forget_session
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CHAT_ARCHIVE = "chat_archive"
+DUPLICATE_KEY = 11000
+
+def compress_turns(turns: list):
+    """Return (codec, compressed BSON, uncompressed size) for a list of turn documents"""
+    raw = bson.encode({"turns": turns})
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw), len(raw)
+    return "zlib", zlib.compress(raw, 9), len(raw)
+
+def decompress_turns(archive: dict) -> list:
+    data = bytes(archive["data"])
+    if archive["codec"] == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive is zstd-compressed but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return bson.decode(raw)["turns"]
+
+def cold_sessions_filter(cutoff: datetime) -> dict:
+    """Hot sessions with no activity (or restore) since cutoff"""
+    return {
+        # Equality on null also matches headers without the field, so the
+        # (archived, updated_at) index serves this query
+        "archived": None,
+        "updated_at": {"$lt": cutoff},
+        "$or": [{"restored_at": {"$exists": False}}, {"restored_at": {"$lt": cutoff}}],
+    }
+
+async def archive_session(db, header: dict) -> dict:
+    """Move one session's turns into its compressed archive document"""
+    session_id = header["session_id"]
+    turns = await db[CHAT_TURNS].find({"session_id": session_id}).sort("_id", 1).to_list(length=None)
+    hot_ids = [t["_id"] for t in turns]
+
+    # Turns archived before and never restored are merged with the new ones
+    existing = await db[CHAT_ARCHIVE].find_one({"_id": session_id})
+    if existing is not None:
+        archived = decompress_turns(existing)
+        archived_ids = {t["_id"] for t in archived}
+        turns = archived + [t for t in turns if t["_id"] not in archived_ids]
+
+    codec, data, raw_bytes = compress_turns(turns)
+    await db[CHAT_ARCHIVE].replace_one(
+        {"_id": session_id},
+        {
+            "_id": session_id,
+            "user_id": header.get("user_id"),
+            "codec": codec,
+            "data": Binary(data),
+            "turn_count": len(turns),
+            "raw_bytes": raw_bytes,
+            "compressed_bytes": len(data),
+            "updated_at": header.get("updated_at"),
+            "archived_at": datetime.now(timezone.utc),
+        },
+        upsert=True,
+    )
+    # Only after the archive is stored; a crash in between leaves duplicates that restore ignores
+    if hot_ids:
+        await db[CHAT_TURNS].delete_many({"_id": {"$in": hot_ids}})
+    await db[CHAT_SESSIONS].update_one(
+        {"session_id": session_id},
+        {
+            "$set": {"archived": True, "archived_at": datetime.now(timezone.utc)},
+            "$unset": {"last_classification": "", "restored_at": ""},
+        },
+    )
+    forget_session(session_id)
+    return {"turns": len(turns), "raw_bytes": raw_bytes, "compressed_bytes": len(data)}
+
+async def restore_session(db, session_id: str) -> int:
+    """Move an archived session's turns back into chat_turns; returns the number restored"""
+    archive = await db[CHAT_ARCHIVE].find_one({"_id": session_id})
+    restored = 0
+    if archive is not None:
+        turns = decompress_turns(archive)
+        if turns:
+            try:
+                await db[CHAT_TURNS].insert_many(turns, ordered=False)
+            except BulkWriteError as e:
+                # Turns still hot from an interrupted archive run
+                if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                    raise
+            restored = len(turns)
+    await db[CHAT_SESSIONS].update_one(
+        {"session_id": session_id},
+        {"$unset": {"archived": "", "archived_at": ""}, "$set": {"restored_at": datetime.now(timezone.utc)}},
+    )
+    if archive is not None:
+        await db[CHAT_ARCHIVE].delete_one({"_id": session_id})
+    logger.info(f"Restored {restored} archived turn(s) for session_id: {session_id}")
+    return restored
+
+async def archive_cold_sessions(idle_days: int = None, batch_size: int = None) -> dict:
+    """Archive up to batch_size sessions idle for idle_days"""
+    db = await get_db()
+    if db is None:
+        return {"status": "skipped", "reason": "no database connection"}
+    idle_days = settings.CHAT_ARCHIVE_IDLE_DAYS if idle_days is None else idle_days
+    batch_size = batch_size or settings.CHAT_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=idle_days)
+
+    report = {"status": "success", "sessions": 0, "turns": 0, "raw_bytes": 0, "compressed_bytes": 0, "failed": 0}
+    headers = db[CHAT_SESSIONS].find(cold_sessions_filter(cutoff)).limit(batch_size)
+    async for header in headers:
+        try:
+            result = await archive_session(db, header)
+        except Exception as e:
+            logger.error(f"Failed to archive session {header.get('session_id')}: {e}")
+            report["failed"] += 1
+            continue
+        report["sessions"] += 1
+        report["turns"] += result["turns"]
+        report["raw_bytes"] += result["raw_bytes"]
+        report["compressed_bytes"] += result["compressed_bytes"]
+    if report["raw_bytes"]:
+        report["compression_ratio"] = round(report["raw_bytes"] / max(1, report["compressed_bytes"]), 2)
+    if report["sessions"]:
+        logger.info(f"Archived {report['sessions']} cold chat session(s), {report['turns']} turn(s)")
+    return report
+
+async def expire_sessions(retention_days: int = None, batch_size: int = None) -> dict:
+    """Delete up to batch_size sessions idle for retention_days, with all of their turns"""
+    retention_days = settings.CHAT_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return {"status": "skipped", "reason": "retention disabled"}
+    db = await get_db()
+    if db is None:
+        return {"status": "skipped", "reason": "no database connection"}
+    batch_size = batch_size or settings.CHAT_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+    report = {"status": "success", "sessions": 0, "turns": 0, "failed": 0}
+    headers = db[CHAT_SESSIONS].find({"updated_at": {"$lt": cutoff}}, {"session_id": 1}).limit(batch_size)
+    async for header in headers:
+        session_id = header["session_id"]
+        try:
+            turns = await db[CHAT_TURNS].delete_many({"session_id": session_id})
+            await db[CHAT_ARCHIVE].delete_one({"_id": session_id})
+            # Header last: a failure before this point is retried on the next run
+            await db[CHAT_SESSIONS].delete_one({"session_id": session_id, "updated_at": {"$lt": cutoff}})
+            # A reused session_id starts a new chain instead of linking to the deleted one
+            forget_session(session_id)
+        except Exception as e:
+            logger.error(f"Failed to expire session {session_id}: {e}")
+            report["failed"] += 1
+            continue
+        report["sessions"] += 1
+        report["turns"] += turns.deleted_count
+    if report["sessions"]:
+        logger.info(f"Expired {report['sessions']} chat session(s), {report['turns']} turn(s)")
+    return report
+
+async def storage_status() -> dict:
+    """Document counts plus data and index sizes of the hot and archive collections"""
+    db = await get_db()
+    if db is None:
+        return {"status": "unavailable"}
+    status = {}
+    for name in (CHAT_SESSIONS, CHAT_TURNS, CHAT_ARCHIVE):
+        try:
+            stats = await db.command("collStats", name)
+        except Exception:
+            stats = {}
+        status[name] = {
+            "documents": stats.get("count", 0),
+            "data_bytes": stats.get("size", 0),
+            "storage_bytes": stats.get("storageSize", 0),
+            "index_bytes": stats.get("totalIndexSize", 0),
+        }
+    status["archived_sessions"] = await db[CHAT_SESSIONS].count_documents({"archived": True})
+    return status
+
+class ChatArchiver:
+    """Background job that archives cold sessions and expires old ones every interval"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.last_run_at = None
+        self.last_report = None
+        self.last_retention_report = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Chat archiver started (every {self.interval:.0f}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> dict:
+        self.last_report = await archive_cold_sessions()
+        self.last_run_at = datetime.now(timezone.utc).isoformat()
+        return self.last_report
+
+    async def expire_once(self) -> dict:
+        self.last_retention_report = await expire_sessions()
+        return self.last_retention_report
+
+    async def _run(self):
+        while True:
+            try:
+                # Keep going while full batches are processed
+                if settings.CHAT_ARCHIVE_ENABLED:
+                    while (await self.run_once()).get("sessions", 0) >= settings.CHAT_ARCHIVE_BATCH_SIZE:
+                        pass
+                while (await self.expire_once()).get("sessions", 0) >= settings.CHAT_ARCHIVE_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"Chat archiver run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "idle_days": settings.CHAT_ARCHIVE_IDLE_DAYS,
+            "codec": "zstd" if zstandard is not None else "zlib",
+            "last_run_at": self.last_run_at,
+            "last_report": self.last_report,
+            "retention_days": settings.CHAT_RETENTION_DAYS,
+            "last_retention_report": self.last_retention_report,
+        }
+
+# Global archiver instance (started when CHAT_ARCHIVE_ENABLED or CHAT_RETENTION_DAYS is set)
+chat_archiver = ChatArchiver(interval=settings.CHAT_ARCHIVE_INTERVAL_MINUTES * 60)
@@ -0,0 +1,112 @@
+# Declarative MongoDB index registry
+#
+# Every index the application relies on is declared here and ensured at startup
+# by connect_to_mongo(). Index usage is reported with $indexStats.
+
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from backend.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Suffix for TTL indexes, which are managed (created, retuned, dropped) by ensure_indexes.
+# None are declared any more; the chat TTL indexes of earlier versions are dropped at startup.
+TTL_SUFFIX = "_ttl"
+
+def index_registry() -> dict:
+    """Collection name -> list of index specs the application queries rely on"""
+    registry = {
+        "users": [
+            # Login and signup look users up by email
+            {"keys": [("email", ASCENDING)], "name": "email_1", "unique": True},
+        ],
+        "chat_details": [
+            # Session header upserts and reads filter on session_id
+            {"keys": [("session_id", ASCENDING)], "name": "session_id_1", "unique": True},
+            # A user's sessions, most recently active first
+            {"keys": [("user_id", ASCENDING), ("updated_at", DESCENDING)], "name": "user_id_1_updated_at_-1"},
+            # Cold-session scan of the archiver (archived is null for hot sessions)
+            {"keys": [("archived", ASCENDING), ("updated_at", ASCENDING)], "name": "archived_1_updated_at_1"},
+        ],
+        "chat_turns": [
+            # Turns of a session in order, and turns after a given turn id
+            {"keys": [("session_id", ASCENDING), ("_id", ASCENDING)], "name": "session_id_1__id_1"},
+        ],
+        "pdfs": [
+            # Uploads upsert PDF metadata by title
+            {"keys": [("title", ASCENDING)], "name": "title_1", "unique": True},
+            {"keys": [("sha256", ASCENDING)], "name": "sha256_1"},
+        ],
+    }
+
+    if settings.CHAT_RETENTION_DAYS > 0:
+        # Retention sweep of the archive job (expire_sessions). Sessions expire as a whole,
+        # not through TTL indexes: a TTL on chat_turns would delete the oldest turns of a
+        # live session and break its hash chain, which is verified from GENESIS_HASH.
+        registry["chat_details"].append({"keys": [("updated_at", ASCENDING)], "name": "updated_at_1"})
+    return registry
+
+def _index_model(spec: dict) -> IndexModel:
+    return IndexModel(spec["keys"], **{k: v for k, v in spec.items() if k != "keys"})
+
+def index_models(collection: str) -> list:
+    """IndexModel objects for one collection (usable with Motor and PyMongo)"""
+    return [_index_model(spec) for spec in index_registry().get(collection, [])]
+
+async def ensure_indexes(db) -> dict:
+    """Create missing indexes, retune TTLs and drop TTL indexes no longer declared"""
+    summary = {"created": [], "updated": [], "dropped": [], "failed": []}
+    for collection, specs in index_registry().items():
+        existing = await db[collection].index_information()
+
+        # TTL indexes that were switched off in the configuration
+        declared = {spec["name"] for spec in specs}
+        for name in existing:
+            if name.endswith(TTL_SUFFIX) and name not in declared:
+                await db[collection].drop_index(name)
+                summary["dropped"].append(f"{collection}.{name}")
+
+        for spec in specs:
+            label = f"{collection}.{spec['name']}"
+            current = existing.get(spec["name"])
+            if current is not None:
+                expire = spec.get("expireAfterSeconds")
+                if expire is not None and current.get("expireAfterSeconds") != expire:
+                    await db.command(
+                        "collMod", collection, index={"name": spec["name"], "expireAfterSeconds": expire}
+                    )
+                    summary["updated"].append(label)
+                continue
+            try:
+                await db[collection].create_indexes([_index_model(spec)])
+                summary["created"].append(label)
+            except OperationFailure as e:
+                # e.g. duplicate values for a unique index, or the same keys under another name
+                logger.error(f"Failed to create index {label}: {e}")
+                summary["failed"].append(label)
+
+    if summary["created"] or summary["updated"] or summary["dropped"]:
+        logger.info(f"Indexes ensured: {summary}")
+    return summary
+
+async def index_usage(db) -> dict:
+    """Per-collection index usage counters from $indexStats"""
+    usage = {}
+    for collection in index_registry():
+        stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(length=None)
+        usage[collection] = sorted(
+            (
+                {
+                    "name": s["name"],
+                    "key": dict(s["key"]),
+                    "ops": s["accesses"]["ops"],
+                    "since": s["accesses"]["since"],
+                }
+                for s in stats
+            ),
+            key=lambda s: s["name"],
+        )
+    return usage
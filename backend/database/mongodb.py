@@ -3,6 +3,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from fastapi import Depends
 from backend.core.config import settings
+from backend.database.indexes import ensure_indexes
 import logging
 
 # Setup logging
@@ -25,8 +26,11 @@ async def connect_to_mongo():
         # Test connection
         await _client.admin.command('ping')
         
-        # Create unique index on email field
-        await _db["users"].create_index("email", unique=True)
+        # Create the indexes declared in the index registry
+        await ensure_indexes(_db)
+
+        # Move sessions still stored as full-history documents to the turn layout
+        await migrate_legacy_chat_details()
         
         print("✅ MongoDB connection successful")
         logger.info("MongoDB connected successfully")
@@ -56,24 +60,112 @@ async def get_db() -> AsyncIOMotorDatabase:
         return None
     return _db
 
-async def upsert_chat_detail(chat_detail: dict):
-    """Upsert chat detail into MongoDB based on session_id"""
+# Chat storage layout (append-only):
+# - chat_details: one compact header per session, updated with $inc/$set/$push
+# - chat_turns: one immutable document per turn, never rewritten
+CHAT_SESSIONS = "chat_details"
+CHAT_TURNS = "chat_turns"
+# Intents kept on the session header (bounded with $slice)
+RECENT_INTENTS = 20
+# Daily LLM usage: one document per user and UTC day ("<user_id>:<YYYY-MM-DD>"), updated with $inc
+LLM_USAGE = "llm_usage"
+USAGE_COUNTERS = ("prompt_tokens", "completion_tokens", "total_tokens", "llm_calls", "cost_usd")
+
+def session_header_update(turn: dict) -> dict:
+    """Header update for one appended turn; constant size regardless of session length"""
+    intent = (turn.get("classification") or {}).get("intent")
+    update = {
+        "$setOnInsert": {
+            "session_id": turn["session_id"],
+            "user_id": turn.get("user_id"),
+            "created_at": turn["created_at"],
+        },
+        "$set": {
+            "updated_at": turn["created_at"],
+            "last_turn_id": turn["_id"],
+            "last_classification": turn.get("classification"),
+            "chain_head": turn.get("chain_hash"),
+        },
+        "$inc": {"turn_count": 1, "message_count": len(turn.get("messages", []))},
+    }
+    if intent:
+        update["$push"] = {"recent_intents": {"$each": [intent], "$slice": -RECENT_INTENTS}}
+    return update
+
+def merge_session_header_updates(earlier: dict, later: dict) -> dict:
+    """Coalesce two header updates for the same session into one, as if applied in order"""
+    merged = {
+        # First insert wins, later $set wins, counters add up, pushes concatenate
+        "$setOnInsert": {**later.get("$setOnInsert", {}), **earlier.get("$setOnInsert", {})},
+        "$set": {**earlier.get("$set", {}), **later.get("$set", {})},
+        "$inc": dict(earlier.get("$inc", {})),
+    }
+    for field, amount in later.get("$inc", {}).items():
+        merged["$inc"][field] = merged["$inc"].get(field, 0) + amount
+    pushes = {}
+    for update in (earlier, later):
+        for field, spec in update.get("$push", {}).items():
+            entry = pushes.setdefault(field, {"$each": [], "$slice": spec["$slice"]})
+            entry["$each"] = (entry["$each"] + spec["$each"])[spec["$slice"]:]
+    if pushes:
+        merged["$push"] = pushes
+    return merged
+
+def usage_update(user_id: str, day: str, usage: dict) -> dict:
+    """Daily usage increment for one request's usage summary (see backend/utils/usage.py)"""
+    inc = {"requests": 1, **{field: usage.get(field, 0) for field in USAGE_COUNTERS}}
+    for agent, entry in usage.get("agents", {}).items():
+        for field in USAGE_COUNTERS:
+            inc[f"agents.{agent}.{field}"] = entry.get(field, 0)
+    return {"$setOnInsert": {"user_id": user_id, "day": day}, "$inc": inc}
+
+def merge_usage_updates(earlier: dict, later: dict) -> dict:
+    """Coalesce two usage increments for the same user and day"""
+    merged = {"$setOnInsert": earlier["$setOnInsert"], "$inc": dict(earlier["$inc"])}
+    for field, amount in later["$inc"].items():
+        merged["$inc"][field] = merged["$inc"].get(field, 0) + amount
+    return merged
+
+async def migrate_legacy_chat_details():
+    """Convert sessions stored as one full-history document into header + turn layout"""
     global _db
     if _db is None:
-        logger.warning("No database connection available, skipping chat detail upsert")
-        return None
-    try:
-        collection = _db["chat_details"]
-        result = await collection.update_one(
-            {"session_id": chat_detail["session_id"]},
-            {"$set": chat_detail},
-            upsert=True
+        return 0
+    migrated = 0
+    async for legacy in _db[CHAT_SESSIONS].find({"chat_history": {"$exists": True}}):
+        created_at = legacy.get("updated_at") or legacy.get("created_at")
+        turn = {
+            "_id": legacy["_id"],
+            "session_id": legacy["session_id"],
+            "user_id": legacy.get("user_id"),
+            "messages": legacy.get("chat_history", []),
+            "classification": legacy.get("classification"),
+            "rag_context": legacy.get("rag_context"),
+            "followup_questions": legacy.get("followup_questions"),
+            "hashed_details": legacy.get("hashed_details"),
+            "created_at": created_at,
+            "migrated_from_legacy": True,
+        }
+        await _db[CHAT_TURNS].update_one({"_id": turn["_id"]}, {"$setOnInsert": turn}, upsert=True)
+        intent = (legacy.get("classification") or {}).get("intent")
+        await _db[CHAT_SESSIONS].update_one(
+            {"_id": legacy["_id"]},
+            {
+                "$set": {
+                    "updated_at": created_at,
+                    "last_turn_id": legacy["_id"],
+                    "last_classification": legacy.get("classification"),
+                    "turn_count": 1,
+                    "message_count": len(turn["messages"]),
+                    "recent_intents": [intent] if intent else [],
+                },
+                "$unset": {
+                    "chat_history": "", "message": "", "response": "", "classification": "",
+                    "rag_context": "", "followup_questions": "", "hashed_details": "",
+                },
+            }
         )
-        if result.upserted_id:
-            logger.info(f"Chat detail upserted with new ID: {result.upserted_id}")
-        else:
-            logger.info(f"Chat detail updated for session_id: {chat_detail['session_id']}")
-        return result.upserted_id or result.modified_count
-    except Exception as e:
-        logger.error(f"Failed to upsert chat detail: {e}")
-        return None
+        migrated += 1
+    if migrated:
+        logger.info(f"Migrated {migrated} legacy chat session(s) to the append-only layout")
+    return migrated
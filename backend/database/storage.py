@@ -0,0 +1,469 @@
+# Pluggable storage backends for users, chat history and PDF metadata
+#
+# STORAGE_BACKEND selects the implementation:
+# - "mongo":  MongoDB through Motor (default)
+# - "memory": in-process dictionaries, for tests and load benchmarks on a single
+#             machine without a MongoDB service (data is lost on restart)
+# - "sqlite": one local SQLite file (SQLITE_PATH), for single-machine runs that
+#             should keep their data across restarts; documents are stored as BSON
+
+import copy
+import asyncio
+from abc import ABC, abstractmethod
+import logging
+import sqlite3
+import threading
+import bson
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from backend.core.config import settings
+from backend.database import mongodb
+from backend.database.mongodb import CHAT_SESSIONS, CHAT_TURNS, LLM_USAGE
+from backend.database.archive import restore_session
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+class Storage(ABC):
+    """Operations the application performs on its persistent data
+
+    Every operation is abstract, so a backend that misses one fails when it is
+    instantiated rather than when the operation is first called.
+    """
+    name = "base"
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @property
+    @abstractmethod
+    def available(self) -> bool:
+        """Whether the backend can serve requests right now"""
+        raise NotImplementedError
+
+    # --- Users ---
+    @abstractmethod
+    async def get_user_by_email(self, email: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_user(self, user: dict) -> dict:
+        """Insert a user; raises DuplicateKeyError when the email is taken"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_user(self, user_id: str, fields: dict) -> bool:
+        """Set fields on a user; returns whether the user exists"""
+        raise NotImplementedError
+
+    # --- Chat history ---
+    @abstractmethod
+    async def insert_chat_turns(self, turns: list) -> list:
+        """Insert turn documents; returns the turns that could not be written.
+
+        Turns that already exist count as written, so retries are safe.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def apply_session_updates(self, updates: list) -> list:
+        """Upsert session headers from [(session_id, update)]; returns the pairs not applied"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_session_header(self, session_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_session_turns(self, session_id: str, after_turn_id=None, limit: int | None = None) -> list:
+        raise NotImplementedError
+
+    # --- LLM usage ---
+    @abstractmethod
+    async def apply_usage_updates(self, updates: list) -> list:
+        """Upsert daily usage totals from [((user_id, day), update)]; returns the pairs not applied"""
+        raise NotImplementedError
+
+    # --- PDF metadata ---
+    @abstractmethod
+    async def upsert_pdf(self, title: str, meta: dict):
+        raise NotImplementedError
+
+class MongoStorage(Storage):
+    """MongoDB (Motor) implementation"""
+    name = "mongo"
+
+    def __init__(self, db=None):
+        # None uses the application connection from database.mongodb
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else mongodb._db
+
+    @property
+    def available(self) -> bool:
+        return self.db is not None
+
+    async def connect(self):
+        if self._db is None:
+            await mongodb.connect_to_mongo()
+
+    async def close(self):
+        if self._db is None:
+            await mongodb.close_mongo_connection()
+
+    async def get_user_by_email(self, email: str):
+        return await self.db["users"].find_one({"email": email})
+
+    async def get_user_by_id(self, user_id: str):
+        return await self.db["users"].find_one({"_id": ObjectId(user_id)})
+
+    async def create_user(self, user: dict) -> dict:
+        result = await self.db["users"].insert_one(dict(user))
+        return await self.db["users"].find_one({"_id": result.inserted_id})
+
+    async def update_user(self, user_id: str, fields: dict) -> bool:
+        result = await self.db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": fields})
+        return result.matched_count > 0
+
+    async def insert_chat_turns(self, turns: list) -> list:
+        if not turns:
+            return []
+        try:
+            await self.db[CHAT_TURNS].bulk_write([InsertOne(turn) for turn in turns], ordered=False)
+            return []
+        except BulkWriteError as e:
+            # Duplicate keys mean a turn was stored by an earlier attempt
+            failed = {
+                err["index"] for err in e.details.get("writeErrors", [])
+                if err.get("code") != DUPLICATE_KEY
+            }
+            return [turn for i, turn in enumerate(turns) if i in failed]
+
+    async def apply_session_updates(self, updates: list) -> list:
+        if not updates:
+            return []
+        ops = [UpdateOne({"session_id": session_id}, update, upsert=True) for session_id, update in updates]
+        try:
+            await self.db[CHAT_SESSIONS].bulk_write(ops, ordered=False)
+            return []
+        except BulkWriteError as e:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            return [pair for i, pair in enumerate(updates) if i in failed]
+
+    async def get_session_header(self, session_id: str):
+        return await self.db[CHAT_SESSIONS].find_one({"session_id": session_id})
+
+    async def get_session_turns(self, session_id: str, after_turn_id=None, limit: int | None = None) -> list:
+        # Cold sessions are restored from the archive on access
+        if await self.db[CHAT_SESSIONS].find_one({"session_id": session_id, "archived": True}, {"_id": 1}):
+            await restore_session(self.db, session_id)
+        query = {"session_id": session_id}
+        if after_turn_id is not None:
+            query["_id"] = {"$gt": after_turn_id}
+        cursor = self.db[CHAT_TURNS].find(query).sort("_id", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def apply_usage_updates(self, updates: list) -> list:
+        if not updates:
+            return []
+        ops = [UpdateOne({"_id": f"{user_id}:{day}"}, update, upsert=True) for (user_id, day), update in updates]
+        try:
+            await self.db[LLM_USAGE].bulk_write(ops, ordered=False)
+            return []
+        except BulkWriteError as e:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            return [pair for i, pair in enumerate(updates) if i in failed]
+
+    async def upsert_pdf(self, title: str, meta: dict):
+        await self.db["pdfs"].update_one(
+            {"title": title},
+            {"$set": meta, "$setOnInsert": {"created_at": meta.get("uploaded_at")}},
+            upsert=True,
+        )
+
+def apply_update(doc: dict, update: dict, inserted: bool) -> dict:
+    """Apply the MongoDB update operators the application uses to a plain document"""
+    if inserted:
+        doc.update(copy.deepcopy(update.get("$setOnInsert", {})))
+    doc.update(copy.deepcopy(update.get("$set", {})))
+    for field, amount in update.get("$inc", {}).items():
+        # Dotted fields address nested documents ("agents.solution.prompt_tokens")
+        *parents, leaf = field.split(".")
+        target = doc
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = target.get(leaf, 0) + amount
+    for field, spec in update.get("$push", {}).items():
+        values = doc.get(field, []) + list(spec["$each"])
+        doc[field] = values[spec["$slice"]:] if "$slice" in spec else values
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+    return doc
+
+class MemoryStorage(Storage):
+    """In-process implementation; documents are deep-copied in and out like a real store"""
+    name = "memory"
+    available = True
+
+    def __init__(self):
+        self.users = {}           # ObjectId -> user
+        self.users_by_email = {}  # email -> ObjectId
+        self.sessions = {}        # session_id -> header
+        self.turns = {}           # session_id -> {turn _id: turn}
+        self.pdfs = {}            # title -> metadata
+        self.usage = {}           # "<user_id>:<day>" -> daily LLM usage
+
+    async def get_user_by_email(self, email: str):
+        user_id = self.users_by_email.get(email)
+        return copy.deepcopy(self.users[user_id]) if user_id is not None else None
+
+    async def get_user_by_id(self, user_id: str):
+        user = self.users.get(ObjectId(user_id))
+        return copy.deepcopy(user) if user is not None else None
+
+    async def create_user(self, user: dict) -> dict:
+        if user["email"] in self.users_by_email:
+            raise DuplicateKeyError(f"E11000 duplicate key error: email {user['email']}")
+        user = copy.deepcopy(user)
+        user.setdefault("_id", ObjectId())
+        self.users[user["_id"]] = user
+        self.users_by_email[user["email"]] = user["_id"]
+        return copy.deepcopy(user)
+
+    async def update_user(self, user_id: str, fields: dict) -> bool:
+        user = self.users.get(ObjectId(user_id))
+        if user is None:
+            return False
+        user.update(copy.deepcopy(fields))
+        return True
+
+    async def insert_chat_turns(self, turns: list) -> list:
+        for turn in turns:
+            self.turns.setdefault(turn["session_id"], {}).setdefault(turn["_id"], copy.deepcopy(turn))
+        return []
+
+    async def apply_session_updates(self, updates: list) -> list:
+        for session_id, update in updates:
+            header = self.sessions.get(session_id)
+            inserted = header is None
+            if inserted:
+                header = self.sessions[session_id] = {"_id": ObjectId(), "session_id": session_id}
+            apply_update(header, update, inserted)
+        return []
+
+    async def get_session_header(self, session_id: str):
+        header = self.sessions.get(session_id)
+        return copy.deepcopy(header) if header is not None else None
+
+    async def get_session_turns(self, session_id: str, after_turn_id=None, limit: int | None = None) -> list:
+        turns = sorted(self.turns.get(session_id, {}).values(), key=lambda t: t["_id"])
+        if after_turn_id is not None:
+            turns = [t for t in turns if t["_id"] > after_turn_id]
+        if limit:
+            turns = turns[:limit]
+        return copy.deepcopy(turns)
+
+    async def apply_usage_updates(self, updates: list) -> list:
+        for (user_id, day), update in updates:
+            key = f"{user_id}:{day}"
+            inserted = key not in self.usage
+            doc = self.usage.setdefault(key, {"_id": key})
+            apply_update(doc, update, inserted)
+        return []
+
+    async def upsert_pdf(self, title: str, meta: dict):
+        inserted = title not in self.pdfs
+        doc = self.pdfs.setdefault(title, {"_id": ObjectId(), "title": title})
+        apply_update(doc, {"$set": meta, "$setOnInsert": {"created_at": meta.get("uploaded_at")}}, inserted)
+
+class SQLiteStorage(Storage):
+    """SQLite implementation; each document is one BSON blob keyed by its lookup fields"""
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, email TEXT UNIQUE NOT NULL, doc BLOB NOT NULL);
+        CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, doc BLOB NOT NULL);
+        CREATE TABLE IF NOT EXISTS chat_turns (
+            session_id TEXT NOT NULL, id TEXT NOT NULL, doc BLOB NOT NULL, PRIMARY KEY (session_id, id)
+        );
+        CREATE TABLE IF NOT EXISTS llm_usage (id TEXT PRIMARY KEY, doc BLOB NOT NULL);
+        CREATE TABLE IF NOT EXISTS pdfs (title TEXT PRIMARY KEY, doc BLOB NOT NULL);
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.SQLITE_PATH
+        self._conn: sqlite3.Connection | None = None
+        # One connection shared by the worker threads; sqlite3 calls are serialized
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self._conn is not None
+
+    async def connect(self):
+        def open_db():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+            return conn
+        self._conn = await asyncio.to_thread(open_db)
+
+    async def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+    async def _run(self, fn, *args):
+        """Run fn(conn, *args) in one transaction on a worker thread"""
+        def call():
+            with self._lock, self._conn:
+                return fn(self._conn, *args)
+        return await asyncio.to_thread(call)
+
+    @staticmethod
+    def _load(conn, sql: str, params: tuple):
+        row = conn.execute(sql, params).fetchone()
+        return bson.decode(row[0]) if row else None
+
+    @staticmethod
+    def _upsert(conn, table: str, key_column: str, key, update: dict, new_doc: dict):
+        """Apply an update to the document under key, inserting new_doc first when there is none"""
+        doc = SQLiteStorage._load(conn, f"SELECT doc FROM {table} WHERE {key_column} = ?", (key,))
+        inserted = doc is None
+        doc = apply_update(new_doc if inserted else doc, update, inserted)
+        conn.execute(f"INSERT OR REPLACE INTO {table} ({key_column}, doc) VALUES (?, ?)", (key, bson.encode(doc)))
+
+    async def get_user_by_email(self, email: str):
+        return await self._run(self._load, "SELECT doc FROM users WHERE email = ?", (email,))
+
+    async def get_user_by_id(self, user_id: str):
+        return await self._run(self._load, "SELECT doc FROM users WHERE id = ?", (str(ObjectId(user_id)),))
+
+    async def create_user(self, user: dict) -> dict:
+        user = copy.deepcopy(user)
+        user.setdefault("_id", ObjectId())
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO users (id, email, doc) VALUES (?, ?, ?)",
+                (str(user["_id"]), user["email"], bson.encode(user)),
+            )
+        try:
+            await self._run(insert)
+        except sqlite3.IntegrityError:
+            raise DuplicateKeyError(f"E11000 duplicate key error: email {user['email']}")
+        return user
+
+    async def update_user(self, user_id: str, fields: dict) -> bool:
+        def update(conn):
+            doc = self._load(conn, "SELECT doc FROM users WHERE id = ?", (str(ObjectId(user_id)),))
+            if doc is None:
+                return False
+            doc.update(fields)
+            conn.execute(
+                "UPDATE users SET email = ?, doc = ? WHERE id = ?", (doc["email"], bson.encode(doc), str(doc["_id"]))
+            )
+            return True
+        return await self._run(update)
+
+    async def insert_chat_turns(self, turns: list) -> list:
+        def insert(conn):
+            # Turn ids are ObjectIds, whose hex form sorts in creation order
+            conn.executemany(
+                "INSERT OR IGNORE INTO chat_turns (session_id, id, doc) VALUES (?, ?, ?)",
+                [(turn["session_id"], str(turn["_id"]), bson.encode(turn)) for turn in turns],
+            )
+        if turns:
+            await self._run(insert)
+        return []
+
+    async def apply_session_updates(self, updates: list) -> list:
+        def apply(conn):
+            for session_id, update in updates:
+                new_doc = {"_id": ObjectId(), "session_id": session_id}
+                self._upsert(conn, "chat_sessions", "session_id", session_id, update, new_doc)
+        if updates:
+            await self._run(apply)
+        return []
+
+    async def get_session_header(self, session_id: str):
+        return await self._run(self._load, "SELECT doc FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    async def get_session_turns(self, session_id: str, after_turn_id=None, limit: int | None = None) -> list:
+        sql, params = "SELECT doc FROM chat_turns WHERE session_id = ?", [session_id]
+        if after_turn_id is not None:
+            sql += " AND id > ?"
+            params.append(str(after_turn_id))
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        return [bson.decode(row[0]) for row in rows]
+
+    async def apply_usage_updates(self, updates: list) -> list:
+        def apply(conn):
+            for (user_id, day), update in updates:
+                key = f"{user_id}:{day}"
+                self._upsert(conn, "llm_usage", "id", key, update, {"_id": key})
+        if updates:
+            await self._run(apply)
+        return []
+
+    async def upsert_pdf(self, title: str, meta: dict):
+        update = {"$set": meta, "$setOnInsert": {"created_at": meta.get("uploaded_at")}}
+        await self._run(self._upsert, "pdfs", "title", title, update, {"_id": ObjectId(), "title": title})
+
+STORAGE_BACKENDS = {
+    "mongo": MongoStorage,
+    "memory": MemoryStorage,
+    "sqlite": SQLiteStorage,
+}
+
+# Global storage instance
+_storage: Storage | None = None
+
+def create_storage(backend: str) -> Storage:
+    try:
+        return STORAGE_BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected one of: {', '.join(STORAGE_BACKENDS)})")
+
+async def connect_storage():
+    """Create and connect the configured storage backend"""
+    global _storage
+    _storage = create_storage(settings.STORAGE_BACKEND.lower())
+    await _storage.connect()
+    logger.info(f"Storage backend: {_storage.name}")
+    if _storage.name == "memory":
+        print("⚠️  Using in-memory storage - data will be lost when the server stops")
+    return _storage
+
+async def close_storage():
+    if _storage is not None:
+        await _storage.close()
+
+def set_storage(storage: Storage):
+    """Install a storage instance directly (benchmarks and scripts)"""
+    global _storage
+    _storage = storage
+
+async def get_storage() -> Storage | None:
+    """Get the storage backend for dependency injection (None when unavailable)"""
+    if _storage is None or not _storage.available:
+        return None
+    return _storage
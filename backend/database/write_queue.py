@@ -0,0 +1,292 @@
+# Write-behind queue for chat persistence
+#
+# Chat turns are queued in memory and written by a background flusher:
+# - Header updates for the same session are coalesced into one upsert
+# - Turns and headers are written in batches on a size or time trigger
+# - Failed writes are retried with exponential backoff and re-queued, never dropped
+# - LLM usage of each request is coalesced into one $inc per user and day
+# - The queue is drained completely on application shutdown
+# - Overflow: once max_depth turns are unwritten (database down or too slow),
+#   admit() refuses new chat requests until the queue drains; turns already
+#   queued are never dropped, since each one is linked into its session's chain
+# - Readers see unwritten turns through pending_turns() instead of flushing
+
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from backend.core.config import settings
+from backend.database.mongodb import (
+    session_header_update, merge_session_header_updates, usage_update, merge_usage_updates,
+)
+from backend.database.storage import get_storage
+from backend.utils.tracing import span
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY_SECONDS = 5.0
+# Flush rounds attempted on shutdown before giving up on an unreachable database
+DRAIN_ROUNDS = 3
+
+class ChatWriteQueue:
+    """Coalescing write-behind queue for chat turns and session headers"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_retries: int, retry_delay: float = 0.1,
+                 max_depth: int = 0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Unwritten turns at which new requests are refused (0: unbounded)
+        self.max_depth = max_depth
+
+        # session_id -> {"turns": [turn, ...], "header": coalesced header update}
+        self._pending: dict = {}
+        # (user_id, day) -> coalesced usage increment
+        self._usage: dict = {}
+        # session_id -> entry of the batch currently being written
+        self._in_flight: dict = {}
+        self._depth = 0          # turns queued or in flight, not yet durably written
+        self._wakeup: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._stats = {
+            "enqueued": 0,
+            "written_turns": 0,
+            "coalesced_updates": 0,
+            "usage_updates": 0,
+            "rejected": 0,
+            "flushes": 0,
+            "retries": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "last_flush_at": None,
+            "last_error": None,
+        }
+
+    # --- Lifecycle ---
+    def start(self):
+        """Start the background flusher on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Chat write queue started (batch_size={self.batch_size}, flush_interval={self.flush_interval}s)"
+        )
+
+    async def stop(self):
+        """Stop the flusher and drain everything still queued"""
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        for _ in range(DRAIN_ROUNDS):
+            if not self._pending and not self._usage:
+                break
+            await self.flush()
+        if self._pending or self._usage:
+            logger.error(f"Chat write queue stopped with {self._depth} unwritten turn(s)")
+        else:
+            logger.info("Chat write queue drained")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if (self._pending or self._usage) and not self._stopping:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"Chat write queue flush failed: {e}")
+
+    # --- Producer side ---
+    def admit(self) -> bool:
+        """Whether a new turn may be produced; False (and counted) while the queue is full.
+
+        Checked before a request does any work. Requests already admitted still
+        enqueue their turn, so max_depth can be exceeded by the requests in flight.
+        """
+        if self.max_depth > 0 and self._depth >= self.max_depth:
+            self._stats["rejected"] += 1
+            return False
+        return True
+
+    def enqueue(self, turn: dict):
+        """Queue one turn; returns immediately"""
+        if self._task is None:
+            self.start()
+        entry = self._pending.get(turn["session_id"])
+        if entry is None:
+            self._pending[turn["session_id"]] = {"turns": [turn], "header": session_header_update(turn)}
+        else:
+            entry["turns"].append(turn)
+            entry["header"] = merge_session_header_updates(entry["header"], session_header_update(turn))
+            self._stats["coalesced_updates"] += 1
+        self._depth += 1
+        self._stats["enqueued"] += 1
+        if self._depth >= self.batch_size:
+            self._wakeup.set()
+
+    def enqueue_usage(self, user_id: str, usage: dict):
+        """Add one request's usage summary to the user's totals for today (UTC)"""
+        key = (user_id, datetime.now(timezone.utc).date().isoformat())
+        update = usage_update(*key, usage)
+        earlier = self._usage.get(key)
+        self._usage[key] = update if earlier is None else merge_usage_updates(earlier, update)
+
+    def has_pending(self, session_id: str) -> bool:
+        """Whether the session has turns that are not yet written"""
+        return session_id in self._pending or session_id in self._in_flight
+
+    def pending_turns(self, session_id: str) -> list:
+        """The session's turns that are queued or being written, oldest first.
+
+        Turns in flight may already be stored, so readers merging these with
+        storage must dedupe by _id.
+        """
+        turns = []
+        for entries in (self._in_flight, self._pending):
+            entry = entries.get(session_id)
+            if entry is not None:
+                turns.extend(entry["turns"])
+        return turns
+
+    # --- Flushing ---
+    async def flush(self):
+        """Write everything queued so far"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            usage, self._usage = self._usage, {}
+            if not batch and not usage:
+                return
+            self._in_flight = batch
+            started = time.perf_counter()
+            try:
+                with span("persistence"):
+                    failed = await self._write(batch) if batch else {}
+            except Exception as e:
+                # Unexpected error: keep the whole batch for the next round
+                failed = batch
+                self._stats["last_error"] = str(e)
+            finally:
+                self._in_flight = {}
+            for session_id, entry in failed.items():
+                self._requeue(session_id, entry)
+            for key, update in (await self._write_usage(usage)).items():
+                earlier = self._usage.get(key)
+                self._usage[key] = update if earlier is None else merge_usage_updates(update, earlier)
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+            self._stats["flushes"] += 1
+            self._stats["failed_flushes"] += int(bool(failed))
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["last_flush_at"] = datetime.now(timezone.utc).isoformat()
+
+    async def _write(self, batch: dict) -> dict:
+        """Write a batch; returns the entries that still have to be written"""
+        # Turns first: a header is only applied once all of its session's turns are stored
+        turns = [turn for entry in batch.values() for turn in entry["turns"]]
+        unwritten_turns = await self._with_retries("insert_chat_turns", turns, "chat turns")
+        unwritten_ids = {turn["_id"] for turn in unwritten_turns}
+
+        failed = {}
+        header_updates = []
+        for session_id, entry in batch.items():
+            remaining = [t for t in entry["turns"] if t["_id"] in unwritten_ids]
+            written = len(entry["turns"]) - len(remaining)
+            self._depth -= written
+            self._stats["written_turns"] += written
+            if remaining:
+                failed[session_id] = {"turns": remaining, "header": entry["header"]}
+            else:
+                header_updates.append((session_id, entry["header"]))
+
+        unwritten_headers = await self._with_retries("apply_session_updates", header_updates, "session headers")
+        for session_id, header in unwritten_headers:
+            failed[session_id] = {"turns": [], "header": header}
+        return failed
+
+    async def _write_usage(self, usage: dict) -> dict:
+        """Apply coalesced usage increments; returns the ones that still have to be applied"""
+        if not usage:
+            return {}
+        unwritten = await self._with_retries("apply_usage_updates", list(usage.items()), "usage totals")
+        self._stats["usage_updates"] += len(usage) - len(unwritten)
+        return dict(unwritten)
+
+    async def _with_retries(self, method: str, items: list, label: str) -> list:
+        """Call storage.<method>(items) until everything is written; returns the items that could not be
+
+        A missing database connection counts as a failed attempt, so the items
+        are retried and re-queued like any other failed write.
+        """
+        attempt = 0
+        while items:
+            try:
+                storage = await get_storage()
+                if storage is None:
+                    raise ConnectionError("No database connection available")
+                items = await getattr(storage, method)(items)
+                if not items:
+                    return []
+                self._stats["last_error"] = f"{len(items)} {label} rejected"
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+
+            attempt += 1
+            if attempt > self.max_retries:
+                logger.error(f"Giving up on {len(items)} {label} after {self.max_retries} retries")
+                return items
+            self._stats["retries"] += 1
+            await asyncio.sleep(min(self.retry_delay * 2 ** (attempt - 1), MAX_RETRY_DELAY_SECONDS))
+        return []
+
+    def _requeue(self, session_id: str, entry: dict):
+        """Put a failed entry back in front of anything queued since"""
+        newer = self._pending.get(session_id)
+        if newer is None:
+            self._pending[session_id] = entry
+        else:
+            self._pending[session_id] = {
+                "turns": entry["turns"] + newer["turns"],
+                "header": merge_session_header_updates(entry["header"], newer["header"]),
+            }
+
+    # --- Metrics ---
+    def stats(self) -> dict:
+        flushes = self._stats["flushes"]
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "depth": self._depth,
+            "pending_sessions": len(self._pending),
+            "pending_usage": len(self._usage),
+            "max_depth": self.max_depth,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "avg_flush_ms": round(self._stats["total_flush_ms"] / flushes, 3) if flushes else None,
+            **{k: v for k, v in self._stats.items() if k != "total_flush_ms"},
+        }
+
+# Global queue instance
+chat_write_queue = ChatWriteQueue(
+    batch_size=settings.CHAT_WRITE_BATCH_SIZE,
+    flush_interval=settings.CHAT_WRITE_FLUSH_INTERVAL_MS / 1000,
+    max_retries=settings.CHAT_WRITE_MAX_RETRIES,
+    max_depth=settings.CHAT_WRITE_MAX_QUEUE,
+)
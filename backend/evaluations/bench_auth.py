@@ -0,0 +1,110 @@
+"""
+Auth overhead per request: get_current_user with and without the user cache.
+
+Modes:
+- uncached: every request looks the user up in MongoDB (cache TTL 0)
+- cached:   resolved users come from the in-process TTL cache
+- claims:   email/created_at travel in the token (JWT_EMBED_USER_CLAIMS)
+
+By default users live in the in-memory storage backend with a fixed round-trip
+latency added, so the script runs without a server; --mongo uses MongoStorage on a
+scratch database on MONGO_URI instead.
+
+Usage:
+    python bench_auth.py --requests 2000 --users 100 --latency-ms 0.8
+    python bench_auth.py --requests 2000 --mongo
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from bson import ObjectId
+from backend.core import security
+from backend.core.config import settings
+from backend.database.storage import MemoryStorage, MongoStorage
+from backend.utils.cache import TTLCache
+
+class SimulatedStorage(MemoryStorage):
+    """Memory storage answering user lookups after a fixed round-trip delay"""
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    async def get_user_by_id(self, user_id):
+        await asyncio.sleep(self.latency)
+        return await super().get_user_by_id(user_id)
+
+async def run_mode(mode, storage, users, requests):
+    settings.JWT_EMBED_USER_CLAIMS = mode == "claims"
+    security.user_cache = TTLCache(settings.USER_CACHE_MAX_ENTRIES, 0 if mode == "uncached" else 60)
+    tokens = [
+        security.create_access_token(str(u["_id"]), claims=security.user_token_claims(u))
+        for u in users
+    ]
+    rng = random.Random(7)
+    timings = []
+    for _ in range(requests):
+        token = rng.choice(tokens)
+        start = time.perf_counter()
+        await security.get_current_user(token=token, storage=storage)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_us": round(sum(timings) / len(timings) * 1e6, 1),
+        "p50_us": round(timings[len(timings) // 2] * 1e6, 1),
+        "p99_us": round(timings[int(len(timings) * 0.99) - 1] * 1e6, 1),
+        "cache": security.user_cache.stats(),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.8, help="simulated MongoDB round trip")
+    parser.add_argument("--mongo", action="store_true", help="use a scratch database on MONGO_URI")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    users = [
+        {"_id": ObjectId(), "email": f"user{i}@example.com", "created_at": now, "is_active": True}
+        for i in range(args.users)
+    ]
+
+    client = None
+    if args.mongo:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(settings.MONGO_URI)
+        db = client[f"{settings.MONGO_DB_NAME}_bench"]
+        await db["users"].drop()
+        await db["users"].insert_many([dict(u) for u in users])
+        storage = MongoStorage(db)
+    else:
+        storage = SimulatedStorage(args.latency_ms / 1000)
+        for user in users:
+            await storage.create_user(user)
+
+    results = {}
+    try:
+        for mode in ("uncached", "cached", "claims"):
+            results[mode] = await run_mode(mode, storage, users, args.requests)
+    finally:
+        if client is not None:
+            await client.drop_database(storage.db.name)
+            client.close()
+
+    print("Auth Overhead per Request")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+"""
+Write-amplification benchmark: legacy full-document chat storage vs append-only turns.
+
+Legacy layout:  every message `$set`s the whole session document (full hashed history).
+Append-only:    every message inserts one turn document and `$inc`/`$push`es a compact header.
+
+By default the script measures the bytes each layout sends to MongoDB per turn
+(BSON-encoded when pymongo is installed, JSON otherwise) without needing a server.
+With --mongo it also times real writes against MONGO_URI in a scratch database.
+
+Usage:
+    python bench_chat_storage.py --turns 200
+    python bench_chat_storage.py --turns 200 --mongo
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import bson
+    from bson import ObjectId
+
+    def encoded_size(doc):
+        return len(bson.encode(doc))
+except ImportError:
+    bson = None
+    ObjectId = None
+
+    def encoded_size(doc):
+        return len(json.dumps(doc, default=str).encode("utf-8"))
+
+USER_MESSAGE = "I have had a headache and mild fever for three days, should I see a doctor?"
+ASSISTANT_MESSAGE = (
+    "I understand you're experiencing a headache with a mild fever. How high has your temperature been? "
+    "If it stays above 38.5°C or you notice a stiff neck, please see a doctor promptly. " * 3
+)
+CLASSIFICATION = {
+    "intent": "symptom_inquiry",
+    "urgency": "medium",
+    "symptoms": ["headache", "fever"],
+    "required_resources": {"rag_needed": False, "summarization_needed": False, "direct_llm": True},
+    "risk_level": "medium",
+    "next_agent": "solution_agent",
+    "reasoning": "Patient describes their own symptoms",
+}
+
+def h(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def new_id(i):
+    return ObjectId() if ObjectId else f"turn-{i:06d}"
+
+def hashed_messages(now):
+    return [
+        {"role": "user", "content": h(USER_MESSAGE), "timestamp": now},
+        {"role": "assistant", "content": h(ASSISTANT_MESSAGE), "timestamp": now},
+    ]
+
+def legacy_write(session_id, history, now):
+    """The $set payload the legacy upsert_chat_detail sent for one turn."""
+    doc = {
+        "session_id": session_id,
+        "user_id": session_id,
+        "message": h(USER_MESSAGE),
+        "chat_history": list(history),
+        "response": h(ASSISTANT_MESSAGE),
+        "classification": CLASSIFICATION,
+        "rag_context": None,
+        "followup_questions": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    doc["hashed_details"] = h(json.dumps(doc, sort_keys=True, default=str))
+    return {"$set": doc}
+
+def append_only_writes(session_id, turn_index, now):
+    """The turn insert and header update of the append-only layout for one turn."""
+    turn = {
+        "_id": new_id(turn_index),
+        "session_id": session_id,
+        "user_id": session_id,
+        "messages": hashed_messages(now),
+        "classification": CLASSIFICATION,
+        "rag_context": None,
+        "followup_questions": None,
+        "created_at": now,
+    }
+    turn["hashed_details"] = h(json.dumps(turn, sort_keys=True, default=str))
+    header = {
+        "$setOnInsert": {"session_id": session_id, "user_id": session_id, "created_at": now},
+        "$set": {"updated_at": now, "last_turn_id": turn["_id"], "last_classification": CLASSIFICATION},
+        "$inc": {"turn_count": 1, "message_count": 2},
+        "$push": {"recent_intents": {"$each": [CLASSIFICATION["intent"]], "$slice": -20}},
+    }
+    return turn, header
+
+def measure_bytes(turns):
+    session_id = "bench-session"
+    history = []
+    legacy_total = append_total = payload_total = 0
+    legacy_last = append_last = 0
+    for i in range(turns):
+        now = datetime.utcnow()
+        history.extend(hashed_messages(now))
+        payload = encoded_size({"messages": hashed_messages(now)})
+        legacy = encoded_size(legacy_write(session_id, history, now))
+        turn, header = append_only_writes(session_id, i, now)
+        append = encoded_size(turn) + encoded_size(header)
+        payload_total += payload
+        legacy_total += legacy
+        append_total += append
+        legacy_last, append_last = legacy, append
+    return {
+        "turns": turns,
+        "encoding": "bson" if bson else "json",
+        "new_message_bytes": payload_total,
+        "legacy": {
+            "total_bytes_written": legacy_total,
+            "last_turn_bytes": legacy_last,
+            "write_amplification": round(legacy_total / payload_total, 1),
+            "session_document_bytes": legacy_last,
+        },
+        "append_only": {
+            "total_bytes_written": append_total,
+            "last_turn_bytes": append_last,
+            "write_amplification": round(append_total / payload_total, 1),
+            "session_document_bytes": encoded_size(append_only_writes(session_id, turns, datetime.utcnow())[1]),
+        },
+    }
+
+def measure_mongo(turns):
+    """Time both layouts against a scratch database on MONGO_URI."""
+    from pymongo import MongoClient
+    from backend.core.config import settings
+
+    client = MongoClient(settings.MONGO_URI)
+    db = client[f"{settings.MONGO_DB_NAME}_bench"]
+    db["legacy"].drop(); db["headers"].drop(); db["turns"].drop()
+    db["legacy"].create_index("session_id", unique=True)
+    db["headers"].create_index("session_id", unique=True)
+    db["turns"].create_index([("session_id", 1), ("_id", 1)])
+
+    session_id = "bench-session"
+    history = []
+    legacy_times, append_times = [], []
+    for i in range(turns):
+        now = datetime.utcnow()
+        history.extend(hashed_messages(now))
+        start = time.perf_counter()
+        db["legacy"].update_one({"session_id": session_id}, legacy_write(session_id, history, now), upsert=True)
+        legacy_times.append(time.perf_counter() - start)
+
+        turn, header = append_only_writes(session_id, i, now)
+        start = time.perf_counter()
+        db["turns"].insert_one(turn)
+        db["headers"].update_one({"session_id": session_id}, header, upsert=True)
+        append_times.append(time.perf_counter() - start)
+
+    client.drop_database(db.name)
+    client.close()
+
+    def summary(times):
+        times = sorted(times)
+        return {
+            "mean_ms": round(sum(times) / len(times) * 1000, 3),
+            "p95_ms": round(times[int(len(times) * 0.95) - 1] * 1000, 3),
+            "last_10_mean_ms": round(sum(times[-10:]) / 10 * 1000, 3),
+        }
+    return {"legacy": summary(legacy_times), "append_only": summary(append_times)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--mongo", action="store_true", help="also time real writes against MONGO_URI")
+    args = parser.parse_args()
+
+    results = {"bytes": measure_bytes(args.turns)}
+    if args.mongo:
+        results["latency"] = measure_mongo(args.turns)
+
+    print("Chat Storage Write Amplification")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Document workflow latency: fused single generation vs the sequential agent chain.
+
+Modes:
+- sequential: Doc_Summarize crew → Solution_Agent → Follow-up_Agent (three LLM latencies)
+- fused:      one structured generation split into summary, guidance and follow-up
+
+Each report of the generated sample set (see bench_report_compression.py) runs
+through MedicalWorkflow._handle_document_query in both modes with the summary
+cache disabled. Fused runs that could not be parsed fall back to the sequential
+chain and are counted. Requires OPENAI_API_KEY and the agent dependencies.
+
+Usage:
+    python bench_document_modes.py --runs 3
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "backend" / "agents"))
+
+import medical_workflow
+from medical_workflow import MedicalWorkflow
+from summary_cache import SummaryCache
+from bench_report_compression import sample_reports
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="runs per report and mode")
+    args = parser.parse_args()
+
+    # Every run must reach the LLM
+    no_cache = SummaryCache(str(Path(tempfile.mkdtemp()) / "unused.sqlite3"), memory_entries=0, max_disk_bytes=0)
+    medical_workflow.get_summary_cache = lambda: no_cache
+
+    workflow = MedicalWorkflow()
+    fused_generate = workflow.fused_document_agent.generate
+    fallbacks = []
+
+    def counting_generate(*a, **kw):
+        try:
+            return fused_generate(*a, **kw)
+        except Exception as e:
+            fallbacks.append(str(e))
+            raise
+
+    workflow.fused_document_agent.generate = counting_generate
+
+    results = {"runs": args.runs, "reports": len(sample_reports())}
+    for mode in ("sequential", "fused"):
+        workflow.document_mode = mode
+        fallbacks.clear()
+        timings = []
+        for name, pages in sample_reports():
+            for _ in range(args.runs):
+                workflow.chat_history = []
+                start = time.perf_counter()
+                workflow._handle_document_query(f"doc:{name}.pdf", doc_pages=pages)
+                timings.append(time.perf_counter() - start)
+        results[mode] = {
+            "mean_s": round(sum(timings) / len(timings), 2),
+            "p50_s": round(percentile(timings, 0.5), 2),
+            "p95_s": round(percentile(timings, 0.95), 2),
+            "max_s": round(max(timings), 2),
+        }
+        if mode == "fused":
+            results[mode]["fallbacks"] = len(fallbacks)
+    results["speedup_mean"] = round(results["sequential"]["mean_s"] / max(results["fused"]["mean_s"], 1e-9), 2)
+
+    print("Document Workflow Modes Benchmark")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
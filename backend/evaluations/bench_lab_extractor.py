@@ -0,0 +1,92 @@
+"""
+Lab-value extractor benchmark: prompt size and out-of-range detection for lab panels.
+
+For each report in the sample set (see bench_report_compression.py) the script
+measures the tokens the summarizer would receive as raw text, after local
+pre-compression and from the lab fast path (parsed table plus remaining
+comments), the time the extraction takes, and whether the report is treated
+as structured. For generated lab panels the out-of-range rows found are
+checked against the H/L flags the generator printed.
+
+Usage:
+    python bench_lab_extractor.py
+    python bench_lab_extractor.py --pdf data/cbc.pdf --repeat 50
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "backend" / "agents"))
+
+from lab_extractor import extract_lab_results, structured_report_input
+from report_compression import compress_report, count_tokens
+from bench_report_compression import sample_reports, pdf_reports
+
+def flagged_by_report(pages):
+    """Test names the report itself flags H/L"""
+    names = set()
+    for page in pages:
+        for line in page.splitlines():
+            parts = line.split()
+            for i, part in enumerate(parts):
+                if part in ("H", "L") and i > 0:
+                    names.add(" ".join(parts[:i - 1]).lower())
+    return names
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", default=[], help="additional report PDFs")
+    parser.add_argument("--repeat", type=int, default=20, help="extraction runs per report for the timing")
+    args = parser.parse_args()
+
+    results = {"reports": {}}
+    structured_raw = structured_table = 0
+    for name, pages in sample_reports() + pdf_reports(args.pdf):
+        compressed, compression = compress_report(pages)
+        table, stats = structured_report_input(compressed)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            structured_report_input(compressed)
+        extraction_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        row = {
+            "pages": len(pages),
+            "structured": stats["structured"],
+            "lab_rows": stats["lab_rows"],
+            "row_share": stats["row_share"],
+            "raw_tokens": compression["original_tokens"],
+            "compressed_tokens": compression["compressed_tokens"],
+            "extraction_ms": round(extraction_ms, 3),
+        }
+        if table is not None:
+            row["table_tokens"] = count_tokens(table)
+            row["token_ratio_vs_raw"] = round(row["raw_tokens"] / max(1, row["table_tokens"]), 2)
+            structured_raw += row["raw_tokens"]
+            structured_table += row["table_tokens"]
+
+        expected = flagged_by_report(pages)
+        if expected:
+            rows, _ = extract_lab_results(compressed)
+            found = {r["test"].lower() for r in rows if r["status"] in ("high", "low")}
+            row["out_of_range_found"] = f"{len(found & expected)}/{len(expected)}"
+            row["out_of_range_extra"] = sorted(found - expected)
+        results["reports"][name] = row
+
+    results["structured_reports"] = sum(1 for r in results["reports"].values() if r["structured"])
+    results["structured_tokens_raw"] = structured_raw
+    results["structured_tokens_table"] = structured_table
+    results["structured_token_ratio"] = round(structured_raw / max(1, structured_table), 2)
+
+    print("Lab-value Extractor Benchmark")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Login throughput and event-loop responsiveness during a login storm.
+
+Runs a storm of concurrent logins while a probe coroutine, standing in for chat
+requests sharing the worker, ticks every few milliseconds and records how late
+each tick runs. Two modes are compared:
+- inline:   bcrypt verification on the event loop (the previous login behaviour)
+- executor: the /auth/login route, which verifies on the dedicated password pool
+
+Users live in the in-memory storage backend, so no server is needed.
+
+Usage:
+    python bench_login.py --logins 40 --concurrency 8 --rounds 12
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--probe-ms", type=float, default=5.0, help="probe tick interval")
+    return parser.parse_args()
+
+args = parse_args()
+# The bcrypt cost is read from settings when the hashing module is imported
+os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+
+from bson import ObjectId
+from backend.routes.auth import login
+from backend.database.storage import MemoryStorage
+from backend.schemas.user import UserLogin
+from backend.utils.hash import hash_password, verify_password
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+async def inline_login(storage, payload):
+    user = await storage.get_user_by_email(payload.email)
+    return verify_password(payload.password, user["password_hash"])
+
+async def probe(stop, interval, lateness):
+    """Tick every interval seconds and record how late each tick is"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lateness.append(max(0.0, time.perf_counter() - expected))
+
+async def storm(mode, storage):
+    payload = UserLogin(email=EMAIL, password=PASSWORD)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stop = asyncio.Event()
+    lateness = []
+    probe_task = asyncio.create_task(probe(stop, args.probe_ms / 1000, lateness))
+    await asyncio.sleep(args.probe_ms / 1000 * 3)
+
+    async def one():
+        async with semaphore:
+            if mode == "inline":
+                await inline_login(storage, payload)
+            else:
+                await login(payload, storage=storage)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    lateness.sort()
+    return {
+        "logins_per_second": round(args.logins / elapsed, 2),
+        "seconds": round(elapsed, 3),
+        "probe_ticks": len(lateness),
+        "probe_lag_p50_ms": round(lateness[len(lateness) // 2] * 1000, 2) if lateness else None,
+        "probe_lag_p99_ms": round(lateness[int(len(lateness) * 0.99) - 1] * 1000, 2) if lateness else None,
+        "probe_lag_max_ms": round(lateness[-1] * 1000, 2) if lateness else None,
+    }
+
+async def main():
+    storage = MemoryStorage()
+    await storage.create_user(
+        {"_id": ObjectId(), "email": EMAIL, "password_hash": hash_password(PASSWORD), "is_active": True}
+    )
+    results = {"bcrypt_rounds": args.rounds, "logins": args.logins, "concurrency": args.concurrency}
+    for mode in ("inline", "executor"):
+        results[mode] = await storm(mode, storage)
+
+    print("Login Storm Benchmark")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
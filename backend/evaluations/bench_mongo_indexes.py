@@ -0,0 +1,116 @@
+"""
+Upsert latency vs collection size, with and without the registered indexes.
+
+Replays the application's hot write paths against a scratch database on MONGO_URI:
+- chat_details: session header upsert filtered on session_id
+- pdfs:         PDF metadata upsert filtered on title
+
+For each collection size the collections are filled, timed without secondary
+indexes, then the indexes from backend/database/indexes.py are created and the
+same upserts are timed again.
+
+Usage:
+    python bench_mongo_indexes.py --sizes 1000 10000 50000 --upserts 200
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pymongo import MongoClient
+from backend.core.config import settings
+from backend.database.indexes import index_models
+
+def fill(db, size):
+    """Insert size session headers and PDF rows"""
+    db["chat_details"].drop()
+    db["pdfs"].drop()
+    now = datetime.utcnow()
+    batch = 5000
+    for start in range(0, size, batch):
+        count = min(batch, size - start)
+        db["chat_details"].insert_many([
+            {
+                "session_id": f"session-{i}",
+                "user_id": f"user-{i % 1000}",
+                "turn_count": 10,
+                "message_count": 20,
+                "recent_intents": ["symptom_inquiry"] * 10,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(start, start + count)
+        ])
+        db["pdfs"].insert_many([
+            {"title": f"document-{i}.pdf", "sha256": f"{i:064x}", "num_chunks": 40, "uploaded_at": now}
+            for i in range(start, start + count)
+        ])
+
+def time_upserts(db, size, upserts):
+    """Mean and p95 latency (ms) of header and PDF upserts on existing keys"""
+    rng = random.Random(42)
+    timings = {"chat_details": [], "pdfs": []}
+    for _ in range(upserts):
+        i = rng.randrange(size)
+        now = datetime.utcnow()
+        start = time.perf_counter()
+        db["chat_details"].update_one(
+            {"session_id": f"session-{i}"},
+            {"$set": {"updated_at": now}, "$inc": {"turn_count": 1, "message_count": 2}},
+            upsert=True,
+        )
+        timings["chat_details"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        db["pdfs"].update_one(
+            {"title": f"document-{i}.pdf"},
+            {"$set": {"uploaded_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+        )
+        timings["pdfs"].append(time.perf_counter() - start)
+
+    def summary(values):
+        values = sorted(values)
+        return {
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p95_ms": round(values[max(0, int(len(values) * 0.95) - 1)] * 1000, 3),
+        }
+    return {name: summary(values) for name, values in timings.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--upserts", type=int, default=200)
+    args = parser.parse_args()
+
+    client = MongoClient(settings.MONGO_URI)
+    db = client[f"{settings.MONGO_DB_NAME}_bench"]
+
+    results = []
+    try:
+        for size in args.sizes:
+            print(f"Filling collections with {size} documents...")
+            fill(db, size)
+            without = time_upserts(db, size, args.upserts)
+            for collection in ("chat_details", "pdfs"):
+                db[collection].create_indexes(index_models(collection))
+            with_indexes = time_upserts(db, size, args.upserts)
+            results.append({"collection_size": size, "without_indexes": without, "with_indexes": with_indexes})
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+    print("Upsert Latency vs Collection Size")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
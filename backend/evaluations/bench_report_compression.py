@@ -0,0 +1,173 @@
+"""
+Report pre-compression benchmark: prompt size and latency before the summarizer.
+
+For each report in the sample set the script measures the tokens sent to the
+summarization LLM with and without local pre-compression (boilerplate removal,
+lab-line retention, extractive sentence ranking), the compression ratio and the
+time the compression itself takes.
+
+The sample set is generated (lab panels, a multi-page discharge summary and a
+radiology report, all with repeated letterhead and footers); --pdf adds real
+reports. With --llm each report is also summarized end to end both ways
+(requires OPENAI_API_KEY and the agent dependencies) to measure the latency change.
+
+Usage:
+    python bench_report_compression.py
+    python bench_report_compression.py --budget 3000 --pdf data/report.pdf
+    python bench_report_compression.py --llm
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "backend" / "agents"))
+
+import report_compression
+from report_compression import compress_report
+
+LETTERHEAD = [
+    "St. Mary's General Hospital - Department of Laboratory Medicine",
+    "123 Harbour Road, Colombo 03 | Tel: 011-2345678 | www.stmarys.example",
+    "Patient: J. Perera   MRN: 00482913   DOB: 1971-04-12   Sex: M",
+]
+FOOTER = [
+    "This report is electronically verified and does not require a signature.",
+    "Results relate only to the sample tested. Please correlate clinically.",
+]
+
+LAB_PANELS = {
+    "CBC": [
+        ("Hemoglobin", "g/dL", 13.0, 17.0), ("WBC", "x10^9/L", 4.0, 11.0), ("RBC", "x10^12/L", 4.5, 5.9),
+        ("Hematocrit", "%", 40, 52), ("MCV", "fL", 80, 100), ("Platelets", "x10^9/L", 150, 400),
+        ("Neutrophils", "%", 40, 75), ("Lymphocytes", "%", 20, 45),
+    ],
+    "Lipid profile": [
+        ("Total cholesterol", "mg/dL", 0, 200), ("LDL cholesterol", "mg/dL", 0, 130),
+        ("HDL cholesterol", "mg/dL", 40, 60), ("Triglycerides", "mg/dL", 0, 150),
+    ],
+    "Glycemic control": [("HbA1c", "%", 4.0, 5.6), ("Fasting glucose", "mg/dL", 70, 100)],
+}
+
+NARRATIVE = [
+    "The patient presented with a three day history of fever, productive cough and pleuritic chest pain.",
+    "On examination he was febrile at 38.6 C with crackles over the right lower zone.",
+    "Chest radiograph showed consolidation of the right lower lobe.",
+    "A diagnosis of community acquired pneumonia was made.",
+    "He was treated with intravenous co-amoxiclav and oral clarithromycin for five days.",
+    "Oxygen saturation improved steadily and supplemental oxygen was discontinued on day three.",
+    "Nursing staff documented good oral intake and mobilisation on the ward.",
+    "The patient was reviewed daily by the medical team during the ward round.",
+    "Visiting hours and ward policies were explained to the family on admission.",
+    "He has a history of type 2 diabetes mellitus managed with metformin 500 mg twice daily.",
+    "Blood glucose was monitored four times daily and remained within acceptable limits.",
+    "He was discharged on oral amoxicillin-clavulanate to complete seven days of treatment.",
+    "Follow-up in the respiratory clinic is recommended in six weeks with a repeat chest radiograph.",
+    "He was advised to return immediately if breathlessness or chest pain worsens.",
+    "Physiotherapy provided breathing exercises and an information leaflet.",
+    "The hospital catering team accommodated his dietary preferences throughout the stay.",
+]
+
+def lab_page(rng, panel, rows):
+    lines = [f"{panel}", "Test  Result  Unit  Reference range"]
+    for name, unit, low, high in rows:
+        value = round(rng.uniform(low * 0.8, high * 1.25 if high else 1), 1)
+        flag = " H" if value > high else (" L" if value < low else "")
+        lines.append(f"{name}  {value}{flag}  {unit}  {low} - {high}")
+    return lines
+
+def sample_reports(seed=7):
+    """[(name, pages)] of generated reports"""
+    rng = random.Random(seed)
+    reports = []
+    for name, rows in LAB_PANELS.items():
+        pages = []
+        for page_number in range(1, 3):
+            body = lab_page(rng, name, rows) + ["Comment: Values flagged H/L are outside the reference range."]
+            pages.append("\n".join(LETTERHEAD + body + FOOTER + [f"Page {page_number} of 2"]))
+        reports.append((f"lab_{name.lower().replace(' ', '_')}", pages))
+
+    pages = []
+    for page_number in range(1, 15):
+        sentences = rng.sample(NARRATIVE, 10)
+        body = ["Discharge summary"] + [" ".join(sentences[i:i + 2]) for i in range(0, 10, 2)]
+        if page_number == 7:
+            body += lab_page(rng, "Admission bloods", LAB_PANELS["CBC"][:4])
+        pages.append("\n".join(LETTERHEAD + body + FOOTER + [f"Page {page_number} of 14"]))
+    reports.append(("discharge_summary", pages))
+
+    radiology = [
+        "CT chest with contrast.",
+        "Findings: There is consolidation in the right lower lobe with air bronchograms.",
+        "No pleural effusion. Heart size is normal. No mediastinal lymphadenopathy.",
+        "Impression: Right lower lobe pneumonia. Recommend follow-up imaging in six weeks.",
+    ]
+    reports.append(("radiology", ["\n".join(LETTERHEAD + radiology + FOOTER + ["Page 1 of 1"])]))
+    return reports
+
+def pdf_reports(paths):
+    from pypdf import PdfReader
+    return [(Path(p).name, [page.extract_text() or "" for page in PdfReader(p).pages]) for p in paths]
+
+def summarize_seconds(pages, compress):
+    """Wall-clock seconds of one end-to-end summary, with compression on or off"""
+    import Doc_Summerize
+    saved = report_compression.TOKEN_BUDGET
+    report_compression.TOKEN_BUDGET = saved if compress else 0
+    try:
+        start = time.perf_counter()
+        Doc_Summerize.summarize_report(pages=pages)
+        return round(time.perf_counter() - start, 2)
+    finally:
+        report_compression.TOKEN_BUDGET = saved
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=report_compression.TOKEN_BUDGET, help="summarizer token budget")
+    parser.add_argument("--pdf", nargs="*", default=[], help="additional report PDFs")
+    parser.add_argument("--llm", action="store_true", help="also time end-to-end summaries (calls the OpenAI API)")
+    args = parser.parse_args()
+    report_compression.TOKEN_BUDGET = args.budget
+
+    reports = sample_reports() + pdf_reports(args.pdf)
+    results = {
+        "budget_tokens": args.budget,
+        "ranker": "lexrank" if report_compression.LexRankSummarizer is not None else "frequency",
+        "sentencizer": "spacy" if report_compression.spacy is not None else "regex",
+        "reports": {},
+    }
+    total_before = total_after = 0
+    for name, pages in reports:
+        compressed, stats = compress_report(pages)
+        # Lab rows must all survive compression
+        lab_rows = {line.strip() for page in pages for line in page.splitlines() if report_compression.is_lab_line(line)}
+        kept_rows = {line.strip() for page in compressed for line in page.splitlines()}
+        row = {
+            "pages": len(pages),
+            **stats,
+            "compression_ms": round(stats["seconds"] * 1000, 2),
+            "lab_lines_kept": f"{len(lab_rows & kept_rows)}/{len(lab_rows)}",
+        }
+        del row["seconds"]
+        if args.llm:
+            row["summary_seconds_raw"] = summarize_seconds(pages, compress=False)
+            row["summary_seconds_compressed"] = summarize_seconds(pages, compress=True)
+        results["reports"][name] = row
+        total_before += stats["original_tokens"]
+        total_after += stats["compressed_tokens"]
+    results["total_tokens_before"] = total_before
+    results["total_tokens_after"] = total_after
+    results["overall_compression_ratio"] = round(total_before / max(1, total_after), 2)
+
+    print("Report Pre-compression Benchmark")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
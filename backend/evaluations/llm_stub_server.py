@@ -0,0 +1,295 @@
+"""
+Offline OpenAI-compatible stand-in for load testing the full stack.
+
+Serves /v1/chat/completions (plain and streamed) and /v1/embeddings with
+deterministic, schema-valid outputs, so orchestration, retrieval, persistence
+and concurrency can be benchmarked without an API key and without OpenAI's
+latency noise:
+
+- The Query Classifier gets valid classification JSON (intent from keywords)
+- CrewAI agents get a "Final Answer:" in the format their parser expects
+- The fused document prompt gets the SUMMARY / GUIDANCE / FOLLOW_UP parts with
+  every summary section, the summarizer the seven sections, the map step notes
+- Embeddings are hashed bags of words: deterministic, unit length, and texts
+  sharing words are close, so vector search still returns related chunks
+
+Latency is the time to the first token, sampled from the chosen distribution,
+plus the completion tokens at --tokens-per-second. Streamed responses emit
+their tokens at that rate. Token counts are estimates (about 4 characters per
+token).
+
+Point the backend and the agents at it with OPENAI_BASE_URL in .env; any
+OPENAI_API_KEY value is accepted.
+
+Usage:
+    python llm_stub_server.py --port 8100
+    python llm_stub_server.py --distribution lognormal --chat-latency-ms 600 --chat-spread-ms 300 --seed 1
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn backend.main:app
+"""
+
+import re
+import json
+import time
+import math
+import uuid
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+from array import array
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# The seven sections of a document summary (fused_document.SUMMARY_SECTIONS) with stub content
+SUMMARY_SECTIONS = {
+    "Symptoms and Tests": "Values as listed in the report; out-of-range results are noted.",
+    "Diagnosis": "No definitive diagnosis stated in the report.",
+    "Treatments": "None reported",
+    "Recommendations": "Repeat the flagged tests and review them with a physician.",
+    "Health Status Assessment": "Stable, with some values needing follow-up.",
+    "Doctor Recommendation": "Consult a general physician to review these results.",
+    "Disclaimer": "This summary may contain errors. Always consult a doctor about your report.",
+}
+EMBEDDING_DIMENSIONS = 1536
+WORD = re.compile(r"[a-z0-9]+")
+
+# (keywords, intent, urgency, rag_needed); first match wins
+INTENT_RULES = (
+    (("chest pain", "can't breathe", "heart attack", "severe bleeding", "unconscious", "stroke"), "emergency", "emergency", False),
+    (("harm myself", "suicide", "kill myself", "end my life", "want to die"), "harmful_intent", "high", False),
+    (("doctor", "specialist", "psychologist", "psychiatrist", "therapist", "cardiologist"), "doctor_inquiry", "low", True),
+    (("appointment", "book", "schedule", "channel"), "appointment_request", "low", True),
+    (("address", "contact", "hours", "open", "located", "service", "price", "fee"), "center_information", "low", True),
+    (("medicine for", "prescription", "tablet for", "pill for", "what should i take"), "medicine_recommendation", "medium", False),
+    (("i have", "i feel", "i'm experiencing", "pain", "fever", "headache", "cough"), "symptom_inquiry", "medium", False),
+    (("bye", "goodbye", "see you", "take care"), "farewell", "low", False),
+    (("hi", "hello", "good morning", "hey"), "greeting", "low", False),
+    (("thank", "ok", "okay", "yes"), "positive_response", "low", False),
+)
+
+class Latency:
+    """Time-to-first-token sampler: fixed, uniform, normal or lognormal around mean_ms"""
+
+    def __init__(self, distribution: str, mean_ms: float, spread_ms: float, seed=None):
+        self.distribution = distribution
+        self.mean = mean_ms / 1000
+        self.spread = spread_ms / 1000
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return max(0.0, self.rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.distribution == "normal":
+            return max(0.0, self.rng.gauss(self.mean, self.spread))
+        if self.distribution == "lognormal":
+            # mean_ms is the median, spread_ms widens the right tail
+            sigma = math.log1p(self.spread / self.mean) if self.spread > 0 else 0.0
+            return self.rng.lognormvariate(math.log(self.mean), sigma)
+        return self.mean
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def _pick(options, key: str):
+    """Deterministic choice for a prompt"""
+    return options[int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % len(options)]
+
+def classification(query: str) -> dict:
+    lowered = f" {query.lower()} "
+    intent, urgency, rag_needed = "general_health", "low", False
+    for keywords, rule_intent, rule_urgency, rule_rag in INTENT_RULES:
+        if any(re.search(rf"\b{re.escape(k)}\b", lowered) for k in keywords):
+            intent, urgency, rag_needed = rule_intent, rule_urgency, rule_rag
+            break
+    return {
+        "intent": intent,
+        "urgency": urgency,
+        "symptoms": [w for w in ("fever", "headache", "cough", "pain", "nausea") if w in lowered],
+        "required_resources": {"rag_needed": rag_needed, "summarization_needed": False, "direct_llm": not rag_needed},
+        "risk_level": urgency,
+        "next_agent": "rag_agent" if rag_needed else "solution_agent",
+        "reasoning": f"Stub classification from keywords ({intent})",
+    }
+
+def summary_text() -> str:
+    return "\n".join(f"{section}:\n{content}" for section, content in SUMMARY_SECTIONS.items())
+
+def completion_text(prompt: str) -> str:
+    """Canned output for the agent the prompt belongs to"""
+    if "Medical Query Classification Specialist" in prompt or '"required_resources"' in prompt:
+        match = re.search(r"Analyze the patient query:\s*(.*)", prompt)
+        return json.dumps(classification(match.group(1) if match else prompt))
+    if "### SUMMARY" in prompt and "### GUIDANCE" in prompt:
+        return (
+            "### SUMMARY\n" + summary_text() + "\n\n"
+            "### GUIDANCE\nThank you for sharing your report. A few results are outside the usual range, "
+            "so please review them with a doctor who can explain what they mean for you.\n\n"
+            "### FOLLOW_UP\nWould you like me to help you book an appointment with a general physician?"
+        )
+    if "You are reading pages" in prompt:
+        return "- Symptoms and Tests: results as listed\n- Diagnosis: not stated\n- Treatments: none\n- Recommendations: follow-up"
+    if "Medical Report Summarizer Agent" in prompt:
+        return summary_text()
+    if "Medical Follow-up Specialist" in prompt:
+        return _pick((
+            "Have your symptoms changed since they started a few days ago?",
+            "Would you like me to check which doctors are available this week?",
+            "Is there anything else about your symptoms you would like to share?",
+        ), prompt)
+    if "MediConnect knowledge base" in prompt or "Combine all partial answers" in prompt:
+        context = prompt.split("Context:", 1)[-1].strip().splitlines()
+        return "Based on the MediConnect knowledge base: " + (context[0][:300] if context else "No relevant information found.")
+    if "Medical Solution Specialist" in prompt:
+        return _pick((
+            "I'm sorry to hear that. Based on what you've described, it would be best to see a general physician, "
+            "and I can help you find an available doctor at MediConnect.",
+            "Thank you for reaching out. MediConnect Medical Center can help with this; "
+            "our general physicians can assess your symptoms in person.",
+        ), prompt)
+    return "This is a stub response from the local LLM stand-in."
+
+def embed(item, dimensions: int) -> list:
+    """Hashed bag of words (or token ids), L2-normalized"""
+    tokens = WORD.findall(item.lower()) if isinstance(item, str) else [str(t) for t in item]
+    vector = [0.0] * dimensions
+    for token in tokens:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def create_app(chat_latency: Latency, embed_latency: Latency, tokens_per_second: float) -> FastAPI:
+    app = FastAPI(title="LLM stub server")
+    stats = {"chat_completions": 0, "streamed": 0, "embedding_requests": 0, "embedded_inputs": 0}
+
+    def generation_seconds(tokens: int) -> float:
+        return tokens / tokens_per_second if tokens_per_second > 0 else 0.0
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "stub"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt = "\n".join(
+            m["content"] if isinstance(m.get("content"), str)
+            else " ".join(part.get("text", "") for part in m.get("content") or [])
+            for m in messages
+        )
+        text = completion_text(prompt)
+        # CrewAI's ReAct prompt asks for the answer after a "Final Answer:" line
+        if "Final Answer:" in prompt:
+            text = f"Thought: I now can give a great answer\nFinal Answer: {text}"
+        model = body.get("model", "gpt-4o-mini")
+        usage = {"prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        stats["chat_completions"] += 1
+
+        if not body.get("stream"):
+            await asyncio.sleep(chat_latency.sample() + generation_seconds(usage["completion_tokens"]))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        stats["streamed"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            data = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra,
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            await asyncio.sleep(chat_latency.sample())
+            yield chunk({"role": "assistant", "content": ""})
+            pieces = re.findall(r"\S+\s*|\s+", text)
+            for piece in pieces:
+                await asyncio.sleep(generation_seconds(count_tokens(piece)))
+                yield chunk({"content": piece})
+            yield chunk({}, "stop")
+            if include_usage:
+                data = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                        "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        # A single string or a single list of token ids is one input
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = int(body.get("dimensions") or EMBEDDING_DIMENSIONS)
+        stats["embedding_requests"] += 1
+        stats["embedded_inputs"] += len(inputs)
+        await asyncio.sleep(embed_latency.sample())
+
+        data = []
+        for i, item in enumerate(inputs):
+            vector = embed(item, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        prompt_tokens = sum(count_tokens(item) if isinstance(item, str) else len(item) for item in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--distribution", choices=("fixed", "uniform", "normal", "lognormal"), default="lognormal")
+    parser.add_argument("--chat-latency-ms", type=float, default=400, help="time to first token (median for lognormal)")
+    parser.add_argument("--chat-spread-ms", type=float, default=150, help="half-width / std dev / tail width")
+    parser.add_argument("--embed-latency-ms", type=float, default=40)
+    parser.add_argument("--embed-spread-ms", type=float, default=15)
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="completion speed (0 = instant)")
+    parser.add_argument("--seed", type=int, default=None, help="seed the latency samplers")
+    args = parser.parse_args()
+
+    app = create_app(
+        Latency(args.distribution, args.chat_latency_ms, args.chat_spread_ms, args.seed),
+        Latency(args.distribution, args.embed_latency_ms, args.embed_spread_ms, args.seed),
+        args.tokens_per_second,
+    )
+    print(f"LLM stub server on http://{args.host}:{args.port}/v1 "
+          f"({args.distribution}, chat {args.chat_latency_ms}ms + {args.tokens_per_second} tok/s, "
+          f"embeddings {args.embed_latency_ms}ms)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Concurrent load test of the chat API with simulated multi-turn users.
+
+Each simulated user signs up, logs in (/auth/login) and holds one chat session
+of --turns requests. Most turns go to /api/chat/message, drawn from scripted
+messages per intent category. With probability --document-share a turn goes to
+/api/chat/document with a generated report (see bench_report_compression.py).
+Sessions continue through the delta protocol (last_turn_id), like the frontend.
+Users run concurrently and pause --think-ms between turns.
+
+The report gives throughput, error rate and latency percentiles (p50/p95/p99)
+per endpoint and per intent category. Each response's new turn must start with
+the message its user sent; other responses are counted as history_mismatches
+(a session served another session's history).
+
+By default the script starts the offline LLM stub (llm_stub_server.py) and the
+API itself (in-memory storage, OPENAI_BASE_URL pointing at the stub) as
+subprocesses, so runs are repeatable for a given --seed. --base-url targets an
+already running server instead.
+
+Usage:
+    python load_test.py --users 20 --turns 5
+    python load_test.py --users 50 --turns 8 --stub-latency-ms 600 --seed 3
+    python load_test.py --base-url http://127.0.0.1:8000 --users 10
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+
+import httpx
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from bench_report_compression import sample_reports
+
+MESSAGES = {
+    "symptom": [
+        "I've had a fever and cough for three days",
+        "I have a headache that won't go away",
+        "I'm feeling dizzy and nauseous",
+        "I have a persistent sore throat",
+    ],
+    "doctor": [
+        "Can I see a cardiologist?",
+        "Do you have psychologists available?",
+        "Who are the available dermatologists?",
+    ],
+    "appointment": [
+        "I want to book an appointment with a doctor",
+        "Can I get a same-day appointment?",
+        "How can I book an appointment online?",
+    ],
+    "center_information": [
+        "What are your opening hours?",
+        "Where is your clinic located?",
+        "What services do you offer?",
+    ],
+    "conversation": [
+        "Hello",
+        "Thank you, that helps",
+        "Okay, goodbye",
+    ],
+}
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+class Recorder:
+    """Latencies and errors per endpoint and per intent category"""
+
+    def __init__(self):
+        self.samples = {}  # (group, name) -> [(seconds, ok)]
+        self.history_mismatches = 0
+
+    def add(self, group: str, name: str, seconds: float, ok: bool):
+        self.samples.setdefault((group, name), []).append((seconds, ok))
+
+    def report(self, elapsed: float) -> dict:
+        result = {}
+        for (group, name), samples in sorted(self.samples.items()):
+            latencies = [seconds for seconds, _ in samples]
+            errors = sum(1 for _, ok in samples if not ok)
+            result.setdefault(group, {})[name] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "error_rate": round(errors / len(samples), 3),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "max_ms": round(max(latencies) * 1000, 1),
+            }
+        return result
+
+async def timed_post(client, recorder, endpoint, category, path, **kwargs):
+    """POST and record the latency under the endpoint and (if given) the category"""
+    start = time.perf_counter()
+    try:
+        response = await client.post(path, **kwargs)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    seconds = time.perf_counter() - start
+    recorder.add("endpoints", endpoint, seconds, ok)
+    if category:
+        recorder.add("categories", category, seconds, ok)
+    return response if ok else None
+
+async def simulate_user(client, recorder, args, index: int, reports: list):
+    rng = random.Random(args.seed * 100_003 + index)
+    email = f"load-{args.run_id}-{index}@example.com"
+    password = "load-test-password"
+    await client.post("/auth/signup", json={"email": email, "password": password})
+    response = await timed_post(client, recorder, "/auth/login", None, "/auth/login",
+                                json={"email": email, "password": password})
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    last_turn_id = None
+    for _ in range(args.turns):
+        if rng.random() < args.document_share:
+            name, pages = rng.choice(reports)
+            path, category = "/api/chat/document", "document"
+            body = {"document_content": "\n\n".join(pages)}
+            sent = "doc:" + body["document_content"]
+        else:
+            category = rng.choice(sorted(MESSAGES))
+            path = "/api/chat/message"
+            # The user tag makes every message unique to its session
+            body = {"message": f"{rng.choice(MESSAGES[category])} [user {index}]"}
+            sent = body["message"]
+        body.update(delta=True, last_turn_id=last_turn_id)
+        response = await timed_post(client, recorder, path, category, path, json=body, headers=headers)
+        if response is not None:
+            data = response.json()
+            last_turn_id = data.get("turn_id")
+            new_turns = data.get("new_turns") or [{}]
+            first = (new_turns[-1].get("messages") or [{}])[0]
+            if first.get("content") != sent:
+                recorder.history_mismatches += 1
+        else:
+            # Start over with a fresh history after a failed turn
+            last_turn_id = None
+        await asyncio.sleep(args.think_ms / 1000 * rng.uniform(0.5, 1.5))
+
+async def wait_until_up(url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+def start_services(args):
+    """Start the LLM stub and the API; returns (processes, API base URL)"""
+    evaluations = Path(__file__).parent
+    stub = subprocess.Popen([
+        sys.executable, str(evaluations / "llm_stub_server.py"),
+        "--port", str(args.stub_port), "--seed", str(args.seed),
+        "--chat-latency-ms", str(args.stub_latency_ms),
+        "--tokens-per-second", str(args.stub_tokens_per_second),
+    ])
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.stub_port}/v1",
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "stub",
+        "STORAGE_BACKEND": "memory",
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=str(project_root), env=env,
+    )
+    return [api, stub], f"http://127.0.0.1:{args.api_port}"
+
+async def run(args):
+    processes = []
+    base_url = args.base_url
+    if base_url is None:
+        processes, base_url = start_services(args)
+    try:
+        if processes:
+            await wait_until_up(f"http://127.0.0.1:{args.stub_port}/v1/models")
+        await wait_until_up(f"{base_url}/health")
+
+        recorder = Recorder()
+        reports = sample_reports(seed=args.seed)
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(simulate_user(client, recorder, args, i, reports) for i in range(args.users)))
+            elapsed = time.perf_counter() - start
+
+        total = sum(len(samples) for (group, _), samples in recorder.samples.items() if group == "endpoints")
+        errors = sum(
+            1 for (group, _), samples in recorder.samples.items() if group == "endpoints"
+            for _, ok in samples if not ok
+        )
+        return {
+            "base_url": base_url,
+            "users": args.users,
+            "turns_per_user": args.turns,
+            "seed": args.seed,
+            "llm": "stub" if processes else "as configured on the server",
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "error_rate": round(errors / total, 3) if total else None,
+            "history_mismatches": recorder.history_mismatches,
+            **recorder.report(elapsed),
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=5, help="chat requests per user session")
+    parser.add_argument("--document-share", type=float, default=0.2, help="share of turns that upload a report")
+    parser.add_argument("--think-ms", type=float, default=200, help="mean pause between a user's turns")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--base-url", default=None, help="load an already running API instead of starting one")
+    parser.add_argument("--api-port", type=int, default=8010)
+    parser.add_argument("--stub-port", type=int, default=8100)
+    parser.add_argument("--stub-latency-ms", type=float, default=400, help="stub time to first token (median)")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=80)
+    args = parser.parse_args()
+    # Fresh accounts per run, so repeated runs against one server do not collide
+    args.run_id = uuid.uuid4().hex[:8]
+
+    results = asyncio.run(run(args))
+
+    print("Chat API Load Test")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
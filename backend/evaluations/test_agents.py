@@ -2,7 +2,9 @@ import sys
 import os
 import time
 import json
+import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
@@ -125,10 +127,97 @@ TEST_CASES = [
     
 ]
 
-def test_individual_agents(test_query):
-    """Test each agent individually to measure response times"""
-    print("Testing Individual Agents")
-    print("=" * 50)
+# Queries used to warm every component up before the measured cases
+WARMUP_QUERY = "Hello, how are you?"
+WARMUP_RAG_QUERY = "What are your opening hours?"
+
+def _silent(*args, **kwargs):
+    pass
+
+def build_agents():
+    """Import and construct every agent once.
+
+    Returns (agents, construction seconds per component). A component that fails
+    to build is None and its error is printed; cases that need it then fail.
+    """
+    def load_classifier():
+        from agents.Query_Classifier import QueryClassifierAgent
+        return QueryClassifierAgent()
+
+    def load_solution():
+        from agents.solution_agent import SolutionAgent
+        return SolutionAgent()
+
+    def load_followup():
+        from agents.followup_agent import FollowUpAgent
+        return FollowUpAgent()
+
+    def load_rag():
+        # Importing rag_agent creates the embedding and chat clients
+        from agents.rag_agent import answer_query
+        return answer_query
+
+    def load_doc_summarizer():
+        from agents.Doc_Summerize import read_pdf
+        return read_pdf
+
+    loaders = {
+        "query_classifier": load_classifier,
+        "solution_agent": load_solution,
+        "followup_agent": load_followup,
+        "rag_agent": load_rag,
+        "document_summarizer": load_doc_summarizer,
+    }
+    agents, construction = {}, {}
+    for name, load in loaders.items():
+        start_time = time.time()
+        try:
+            agents[name] = load()
+        except Exception as e:
+            print(f"   Could not build {name}: {e}")
+            agents[name] = None
+        construction[name] = time.time() - start_time
+    return agents, construction
+
+def warm_up(agents):
+    """Call every component once so the measured cases run warm.
+
+    Returns the first-call seconds per component (HTTP connection setup,
+    tokenizer loading, opening the Chroma index, ...).
+    """
+    first_call = {}
+
+    def timed(name, call):
+        if agents[name] is None:
+            return None
+        start_time = time.time()
+        try:
+            return call()
+        except Exception as e:
+            print(f"   Warm-up of {name} failed: {e}")
+            return None
+        finally:
+            first_call[name] = time.time() - start_time
+
+    classification = timed("query_classifier", lambda: agents["query_classifier"].classify_query(WARMUP_QUERY))
+    classification = classification or {"intent": "conversation"}
+    solution = timed("solution_agent", lambda: agents["solution_agent"].generate_unified_response(
+        classification=classification, patient_query=WARMUP_QUERY, chat_history=[]
+    ))
+    timed("followup_agent", lambda: agents["followup_agent"].generate_followup(
+        solution=solution or "Hello! How can I help you today?",
+        original_query=WARMUP_QUERY,
+        classification=classification,
+        chat_history=[]
+    ))
+    timed("rag_agent", lambda: agents["rag_agent"](WARMUP_RAG_QUERY))
+    return first_call
+
+def test_individual_agents(test_query, agents, verbose=True):
+    """Run one test case through the prebuilt agents and measure each stage"""
+    log = print if verbose else _silent
+    log("Testing Individual Agents")
+    log("=" * 50)
     
     results = {
         "test_query": test_query,
@@ -150,12 +239,11 @@ def test_individual_agents(test_query):
     }
     
     # Step 1: Query Classifier
-    print(f"\n1. Query Classifier Processing...")
+    log(f"\n1. Query Classifier Processing...")
     qc_start_time = time.time()
     qc_result = None
     try:
-        from agents.Query_Classifier import QueryClassifierAgent
-        classifier = QueryClassifierAgent()
+        classifier = agents["query_classifier"]
         qc_result = classifier.classify_query(test_query)
         results["qc_success"] = 1 if (qc_result and 'intent' in qc_result) else 0
         
@@ -165,53 +253,51 @@ def test_individual_agents(test_query):
             results["rag_needed"] = resources.get('rag_needed', False)
             results["doc_sum_needed"] = resources.get('summarization_needed', False)
         
-        print(f"   Result: {qc_result.get('intent', 'N/A') if qc_result else 'None'}")
-        print(f"   RAG Needed: {results['rag_needed']}")
-        print(f"   Document Summarizer Needed: {results['doc_sum_needed']}")
+        log(f"   Result: {qc_result.get('intent', 'N/A') if qc_result else 'None'}")
+        log(f"   RAG Needed: {results['rag_needed']}")
+        log(f"   Document Summarizer Needed: {results['doc_sum_needed']}")
     except Exception as e:
-        print(f"   Error: {e}")
+        log(f"   Error: {e}")
         results["qc_success"] = 0
         results["workflow_success"] = False
     
     results["qc_time"] = time.time() - qc_start_time
-    print(f"   Response Time: {results['qc_time']:.2f}s")
-    print(f"   Success: {'Yes' if results['qc_success'] else 'No'}")
+    log(f"   Response Time: {results['qc_time']:.2f}s")
+    log(f"   Success: {'Yes' if results['qc_success'] else 'No'}")
     
     # Step 2: Solution Agent (only if Query Classifier succeeded)
     sol_result = None
     if qc_result and results["qc_success"]:
-        print(f"\n2. Solution Agent Processing...")
+        log(f"\n2. Solution Agent Processing...")
         sol_start_time = time.time()
         try:
-            from agents.solution_agent import SolutionAgent
-            agent = SolutionAgent()
+            agent = agents["solution_agent"]
             sol_result = agent.generate_unified_response(
                 classification=qc_result,
                 patient_query=test_query,
                 chat_history=[]
             )
             results["sol_success"] = 1 if (sol_result and len(sol_result) > 10) else 0
-            print(f"   Result Length: {len(sol_result) if sol_result else 0} characters")
+            log(f"   Result Length: {len(sol_result) if sol_result else 0} characters")
         except Exception as e:
-            print(f"   Error: {e}")
+            log(f"   Error: {e}")
             results["sol_success"] = 0
             results["workflow_success"] = False
         
         results["sol_time"] = time.time() - sol_start_time
-        print(f"   Response Time: {results['sol_time']:.2f}s")
-        print(f"   Success: {'Yes' if results['sol_success'] else 'No'}")
+        log(f"   Response Time: {results['sol_time']:.2f}s")
+        log(f"   Success: {'Yes' if results['sol_success'] else 'No'}")
     else:
-        print(f"\n2. Solution Agent: Skipped (Query Classifier failed)")
+        log(f"\n2. Solution Agent: Skipped (Query Classifier failed)")
         results["workflow_success"] = False
     
     # Step 3: Follow-up Agent (only if Solution Agent succeeded)
     followup_result = None
     if results["sol_success"] and qc_result:
-        print(f"\n3. Follow-up Agent Processing...")
+        log(f"\n3. Follow-up Agent Processing...")
         followup_start_time = time.time()
         try:
-            from agents.followup_agent import FollowUpAgent
-            agent = FollowUpAgent()
+            agent = agents["followup_agent"]
             followup_result = agent.generate_followup(
                 solution=sol_result if sol_result else "Based on your symptoms, I recommend consulting with a healthcare professional.",
                 original_query=test_query,
@@ -219,17 +305,17 @@ def test_individual_agents(test_query):
                 chat_history=[]
             )
             results["followup_success"] = 1 if (followup_result and len(followup_result) > 5) else 0
-            print(f"   Result: {followup_result[:50] + '...' if followup_result and len(followup_result) > 50 else followup_result}")
+            log(f"   Result: {followup_result[:50] + '...' if followup_result and len(followup_result) > 50 else followup_result}")
         except Exception as e:
-            print(f"   Error: {e}")
+            log(f"   Error: {e}")
             results["followup_success"] = 0
             results["workflow_success"] = False
         
         results["followup_time"] = time.time() - followup_start_time
-        print(f"   Response Time: {results['followup_time']:.2f}s")
-        print(f"   Success: {'Yes' if results['followup_success'] else 'No'}")
+        log(f"   Response Time: {results['followup_time']:.2f}s")
+        log(f"   Success: {'Yes' if results['followup_success'] else 'No'}")
     else:
-        print(f"\n3. Follow-up Agent: Skipped (Solution Agent failed)")
+        log(f"\n3. Follow-up Agent: Skipped (Solution Agent failed)")
         results["workflow_success"] = False
     
     # Combine solution and follow-up for final response
@@ -243,49 +329,48 @@ def test_individual_agents(test_query):
     
     # Step 4: RAG Agent (only if needed based on classification)
     if results["rag_needed"]:
-        print(f"\n4. RAG Agent Processing...")
+        log(f"\n4. RAG Agent Processing...")
         rag_start_time = time.time()
         try:
-            from agents.rag_agent import answer_query
+            answer_query = agents["rag_agent"]
             rag_result = answer_query(test_query)
             # The rag_result is a dict with "answer" and "sources" keys
             if isinstance(rag_result, dict):
                 answer = rag_result.get("answer", "")
                 results["rag_success"] = 1 if (answer and len(answer) > 10) else 0
-                print(f"   Answer Length: {len(answer) if answer else 0} characters")
+                log(f"   Answer Length: {len(answer) if answer else 0} characters")
             else:
                 results["rag_success"] = 1 if (rag_result and len(rag_result) > 10) else 0
-                print(f"   Result Length: {len(rag_result) if rag_result else 0} characters")
+                log(f"   Result Length: {len(rag_result) if rag_result else 0} characters")
         except Exception as e:
-            print(f"   Error: {e}")
+            log(f"   Error: {e}")
             results["rag_success"] = 0
         
         results["rag_time"] = time.time() - rag_start_time
-        print(f"   Response Time: {results['rag_time']:.2f}s")
-        print(f"   Success: {'Yes' if results['rag_success'] else 'No'}")
+        log(f"   Response Time: {results['rag_time']:.2f}s")
+        log(f"   Success: {'Yes' if results['rag_success'] else 'No'}")
     else:
-        print(f"\n4. RAG Agent: Skipped (Not needed for this query)")
+        log(f"\n4. RAG Agent: Skipped (Not needed for this query)")
         results["rag_time"] = 0  # No time spent since it's not needed
     
     # Step 5: Document Summarizer (only if needed based on classification)
     if results["doc_sum_needed"]:
-        print(f"\n5. Document Summarizer Processing...")
+        log(f"\n5. Document Summarizer Processing...")
         doc_sum_start_time = time.time()
-        try:
-            from agents.Doc_Summerize import read_pdf
+        if agents["document_summarizer"] is not None:
             # Since we don't have an actual PDF, we'll simulate with text
             doc_sum_result = "This is a simulated document summary for testing purposes."
             results["doc_sum_success"] = 1  # Simulate success
-            print(f"   Result: Simulated document summary")
-        except Exception as e:
-            print(f"   Error: {e}")
+            log(f"   Result: Simulated document summary")
+        else:
+            log(f"   Error: Document Summarizer is not available")
             results["doc_sum_success"] = 0
         
         results["doc_sum_time"] = time.time() - doc_sum_start_time
-        print(f"   Response Time: {results['doc_sum_time']:.2f}s")
-        print(f"   Success: {'Yes' if results['doc_sum_success'] else 'No'}")
+        log(f"   Response Time: {results['doc_sum_time']:.2f}s")
+        log(f"   Success: {'Yes' if results['doc_sum_success'] else 'No'}")
     else:
-        print(f"\n5. Document Summarizer: Skipped (Not needed for this query)")
+        log(f"\n5. Document Summarizer: Skipped (Not needed for this query)")
         results["doc_sum_time"] = 0  # No time spent since it's not needed
     
     # Calculate total time (only for agents that were actually used)
@@ -363,31 +448,104 @@ def generate_final_table(results):
     print(f"Total Response Time: {results['total_time']:.2f}s\n")
     print(f"Status: {'Pass' if results['workflow_success'] else 'Fail'}")
 
+# Steady-state stages: (report name, time key, needed key or None when always run)
+STAGES = [
+    ("query_classifier", "qc_time", None),
+    ("solution_agent", "sol_time", None),
+    ("followup_agent", "followup_time", None),
+    ("rag_agent", "rag_time", "rag_needed"),
+    ("document_summarizer", "doc_sum_time", "doc_sum_needed"),
+    ("total", "total_time", None),
+]
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+def summarize_stages(all_results):
+    """Per-stage latency over the cases in which the stage ran"""
+    summary = {}
+    for name, time_key, needed_key in STAGES:
+        times = [
+            r[time_key] for r in all_results
+            if r[time_key] > 0 and (needed_key is None or r[needed_key])
+        ]
+        if not times:
+            continue
+        summary[name] = {
+            "runs": len(times),
+            "mean_s": round(sum(times) / len(times), 3),
+            "p50_s": round(percentile(times, 0.50), 3),
+            "p95_s": round(percentile(times, 0.95), 3),
+            "max_s": round(max(times), 3),
+        }
+    return summary
+
+def run_cases(test_cases, agents, workers):
+    """Run the cases (in parallel when workers > 1); results keep the case order"""
+    if workers <= 1:
+        results = []
+        for i, test_query in enumerate(test_cases, 1):
+            print(f"\nRunning Test Case {i}/{len(test_cases)}")
+            print(f"Test Query: {test_query}")
+            results.append(test_individual_agents(test_query, agents))
+        return results
+    # Stage-by-stage output of concurrent cases would interleave, so only the tables are printed
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda q: test_individual_agents(q, agents, verbose=False), test_cases))
+
 def main():
+    parser = argparse.ArgumentParser(description="Measure per-agent latency over TEST_CASES with prebuilt, warmed-up agents")
+    parser.add_argument("--workers", type=int, default=1, help="test cases run in parallel")
+    parser.add_argument("--no-warmup", action="store_true", help="skip the warm-up calls (first cases then include it)")
+    parser.add_argument("--limit", type=int, default=None, help="run only the first N test cases")
+    args = parser.parse_args()
+    test_cases = TEST_CASES[:args.limit] if args.limit else TEST_CASES
+
     print("Agentic AI-Based Customer Support System - Batch Testing")
     print("="*70)
-    
-    # Run all test cases one by one
-    for i, test_query in enumerate(TEST_CASES, 1):
-        print(f"\nRunning Test Case {i}/{len(TEST_CASES)}")
-        print(f"Test Query: {test_query}")
-        
-        # Test individual agents
-        results = test_individual_agents(test_query)
-        
+
+    # Cold start: imports and construction, then the first call of each component
+    print("\nBuilding agents...")
+    agents, construction = build_agents()
+    first_call = {}
+    if not args.no_warmup:
+        print("Warming up agents...")
+        first_call = warm_up(agents)
+
+    wall_start = time.time()
+    all_results = run_cases(test_cases, agents, args.workers)
+    wall_time = time.time() - wall_start
+
+    for i, results in enumerate(all_results, 1):
         # Generate final table
         generate_final_table(results)
         
         # Save results to JSON file
         save_results_to_json(results)
         
-        print(f"\nEvaluation completed!")
-        
         # Add a separator between test cases
-        if i < len(TEST_CASES):
+        if i < len(all_results):
             print("\n" + "="*80)
             print("NEXT TEST CASE")
             print("="*80)
 
+    summary = {
+        "test_cases": len(all_results),
+        "workers": args.workers,
+        "passed": sum(1 for r in all_results if r["workflow_success"]),
+        "wall_time_s": round(wall_time, 2),
+        "cases_per_second": round(len(all_results) / wall_time, 3) if wall_time else None,
+        "cold_start": {
+            "construction_s": {name: round(t, 3) for name, t in construction.items()},
+            "first_call_s": {name: round(t, 3) for name, t in first_call.items()},
+        },
+        "steady_state": summarize_stages(all_results),
+    }
+    print("\nCold Start vs Steady State")
+    print("=" * 50)
+    print(json.dumps(summary, indent=2))
+    print(f"\nEvaluation completed!")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
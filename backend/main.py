@@ -6,12 +6,17 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routes import auth
 from backend.routes import chat
 from backend.routes import admin
-from backend.database.mongodb import connect_to_mongo, close_mongo_connection
+from backend.database.storage import connect_storage, close_storage
+from backend.utils.pdf_extract import shutdown_extract_pool
+from backend.utils.tracing import configure_tracing, shutdown_tracing, metrics_payload
+from backend.database.write_queue import chat_write_queue
+from backend.database.archive import chat_archiver
+from backend.core.config import settings
 import logging
 
 # Setup logging
@@ -55,6 +60,7 @@ async def health_check():
         "endpoints": {
             "docs": "/docs",
             "health": "/health",
+            "metrics": "/metrics",
             "auth": "/api/auth",
             "chat": "/api/chat"
         }
@@ -72,21 +78,53 @@ async def root():
         "health": "/health"
     }
 
+# Prometheus scrape endpoint (per-stage latency histograms, see backend/utils/tracing.py)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+# Watch-folder ingestion service (started when INGEST_WATCHER_ENABLED is set)
+ingest_watcher = None
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize database connection"""
+    global ingest_watcher
+    configure_tracing(settings.OTEL_TRACES_ENDPOINT, settings.OTEL_SERVICE_NAME)
     try:
-        await connect_to_mongo()
+        await connect_storage()
+        chat_write_queue.start()
+        if settings.CHAT_ARCHIVE_ENABLED or settings.CHAT_RETENTION_DAYS > 0:
+            chat_archiver.start()
         logger.info("Application startup completed successfully")
     except Exception as e:
         logger.warning(f"Failed to connect to MongoDB: {e}")
         logger.warning("⚠️ Application starting without database connection - some features may not work")
         logger.info("💡 To fix this: Install MongoDB locally or set up MongoDB Atlas")
 
+    if settings.INGEST_WATCHER_ENABLED:
+        try:
+            from backend.agents.ingest_watcher import IngestWatcher
+            ingest_watcher = IngestWatcher()
+            ingest_watcher.start()
+            logger.info("Ingestion watcher started")
+        except Exception as e:
+            logger.error(f"Failed to start ingestion watcher: {e}")
+            ingest_watcher = None
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection"""
-    await close_mongo_connection()
+    if ingest_watcher is not None:
+        ingest_watcher.stop()
+    await chat_archiver.stop()
+    # Drain queued chat writes before the connection goes away
+    await chat_write_queue.stop()
+    await close_storage()
+    shutdown_extract_pool()
+    shutdown_tracing()
     logger.info("Application shutdown completed")
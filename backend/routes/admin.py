@@ -1,18 +1,26 @@
 # Admin routes for PDF ingestion and management
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
 from datetime import datetime, timezone
 from bson import ObjectId
 import os
-import shutil
-import tempfile
+import uuid
+import asyncio
+from functools import partial
 from pathlib import Path
 
 from backend.schemas.user import AdminLogin, AdminPublic, Token
 from backend.utils.hash import verify_password
 from backend.database.mongodb import get_db
-from backend.core.security import create_access_token, get_current_user
-from backend.agents.ingest import ingest
+from backend.database.storage import get_storage
+from backend.database.write_queue import chat_write_queue
+from backend.database.indexes import index_usage
+from backend.database.archive import chat_archiver, storage_status
+from backend.core.config import settings
+from backend.core.security import create_access_token, get_current_user, get_current_admin, invalidate_user, user_cache
+from backend.utils.uploads import stream_upload_to_disk
+from backend.agents.ingest import ingest, ingest_directory, load_manifest, DATA_DIR, MAX_WORKERS
+from backend.agents.ingest_watcher import read_status as read_watcher_status
 
 # Router with /admin prefix
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -60,62 +68,85 @@ async def get_admin_info():
 async def upload_pdf(
     file: UploadFile = File(...),
     force_reindex: bool = Form(False),
-    db=Depends(get_db)
+    storage=Depends(get_storage)
 ):
-    """Upload and ingest PDF file, then save/update metadata in MongoDB."""
+    """Upload and ingest PDF file, then save/update metadata in MongoDB.
+
+    The upload is hashed while it streams to disk, so identical re-uploads are
+    answered from the manifest without parsing or embedding anything.
+    """
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    # Resolve project-root data directory (outside backend and frontend)
-    project_root = Path(__file__).parent.parent.parent
-    data_dir = project_root / "data"
+    # Project-root data directory (outside backend and frontend)
+    data_dir = Path(DATA_DIR)
     data_dir.mkdir(exist_ok=True)
 
-    file_path = data_dir / file.filename
+    filename = Path(file.filename).name
+    file_path = data_dir / filename
+    # Stream into a hidden temp file so a failed upload never clobbers the current PDF
+    tmp_path = data_dir / f".{filename}.{uuid.uuid4().hex}.part"
 
     try:
-        # Save uploaded file to disk
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save uploaded file to disk, hashing and size-checking in the same pass
+        file_hash, size_bytes = await stream_upload_to_disk(
+            file, tmp_path, settings.MAX_PDF_UPLOAD_MB * 1024 * 1024
+        )
+
+        # Identical re-upload: short-circuit before any parsing
+        previous = load_manifest()["sources"].get(filename)
+        if not force_reindex and previous and previous.get("sha256") == file_hash and file_path.exists():
+            tmp_path.unlink()
+            return {
+                "status": "unchanged",
+                "message": f"PDF '{filename}' is identical to the indexed version; ingestion skipped",
+                "filename": filename,
+                "file_path": str(file_path),
+                "manifest": {**previous, "skipped": True},
+            }
 
-        # Ingest and get manifest (handles delete + re-embed on update)
-        manifest = ingest(str(file_path), force_reindex=force_reindex) or {}
+        os.replace(tmp_path, file_path)
 
-        # Save metadata in MongoDB when db is available
-        if db is not None:
+        # Ingest with the streamed digest (handles delete + re-embed on update)
+        loop = asyncio.get_event_loop()
+        manifest = await loop.run_in_executor(
+            None, partial(ingest, str(file_path), force_reindex=force_reindex, file_hash=file_hash)
+        ) or {}
+
+        # Save metadata when storage is available
+        if storage is not None:
             meta = {
-                "title": file.filename,
+                "title": filename,
                 "path": str(file_path),
-                "sha256": manifest.get("sha256"),
+                "sha256": file_hash,
                 "num_chunks": manifest.get("num_chunks", 0),
                 "content_type": file.content_type or "application/pdf",
-                "size_bytes": file_path.stat().st_size if file_path.exists() else None,
+                "size_bytes": size_bytes,
                 "uploaded_at": datetime.now(timezone.utc),
                 "force_reindex": bool(force_reindex),
             }
             # Upsert on title (filename); consider a better key later if needed
-            await db["pdfs"].update_one(
-                {"title": file.filename},
-                {"$set": meta, "$setOnInsert": {"created_at": datetime.now(timezone.utc)}},
-                upsert=True,
-            )
+            await storage.upsert_pdf(filename, meta)
 
         return {
             "status": "success",
-            "message": f"PDF '{file.filename}' uploaded and ingested successfully",
-            "filename": file.filename,
+            "message": f"PDF '{filename}' uploaded and ingested successfully",
+            "filename": filename,
             "file_path": str(file_path),
             "manifest": manifest,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Clean up file if ingestion fails
-        if file_path.exists():
-            try:
-                file_path.unlink()
-            except Exception:
-                pass
+        for path in (tmp_path, file_path):
+            if path.exists():
+                try:
+                    path.unlink()
+                except Exception:
+                    pass
         raise HTTPException(status_code=500, detail=f"Failed to ingest PDF: {str(e)}")
 
 @router.get("/ingest-status")
@@ -141,7 +172,9 @@ async def get_ingest_status():
             "status": "success",
             "message": "Ingestion data available",
             "last_ingestion": manifest.get("source"),
-            "total_chunks": manifest.get("num_chunks", 0),
+            "total_chunks": manifest.get("total_chunks", manifest.get("num_chunks", 0)),
+            "num_sources": len(manifest.get("sources", {})),
+            "index_generation": manifest.get("generation", 0),
             "file_hash": manifest.get("sha256", "")[:16] + "..."
         }
         
@@ -153,10 +186,129 @@ async def get_ingest_status():
             "total_chunks": 0
         }
 
-@router.post("/reingest")
-async def reingest_existing():
-    """Re-ingest existing PDF files"""
-    data_dir = Path("data")
+@router.get("/watcher-status", dependencies=[Depends(get_current_admin)])
+async def get_watcher_status():
+    """Get the status written by the data/ watch-folder ingestion service"""
+    try:
+        status = read_watcher_status()
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to read watcher status: {str(e)}"
+        }
+    
+    if status is None:
+        return {
+            "status": "not_running",
+            "message": "The ingestion watcher has not been started"
+        }
+    
+    return {
+        "status": "running" if status.get("running") else "stopped",
+        "watcher": status
+    }
+
+@router.get("/write-queue-status", dependencies=[Depends(get_current_admin)])
+async def get_write_queue_status():
+    """Get depth and flush latency of the chat persistence write-behind queue"""
+    return {
+        "status": "running" if chat_write_queue.stats()["running"] else "stopped",
+        "queue": chat_write_queue.stats()
+    }
+
+@router.get("/index-stats", dependencies=[Depends(get_current_admin)])
+async def get_index_stats(db=Depends(get_db)):
+    """Get per-index usage counters ($indexStats) for the registered collections"""
+    if db is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    try:
+        return {
+            "status": "success",
+            "indexes": await index_usage(db)
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to read index stats: {str(e)}"
+        )
+
+async def set_user_active(user_id: str, active: bool, storage):
+    """Set a user's is_active flag and drop the cached user"""
+    if storage is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid user id"
+        )
+    if not await storage.update_user(user_id, {"is_active": active}):
+        raise HTTPException(
+            status_code=404,
+            detail="User not found"
+        )
+    invalidate_user(user_id, deactivated=not active)
+    return {
+        "status": "success",
+        "message": f"User {user_id} {'activated' if active else 'deactivated'}",
+        "user_id": user_id,
+        "is_active": active
+    }
+
+@router.post("/users/{user_id}/deactivate", dependencies=[Depends(get_current_admin)])
+async def deactivate_user(user_id: str, storage=Depends(get_storage)):
+    """Deactivate a user; their tokens stop working immediately in this process and,
+    in other workers, once their cached user expires (see core/security.py)"""
+    return await set_user_active(user_id, False, storage)
+
+@router.post("/users/{user_id}/activate", dependencies=[Depends(get_current_admin)])
+async def activate_user(user_id: str, storage=Depends(get_storage)):
+    """Reactivate a user"""
+    return await set_user_active(user_id, True, storage)
+
+@router.get("/user-cache-status", dependencies=[Depends(get_current_admin)])
+async def get_user_cache_status():
+    """Get hit ratio and size of the authenticated-user cache"""
+    return {
+        "status": "success",
+        "embed_user_claims": settings.JWT_EMBED_USER_CLAIMS,
+        "cache": user_cache.stats()
+    }
+
+@router.get("/archive-status", dependencies=[Depends(get_current_admin)])
+async def get_archive_status():
+    """Get the cold-session archiver state and hot/archive collection sizes"""
+    return {
+        "status": "running" if chat_archiver.status()["running"] else "stopped",
+        "archiver": chat_archiver.status(),
+        "storage": await storage_status()
+    }
+
+@router.post("/archive-cold-sessions", dependencies=[Depends(get_current_admin)])
+async def archive_cold_sessions_now():
+    """Run one cold-session archival batch now"""
+    try:
+        report = await chat_archiver.run_once()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to archive cold sessions: {str(e)}"
+        )
+    return report
+
+@router.post("/reingest", dependencies=[Depends(get_current_admin)])
+async def reingest_existing(
+    force_reindex: bool = True,
+    # INGEST_MAX_WORKERS is the ceiling; callers may only ask for fewer threads
+    max_workers: int = Query(MAX_WORKERS, ge=1, le=MAX_WORKERS),
+):
+    """Re-ingest every PDF in the data directory with a bounded worker pool"""
+    data_dir = Path(DATA_DIR)
     
     if not data_dir.exists():
         raise HTTPException(
@@ -164,29 +316,32 @@ async def reingest_existing():
             detail="No data directory found"
         )
     
-    pdf_files = list(data_dir.glob("*.pdf"))
-    
-    if not pdf_files:
+    if not any(p.suffix.lower() == ".pdf" for p in data_dir.iterdir()):
         raise HTTPException(
             status_code=404,
             detail="No PDF files found in data directory"
         )
     
     try:
-        # Re-ingest the first PDF found
-        pdf_path = pdf_files[0]
-        ingest(str(pdf_path), force_reindex=True)
+        # Run the bulk re-index in a worker thread to keep the event loop free
+        loop = asyncio.get_event_loop()
+        report = await loop.run_in_executor(
+            None,
+            partial(ingest_directory, str(data_dir), force_reindex=force_reindex, max_workers=max_workers)
+        )
+        totals = report["totals"]
         
         return {
-            "status": "success",
-            "message": f"Re-ingested PDF: {pdf_path.name}",
-            "filename": pdf_path.name
+            "status": "success" if totals["failed"] == 0 else "partial",
+            "message": f"Re-ingested {totals['ingested']} PDF(s), skipped {totals['skipped']}, "
+                       f"duplicates {totals['duplicate']}, failed {totals['failed']}",
+            "report": report
         }
         
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to re-ingest PDF: {str(e)}"
+            detail=f"Failed to re-ingest PDFs: {str(e)}"
         )
 
 @router.get("/health")
@@ -200,6 +355,14 @@ async def admin_health_check():
             "GET /admin/me", 
             "POST /admin/upload-pdf",
             "GET /admin/ingest-status",
+            "GET /admin/watcher-status",
+            "GET /admin/write-queue-status",
+            "GET /admin/index-stats",
+            "POST /admin/users/{user_id}/deactivate",
+            "POST /admin/users/{user_id}/activate",
+            "GET /admin/user-cache-status",
+            "GET /admin/archive-status",
+            "POST /admin/archive-cold-sessions",
             "POST /admin/reingest"
         ]
     }
@@ -2,22 +2,21 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from datetime import datetime, timezone
-from bson import ObjectId
 from pymongo.errors import DuplicateKeyError
 
 from backend.schemas.user import UserCreate, UserLogin, UserPublic, Token
-from backend.utils.hash import hash_password, verify_password
-from backend.database.mongodb import get_db
-from backend.core.security import create_access_token, get_current_user
+from backend.utils.hash import hash_password_async, verify_and_update_password
+from backend.database.storage import get_storage
+from backend.core.security import create_access_token, get_current_user, user_token_claims, invalidate_user
 
 # Router with /auth prefix
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/signup", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
-async def signup(payload: UserCreate, db=Depends(get_db)):
+async def signup(payload: UserCreate, storage=Depends(get_storage)):
     """Register a new user"""
     # Check if database is available
-    if db is None:
+    if storage is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Database service unavailable"
@@ -27,7 +26,7 @@ async def signup(payload: UserCreate, db=Depends(get_db)):
     email = payload.email.lower().strip()
     
     # Check if user exists
-    existing_user = await db["users"].find_one({"email": email})
+    existing_user = await storage.get_user_by_email(email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,15 +36,14 @@ async def signup(payload: UserCreate, db=Depends(get_db)):
     # Create user with hashed password
     user_data = {
         "email": email,
-        "password_hash": hash_password(payload.password),
+        "password_hash": await hash_password_async(payload.password),
         "created_at": datetime.now(timezone.utc),
         "is_active": True
     }
     
     try:
         # Insert user
-        result = await db["users"].insert_one(user_data)
-        user = await db["users"].find_one({"_id": result.inserted_id})
+        user = await storage.create_user(user_data)
         
         # Return user data
         return {
@@ -60,10 +58,10 @@ async def signup(payload: UserCreate, db=Depends(get_db)):
         )
 
 @router.post("/login", response_model=Token)
-async def login(payload: UserLogin, db=Depends(get_db)):
+async def login(payload: UserLogin, storage=Depends(get_storage)):
     """Login user and return JWT token"""
     # Check if database is available
-    if db is None:
+    if storage is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Database service unavailable"
@@ -73,7 +71,7 @@ async def login(payload: UserLogin, db=Depends(get_db)):
     email = payload.email.lower().strip()
     
     # Find user by email
-    user = await db["users"].find_one({"email": email})
+    user = await storage.get_user_by_email(email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,15 +85,23 @@ async def login(payload: UserLogin, db=Depends(get_db)):
             detail="Account is disabled"
         )
     
-    # Verify password
-    if not verify_password(payload.password, user["password_hash"]):
+    # Verify password (off the event loop)
+    valid, new_hash = await verify_and_update_password(payload.password, user["password_hash"])
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
+
+    # Upgrade the stored hash when BCRYPT_ROUNDS has changed
+    if new_hash:
+        await storage.update_user(str(user["_id"]), {"password_hash": new_hash})
     
+    # A reactivated account may still be flagged as deactivated in this process
+    invalidate_user(str(user["_id"]))
+
     # Generate JWT token
-    access_token = create_access_token(subject=str(user["_id"]))
+    access_token = create_access_token(subject=str(user["_id"]), claims=user_token_claims(user))
     
     return {
         "access_token": access_token,
@@ -1,24 +1,37 @@
 # Chat API endpoints for the medical workflow system
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from pydantic import BaseModel, ValidationError
 from typing import List, Dict, Any, Optional
 import logging
 import sys
 import os
+import tempfile
 from pathlib import Path
+from functools import partial
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import contextvars
 import json
 from datetime import datetime
+from bson import ObjectId
 
 # Add agents directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agents"))
 
 from medical_workflow import MedicalWorkflow
-from backend.schemas.chat import ChatDetail, ChatMessage
-from backend.utils.hash import hash_chat_details
-from backend.database.mongodb import upsert_chat_detail
+from Doc_Summerize import text_to_pages
+from backend.schemas.chat import ChatDetail, ChatMessage, ChatTurn, ChatSessionHistory
+from backend.utils.hash import hash_chat_details, turn_digest, chain_hash, verify_chain, GENESIS_HASH
+from backend.database.storage import get_storage
+from backend.database.write_queue import chat_write_queue
+from backend.database.mongodb import RECENT_INTENTS
+from backend.utils.session_history import session_histories, chain_heads, forget_session
 from backend.core.security import get_current_user
+from backend.core.config import settings
+from backend.utils.uploads import stream_upload_to_disk
+from backend.utils.pdf_extract import extract_pdf
+from backend.utils.tracing import span
+from backend.utils.usage import track_usage
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -35,6 +48,15 @@ class ChatRequest(BaseModel):
     message: str
     chat_history: Optional[List[ChatMessage]] = []
     session_id: Optional[str] = None
+    # Delta protocol: the server holds the history; the client sends the last turn it saw
+    delta: bool = False
+    last_turn_id: Optional[str] = None
+    # Return the request's LLM token usage and estimated cost in the response
+    include_usage: bool = False
+
+class ChatTurnDelta(BaseModel):
+    turn_id: str
+    messages: List[ChatMessage]
 
 class ChatResponse(BaseModel):
     response: str
@@ -42,17 +64,173 @@ class ChatResponse(BaseModel):
     rag_context: Optional[str] = None
     followup_questions: Optional[str] = None
     session_id: str
-    chat_history: List[ChatMessage]
+    # Full history for legacy requests; None for delta requests
+    chat_history: Optional[List[ChatMessage]] = None
+    # Id of the turn this request created (send it back as last_turn_id)
+    turn_id: Optional[str] = None
+    # Delta requests: only the turns after the client's last_turn_id
+    new_turns: Optional[List[ChatTurnDelta]] = None
+    # Token usage per agent and in total, when include_usage was requested
+    usage: Optional[Dict[str, Any]] = None
 
 class DocumentRequest(BaseModel):
     document_content: str
-    document_type: str = "text"  # "text" or "pdf_path"
+    document_type: str = "text"  # "text"; PDFs go to /document/upload
     chat_history: Optional[List[ChatMessage]] = []
     session_id: Optional[str] = None
+    delta: bool = False
+    last_turn_id: Optional[str] = None
+    include_usage: bool = False
+
+# Error detail telling delta clients to resend their full chat_history
+HISTORY_RESYNC_REQUIRED = "history_resync_required"
 
 # Global workflow instance (in production, use dependency injection)
 workflow_instance = None
 
+async def load_chain_head(session_id: str) -> str:
+    """The chain head the session's next turn links to (cached, else from queued turns or the header)"""
+    head = chain_heads.get(session_id)
+    if head is not None:
+        return head
+    # The header lags behind turns still waiting in the write queue; the newest of those is the head
+    pending = chat_write_queue.pending_turns(session_id)
+    header = {}
+    if not pending:
+        storage = await get_storage()
+        header = (await storage.get_session_header(session_id) if storage else None) or {}
+        # Another request of this session may have linked a turn while the header was read
+        head = chain_heads.get(session_id)
+        if head is not None:
+            return head
+        pending = chat_write_queue.pending_turns(session_id)
+    if pending:
+        return pending[-1]["chain_hash"]
+    return header.get("chain_head") or GENESIS_HASH
+
+async def read_session_turns(storage, session_id: str, limit: Optional[int] = None) -> tuple:
+    """Stored turns plus those still in the write queue (read your own writes without flushing).
+
+    Returns (turns, pending): pending is True when the queue held turns of the
+    session, in which case the stored header may lag behind the turns.
+    """
+    # Snapshot the queue first: a turn written meanwhile then shows up in storage instead
+    pending = chat_write_queue.pending_turns(session_id)
+    turns = await storage.get_session_turns(session_id, limit=None if pending else limit)
+    if pending:
+        stored_ids = {t["_id"] for t in turns}
+        turns = sorted(turns + [t for t in pending if t["_id"] not in stored_ids], key=lambda t: t["_id"])
+        if limit:
+            turns = turns[:limit]
+    return turns, bool(pending)
+
+def build_chat_turn(session_id: str, user_id: str, new_messages: List[dict], result: dict, rag_context: Optional[str],
+                    prev_hash: str) -> dict:
+    """Build the hashed, append-only record of one request/response turn, linked to prev_hash"""
+    now = datetime.utcnow()
+    turn = {
+        "_id": ObjectId(),
+        "session_id": session_id,
+        "user_id": user_id,
+        "messages": [
+            {
+                "role": msg["role"],
+                "content": hash_chat_details(msg["content"]),
+                "timestamp": msg.get("timestamp") or now
+            }
+            for msg in new_messages
+        ],
+        "classification": result["classification"],
+        "rag_context": rag_context,
+        "followup_questions": result.get("followup_questions"),
+        "created_at": now
+    }
+
+    # Hash only this turn and chain it to the previous head for integrity
+    turn["hashed_details"] = turn_digest(turn)
+    turn["prev_hash"] = prev_hash
+    turn["chain_hash"] = chain_hash(turn["prev_hash"], turn["hashed_details"])
+    return turn
+
+def resolve_session_history(session_id: str, request):
+    """Session history to continue from for a chat or document request.
+
+    A supplied chat_history replaces the server copy (legacy clients and resyncs).
+    Otherwise last_turn_id continues the held session; without either the session
+    starts over. Raises 409 when the held session cannot serve last_turn_id.
+    """
+    if request.chat_history:
+        return session_histories.reset(
+            session_id, [{"role": msg.role, "content": msg.content} for msg in request.chat_history]
+        )
+    if request.last_turn_id:
+        history = session_histories.get(session_id)
+        if history is None or history.turns_after(request.last_turn_id) is None:
+            raise HTTPException(status_code=409, detail=HISTORY_RESYNC_REQUIRED)
+        return history
+    return session_histories.reset(session_id)
+
+def build_chat_response(request, result: dict, session_id: str, history, turn_id: str, rag_context) -> ChatResponse:
+    """Full history for legacy requests, only the new turns for delta requests"""
+    response = ChatResponse(
+        response=result["final_response"],
+        classification=result["classification"],
+        rag_context=rag_context,
+        followup_questions=result.get("followup_questions"),
+        session_id=session_id,
+        turn_id=turn_id
+    )
+    if request.include_usage:
+        response.usage = result.get("usage")
+    if request.delta:
+        # A history resent by the client starts over, so every held turn is new to it
+        turns = history.turns_after(request.last_turn_id) if request.last_turn_id else None
+        if turns is None:
+            turns = history.turns_after(None)
+        response.new_turns = [
+            ChatTurnDelta(turn_id=tid, messages=[ChatMessage(role=m["role"], content=m["content"]) for m in messages])
+            for tid, messages in turns
+        ]
+    else:
+        response.chat_history = [
+            ChatMessage(role=msg["role"], content=msg["content"])
+            for msg in history.messages
+        ]
+    return response
+
+async def run_chat_turn(request, query: str, current_user: dict, workflow: MedicalWorkflow, rag_key: str, doc_pages: Optional[List[str]] = None):
+    """Run one query through the workflow on the session's history and record the turn"""
+    # Use user ID as session ID for grouping all chats per user
+    session_id = current_user["id"]
+    # Overflow policy of the write-behind queue: refuse new turns before doing any work
+    if not chat_write_queue.admit():
+        raise HTTPException(status_code=503, detail="Chat history storage is backed up; try again later")
+    history = resolve_session_history(session_id, request)
+    # A private copy per request: the workflow instance is shared by concurrent sessions
+    messages = [dict(msg) for msg in history.messages]
+
+    # Process the query in a thread pool to avoid blocking the async event loop
+    loop = asyncio.get_event_loop()
+    with span("workflow"), track_usage() as usage, ThreadPoolExecutor() as executor:
+        # The copied context nests the workflow's stage spans under this one
+        run = partial(workflow.process_query, query, doc_pages=doc_pages, chat_history=messages)
+        result = await loop.run_in_executor(executor, contextvars.copy_context().run, run)
+    result["usage"] = usage.summary()
+
+    # Only the messages added by this request are persisted (append-only log)
+    new_messages = result.pop("new_messages", [])
+    prev_hash = await load_chain_head(session_id)
+    # No await from here to enqueue(), so concurrent requests of the session link in order
+    with span("hashing"):
+        turn = build_chat_turn(session_id, current_user["id"], new_messages, result, result.get(rag_key), prev_hash)
+    chain_heads.set(session_id, turn["chain_hash"])
+    history.append_turn(str(turn["_id"]), new_messages)
+
+    # Queue hashed turn and the user's daily usage totals for the write-behind flusher
+    chat_write_queue.enqueue(turn)
+    chat_write_queue.enqueue_usage(current_user["id"], result["usage"])
+    return session_id, history, result, str(turn["_id"])
+
 def get_workflow():
     """Get or create workflow instance"""
     global workflow_instance
@@ -77,69 +255,13 @@ async def send_message(request: ChatRequest, current_user: dict = Depends(get_cu
     4. Response formatting
     """
     try:
-        # Set chat history if provided
-        if request.chat_history:
-            workflow.chat_history = [
-                {"role": msg.role, "content": msg.content} 
-                for msg in request.chat_history
-            ]
-        
-        # Process the query in a thread pool to avoid blocking the async event loop
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as executor:
-            result = await loop.run_in_executor(executor, workflow.process_query, request.message)
-        
-        # Use user ID as session ID for grouping all chats per user
-        session_id = current_user["id"]
-
-        # Convert chat history back to response format
-        chat_history = [
-            ChatMessage(role=msg["role"], content=msg["content"])
-            for msg in workflow.chat_history
-        ]
-
-        # Prepare unhashed chat history for response
-        unhashed_chat_history = [msg.dict() for msg in chat_history]
-
-        # Prepare hashed chat details for saving
-        hashed_chat_history = [
-            {
-                "role": msg["role"],
-                "content": hash_chat_details(msg["content"]),
-                "timestamp": msg.get("timestamp")
-            }
-            for msg in workflow.chat_history
-        ]
-        hashed_data = {
-            "session_id": session_id,
-            "user_id": current_user["id"],
-            "message": hash_chat_details(request.message),
-            "chat_history": hashed_chat_history,
-            "response": hash_chat_details(result["final_response"]),
-            "classification": result["classification"],
-            "rag_context": result.get("rag_context"),
-            "followup_questions": result.get("followup_questions"),
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-
-        # Hash the hashed data for integrity
-        hashed_data_json = json.dumps(hashed_data, sort_keys=True, default=str)
-        hashed_details = hash_chat_details(hashed_data_json)
-        hashed_data["hashed_details"] = hashed_details
-
-        # Save hashed data to MongoDB asynchronously
-        asyncio.create_task(upsert_chat_detail(hashed_data))
-
-        return ChatResponse(
-            response=result["final_response"],
-            classification=result["classification"],
-            rag_context=result.get("rag_context"),
-            followup_questions=result.get("followup_questions"),
-            session_id=session_id,
-            chat_history=chat_history
+        session_id, history, result, turn_id = await run_chat_turn(
+            request, request.message, current_user, workflow, "rag_context"
         )
+        return build_chat_response(request, result, session_id, history, turn_id, result.get("rag_context"))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing message: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
@@ -147,86 +269,149 @@ async def send_message(request: ChatRequest, current_user: dict = Depends(get_cu
 @router.post("/document", response_model=ChatResponse)
 async def process_document(request: DocumentRequest, current_user: dict = Depends(get_current_user), workflow: MedicalWorkflow = Depends(get_workflow)):
     """
-    Process a medical document (text or PDF)
+    Process a medical document given as text
     
     This endpoint handles document summarization through the workflow:
     1. Document processing
     2. Medical summarization
     3. Solution generation based on document content
     """
+    # Server-side paths are never read on behalf of clients
+    if request.document_type == "pdf_path":
+        raise HTTPException(status_code=400, detail="pdf_path documents are not supported; upload the PDF to /api/chat/document/upload")
+    
     try:
-        # Set chat history if provided
-        if request.chat_history:
-            workflow.chat_history = [
-                {"role": msg.role, "content": msg.content} 
-                for msg in request.chat_history
-            ]
+        # Format document query; the text is passed as pages so it is never mistaken for a file path
+        doc_query = f"doc:{request.document_content}"
         
-        # Format document query
-        if request.document_type == "pdf_path":
-            doc_query = f"doc:{request.document_content}"
-        else:
-            doc_query = f"doc:{request.document_content}"
-        
-        # Process the document in a thread pool to avoid blocking the async event loop
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as executor:
-            result = await loop.run_in_executor(executor, workflow.process_query, doc_query)
+        session_id, history, result, turn_id = await run_chat_turn(
+            request, doc_query, current_user, workflow, "document_summary",
+            doc_pages=text_to_pages(request.document_content)
+        )
+        return build_chat_response(
+            request, result, session_id, history, turn_id,
+            result.get("document_summary", "No document summary available")
+        )
         
-        # Use user ID as session ID for grouping all chats per user
-        session_id = current_user["id"]
-
-        # Convert chat history back to response format
-        chat_history = [
-            ChatMessage(role=msg["role"], content=msg["content"])
-            for msg in workflow.chat_history
-        ]
-
-        # Prepare unhashed chat history for response
-        unhashed_chat_history = [msg.dict() for msg in chat_history]
-
-        # Prepare hashed chat details for saving
-        hashed_chat_history = [
-            {
-                "role": msg["role"],
-                "content": hash_chat_details(msg["content"]),
-                "timestamp": msg.get("timestamp")
-            }
-            for msg in workflow.chat_history
-        ]
-        hashed_data = {
-            "session_id": session_id,
-            "user_id": current_user["id"],
-            "message": hash_chat_details(f"Document processing: {request.document_type} - Content: {request.document_content}"),
-            "chat_history": hashed_chat_history,
-            "response": hash_chat_details(result["final_response"]),
-            "classification": result["classification"],
-            "rag_context": result.get("document_summary"),
-            "followup_questions": result.get("followup_questions"),
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing document: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
-        # Hash the hashed data for integrity
-        hashed_data_json = json.dumps(hashed_data, sort_keys=True, default=str)
-        hashed_details = hash_chat_details(hashed_data_json)
-        hashed_data["hashed_details"] = hashed_details
+@router.post("/document/upload", response_model=ChatResponse)
+async def upload_document(
+    file: UploadFile = File(...),
+    chat_history: Optional[str] = Form(None),
+    delta: bool = Form(False),
+    last_turn_id: Optional[str] = Form(None),
+    include_usage: bool = Form(False),
+    current_user: dict = Depends(get_current_user),
+    workflow: MedicalWorkflow = Depends(get_workflow)
+):
+    """
+    Summarize an uploaded PDF (multipart/form-data)
+    
+    The upload is streamed to a temporary file and its text is extracted in the
+    PDF worker pool, then it goes through the same workflow as /document.
+    chat_history is an optional JSON list of {role, content} messages.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    try:
+        request = DocumentRequest(
+            document_content=Path(file.filename).name,
+            document_type="pdf_upload",
+            chat_history=json.loads(chat_history) if chat_history else [],
+            delta=delta,
+            last_turn_id=last_turn_id,
+            include_usage=include_usage
+        )
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid chat_history: {str(e)}")
 
-        # Save hashed data to MongoDB asynchronously
-        asyncio.create_task(upsert_chat_detail(hashed_data))
+    fd, tmp_name = tempfile.mkstemp(suffix=".pdf", prefix="chat-upload-")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        await stream_upload_to_disk(file, tmp_path, settings.MAX_PDF_UPLOAD_MB * 1024 * 1024)
+        try:
+            with span("document.extract"):
+                extraction = await extract_pdf(tmp_path)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=422, detail="PDF text extraction took too long")
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not read PDF: {str(e)}")
+        if not any(page.strip() for page in extraction["pages"]):
+            raise HTTPException(status_code=422, detail="No extractable text found in the PDF")
         
-        return ChatResponse(
-            response=result["final_response"],
-            classification=result["classification"],
-            rag_context=result.get("document_summary", "No document summary available"),
-            followup_questions=result.get("followup_questions"),
-            session_id=session_id,
-            chat_history=chat_history
+        session_id, history, result, turn_id = await run_chat_turn(
+            request, f"doc:{request.document_content}", current_user, workflow, "document_summary",
+            doc_pages=[page for page in extraction["pages"] if page.strip()]
+        )
+        return build_chat_response(
+            request, result, session_id, history, turn_id,
+            result.get("document_summary", "No document summary available")
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing document: {e}")
+        logger.error(f"Error processing uploaded document: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+@router.get("/history", response_model=ChatSessionHistory)
+async def get_history(current_user: dict = Depends(get_current_user), storage=Depends(get_storage)):
+    """Get the stored (hashed) turns of the current user's session"""
+    session_id = current_user["id"]
+    if storage is None:
+        raise HTTPException(status_code=503, detail="Chat history storage is unavailable")
+    # Read your own writes: turns still queued are merged in
+    turns, pending = await read_session_turns(storage, session_id)
+    header = await storage.get_session_header(session_id) or {}
+    if pending:
+        # The header lags behind the queued turns; derive its fields from the turns
+        intents = [(t.get("classification") or {}).get("intent") for t in turns]
+        header = {"recent_intents": [intent for intent in intents if intent][-RECENT_INTENTS:]}
+    return ChatSessionHistory(
+        session_id=session_id,
+        turn_count=header.get("turn_count", len(turns)),
+        message_count=header.get("message_count", sum(len(t.get("messages", [])) for t in turns)),
+        recent_intents=header.get("recent_intents", []),
+        turns=[
+            ChatTurn(
+                turn_id=str(t["_id"]),
+                messages=t.get("messages", []),
+                classification=t.get("classification") or {},
+                rag_context=t.get("rag_context"),
+                followup_questions=t.get("followup_questions"),
+                hashed_details=t.get("hashed_details"),
+                prev_hash=t.get("prev_hash"),
+                chain_hash=t.get("chain_hash"),
+                created_at=t.get("created_at")
+            )
+            for t in turns
+        ]
+    )
+
+@router.get("/history/verify")
+async def verify_history(limit: Optional[int] = None, current_user: dict = Depends(get_current_user), storage=Depends(get_storage)):
+    """Verify the integrity chain of the current user's session (the first `limit` turns, or all)"""
+    session_id = current_user["id"]
+    if storage is None:
+        raise HTTPException(status_code=503, detail="Chat history storage is unavailable")
+    turns, pending = await read_session_turns(storage, session_id, limit=limit)
+    result = verify_chain(turns)
+    # With turns still queued the header lags behind, so only the chain itself is checked
+    if result["valid"] and limit is None and not pending:
+        # The whole session must also end at the head recorded on the header
+        header = await storage.get_session_header(session_id) or {}
+        recorded_head = header.get("chain_head")
+        if recorded_head is not None and recorded_head != result["head"]:
+            result.update(valid=False, reason="chain head does not match the session header")
+    return {"session_id": session_id, **result}
 
 @router.get("/health")
 async def health_check():
@@ -248,8 +433,8 @@ async def health_check():
 async def clear_session(session_id: str, workflow: MedicalWorkflow = Depends(get_workflow)):
     """Clear chat history for a session"""
     try:
-        # In a real application, you'd manage sessions per user
-        # For now, just clear the current workflow history
+        # Drop the server-held history; delta clients will start a new conversation
+        forget_session(session_id)
         workflow.chat_history = []
         
         return {
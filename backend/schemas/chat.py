@@ -27,3 +27,21 @@ class ChatDetail(BaseModel):
     hashed_details: str  # Hashed version of the chat details
     created_at: datetime = datetime.utcnow()
     updated_at: Optional[datetime] = None
+
+class ChatTurn(BaseModel):
+    turn_id: str
+    messages: List[ChatMessage]  # content is stored hashed
+    classification: dict
+    rag_context: Optional[str] = None
+    followup_questions: Optional[str] = None
+    hashed_details: Optional[str] = None
+    prev_hash: Optional[str] = None  # integrity chain head before this turn
+    chain_hash: Optional[str] = None  # SHA256(prev_hash + hashed_details)
+    created_at: Optional[datetime] = None
+
+class ChatSessionHistory(BaseModel):
+    session_id: str
+    turn_count: int
+    message_count: int
+    recent_intents: List[str] = []
+    turns: List[ChatTurn]
@@ -0,0 +1,96 @@
+# Shared test setup
+#
+# Settings require these variables; no test talks to MongoDB or OpenAI.
+# Agent modules are imported flat, the way medical_workflow and the routes do.
+
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "backend" / "agents"))
+
+for name, value in {
+    "MONGO_URI": "mongodb://localhost:27017",
+    "MONGO_DB_NAME": "mediconnect_test",
+    "JWT_SECRET": "test-secret-with-at-least-32-bytes!",
+    "OPENAI_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+import hashlib
+import types
+
+import pytest
+
+class FakeEmbeddings:
+    """Deterministic offline embeddings; records every text it is asked to embed"""
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255 for b in digest[:8]]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+@pytest.fixture
+def fake_embeddings():
+    return FakeEmbeddings()
+
+@pytest.fixture
+def ingest_env(tmp_path, monkeypatch, fake_embeddings):
+    """The ingest module with offline embeddings and one chunk per line of each (text) file.
+
+    Returns (ingest, data_dir, persist_dir, embeddings).
+    """
+    pytest.importorskip("langchain.vectorstores")
+    import ingest
+
+    embeddings = fake_embeddings
+    monkeypatch.setattr(ingest, "OpenAIEmbeddings", lambda: embeddings)
+
+    def load_chunks(pdf_path, source_name):
+        with open(pdf_path) as f:
+            lines = [line.strip() for line in f if line.strip()]
+        return [types.SimpleNamespace(page_content=line, metadata={"source": source_name}) for line in lines]
+
+    monkeypatch.setattr(ingest, "_load_chunks", load_chunks)
+    data_dir, persist_dir = tmp_path / "data", tmp_path / "index"
+    data_dir.mkdir()
+    return ingest, data_dir, str(persist_dir), embeddings
+
+@pytest.fixture
+def memory_storage():
+    """A MemoryStorage installed as the application's storage for one test"""
+    from backend.database import storage
+
+    backend = storage.MemoryStorage()
+    storage.set_storage(backend)
+    yield backend
+    storage.set_storage(None)
+
+@pytest.fixture
+def chat_routes(memory_storage, monkeypatch):
+    """The chat routes module with a private write queue and empty per-process session state"""
+    pytest.importorskip("crewai")
+    pytest.importorskip("langchain_community")
+    pytest.importorskip("langchain.vectorstores")
+    from backend.routes import chat
+    from backend.database.write_queue import ChatWriteQueue
+    from backend.utils.session_history import session_histories, chain_heads
+
+    monkeypatch.setattr(chat, "chat_write_queue", ChatWriteQueue(batch_size=1000, flush_interval=60, max_retries=0))
+    session_histories._sessions.clear()
+    chain_heads.clear()
+    yield chat
+    session_histories._sessions.clear()
+    chain_heads.clear()
@@ -0,0 +1,75 @@
+# Cold-session archival: compressed round trip of a session's turns
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from backend.database import archive
+from backend.database.archive import compress_turns, decompress_turns
+from backend.utils.hash import GENESIS_HASH, chain_hash, turn_digest, verify_chain
+
+def session_turns(session_id="s", count=5):
+    turns, head = [], GENESIS_HASH
+    for n in range(count):
+        turn = {
+            "_id": ObjectId(),
+            "session_id": session_id,
+            "user_id": "u",
+            "messages": [{"role": "user", "content": "ab" * 32, "timestamp": datetime(2026, 1, 1, 9, 0, n, 654321)}],
+            "classification": {"intent": "general_inquiry", "urgency": "low"},
+            "rag_context": "MediConnect opening hours " * 20,
+            "created_at": datetime(2026, 1, 1, 9, 0, n, 654321),
+        }
+        turn["hashed_details"] = turn_digest(turn)
+        turn["prev_hash"] = head
+        turn["chain_hash"] = head = chain_hash(head, turn["hashed_details"])
+        turns.append(turn)
+    return turns
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_archived_turns_round_trip_and_still_verify(codec, monkeypatch):
+    if codec == "zlib":
+        monkeypatch.setattr(archive, "zstandard", None)
+    elif archive.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    turns = session_turns()
+
+    used, data, raw_bytes = compress_turns(turns)
+    restored = decompress_turns({"codec": used, "data": data})
+
+    assert used == codec
+    assert len(data) < raw_bytes
+    assert [t["_id"] for t in restored] == [t["_id"] for t in turns]
+    assert verify_chain(restored) == verify_chain(turns)
+    assert verify_chain(restored)["valid"]
+
+def test_cold_session_filter_skips_recent_restores():
+    cutoff = datetime(2026, 1, 1)
+    query = archive.cold_sessions_filter(cutoff)
+    assert query["archived"] is None
+    assert query["updated_at"] == {"$lt": cutoff}
+    assert {"restored_at": {"$lt": cutoff}} in query["$or"]
+
+def test_archive_and_restore_session_round_trip():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["mediconnect_test"]
+    turns = session_turns()
+    header = {"session_id": "s", "user_id": "u", "updated_at": datetime(2025, 1, 1) - timedelta(days=1)}
+
+    async def main():
+        await db["chat_details"].insert_one(dict(header))
+        await db["chat_turns"].insert_many([dict(t) for t in turns])
+        stats = await archive.archive_session(db, header)
+        hot_after_archive = await db["chat_turns"].count_documents({"session_id": "s"})
+        archived_header = await db["chat_details"].find_one({"session_id": "s"})
+        restored = await archive.restore_session(db, "s")
+        hot = await db["chat_turns"].find({"session_id": "s"}).sort("_id", 1).to_list(length=None)
+        return stats, hot_after_archive, archived_header, restored, hot
+
+    stats, hot_after_archive, archived_header, restored, hot = asyncio.run(main())
+    assert (stats["turns"], hot_after_archive, archived_header["archived"]) == (5, 0, True)
+    assert restored == 5
+    assert verify_chain(hot)["valid"]
+    assert verify_chain(hot)["head"] == turns[-1]["chain_hash"]
@@ -0,0 +1,66 @@
+# Password hashing off the event loop, and rehashing of outdated hashes on login
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from backend.routes import auth
+from backend.schemas.user import UserCreate, UserLogin
+from backend.utils import hash as hashing
+
+@pytest.fixture
+def fast_bcrypt(monkeypatch):
+    """The password context at a low cost, as if BCRYPT_ROUNDS were 5"""
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5)
+    monkeypatch.setattr(hashing, "pwd_context", context)
+    return context
+
+def rounds(password_hash):
+    return int(password_hash.split("$")[2])
+
+def test_signup_and_login_round_trip(fast_bcrypt, memory_storage):
+    async def main():
+        signup = UserCreate(email="Patient@Example.com", password="s3cret-pass")
+        created = await auth.signup(signup, storage=memory_storage)
+        token = await auth.login(UserLogin(email="patient@example.com", password="s3cret-pass"), storage=memory_storage)
+        return created, token
+
+    created, token = asyncio.run(main())
+    assert created["email"] == "patient@example.com"
+    assert token["token_type"] == "bearer"
+    stored = asyncio.run(memory_storage.get_user_by_email("patient@example.com"))
+    assert rounds(stored["password_hash"]) == 5
+
+def test_login_rehashes_a_hash_with_an_outdated_cost(fast_bcrypt, memory_storage):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("s3cret-pass")
+    asyncio.run(memory_storage.create_user({"email": "old@example.com", "password_hash": old_hash}))
+
+    asyncio.run(auth.login(UserLogin(email="old@example.com", password="s3cret-pass"), storage=memory_storage))
+
+    new_hash = asyncio.run(memory_storage.get_user_by_email("old@example.com"))["password_hash"]
+    assert rounds(new_hash) == 5
+    assert fast_bcrypt.verify("s3cret-pass", new_hash)
+
+def test_wrong_password_is_refused_and_hash_kept(fast_bcrypt, memory_storage):
+    stored_hash = fast_bcrypt.hash("s3cret-pass")
+    asyncio.run(memory_storage.create_user({"email": "p@example.com", "password_hash": stored_hash}))
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(auth.login(UserLogin(email="p@example.com", password="wrong-pass"), storage=memory_storage))
+    assert excinfo.value.status_code == 401
+    assert asyncio.run(memory_storage.get_user_by_email("p@example.com"))["password_hash"] == stored_hash
+
+def test_hashing_runs_on_the_password_pool(fast_bcrypt, monkeypatch):
+    threads = []
+    original = hashing.hash_password
+
+    def recording_hash(password):
+        threads.append(threading.current_thread().name)
+        return original(password)
+
+    monkeypatch.setattr(hashing, "hash_password", recording_hash)
+    assert fast_bcrypt.verify("s3cret-pass", asyncio.run(hashing.hash_password_async("s3cret-pass")))
+    assert threads[0].startswith("password-hash")
@@ -0,0 +1,64 @@
+# Bounded TTL cache and the expiring set
+
+import pytest
+
+from backend.utils import cache
+from backend.utils.cache import ExpiringSet, TTLCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("a", 1)
+    clock[0] += 4.9
+    assert entries.get("a") == 1
+    clock[0] += 0.2
+    assert entries.get("a") is None
+    assert entries.stats()["expirations"] == 1
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(maxsize=2, ttl=60)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+    assert ("a" in entries, "b" in entries, "c" in entries) == (True, False, True)
+    assert entries.stats()["evictions"] == 1
+
+def test_zero_ttl_or_size_disables_caching():
+    for entries in (TTLCache(maxsize=10, ttl=0), TTLCache(maxsize=0, ttl=60)):
+        entries.set("a", 1)
+        assert entries.get("a") is None
+
+def test_invalidate_and_stats():
+    entries = TTLCache(maxsize=10, ttl=60)
+    entries.set("a", 1)
+    entries.get("a")
+    entries.invalidate("a")
+    entries.get("a")
+    stats = entries.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["invalidations"]) == (0, 1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+def test_expiring_set_keeps_members_until_they_expire(clock):
+    members = ExpiringSet(ttl=60)
+    for n in range(10_000):
+        members.add(n)
+    assert 0 in members and len(members) == 10_000
+
+    clock[0] += 61
+    assert 0 not in members
+    # Expired members are pruned on the next add
+    members.add("fresh")
+    assert len(members) == 1
+
+def test_expiring_set_discard():
+    members = ExpiringSet(ttl=60)
+    members.add("a")
+    members.discard("a")
+    members.discard("missing")
+    assert "a" not in members
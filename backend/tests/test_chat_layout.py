@@ -0,0 +1,52 @@
+# Append-only chat layout: constant-size header updates that coalesce like sequential writes
+
+from datetime import datetime, timedelta
+from functools import reduce
+
+from bson import ObjectId
+
+from backend.database.mongodb import (
+    RECENT_INTENTS, session_header_update, merge_session_header_updates,
+)
+from backend.database.storage import apply_update
+
+def make_turn(n, intent="general_inquiry"):
+    return {
+        "_id": ObjectId(),
+        "session_id": "s",
+        "user_id": "u",
+        "messages": [{"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}],
+        "classification": {"intent": intent},
+        "chain_hash": f"head-{n}",
+        "created_at": datetime(2026, 1, 1) + timedelta(minutes=n),
+    }
+
+def apply_each(updates):
+    doc = {}
+    for i, update in enumerate(updates):
+        doc = apply_update(doc, update, inserted=i == 0)
+    return doc
+
+def test_header_update_does_not_grow_with_the_session():
+    short = session_header_update(make_turn(1))
+    assert set(short) == {"$setOnInsert", "$set", "$inc", "$push"}
+    assert short["$inc"] == {"turn_count": 1, "message_count": 2}
+    assert short["$push"]["recent_intents"] == {"$each": ["general_inquiry"], "$slice": -RECENT_INTENTS}
+
+def test_merged_header_updates_match_sequential_application():
+    turns = [make_turn(n, intent=f"intent-{n}") for n in range(RECENT_INTENTS + 5)]
+    updates = [session_header_update(t) for t in turns]
+
+    merged = apply_update({}, reduce(merge_session_header_updates, updates), inserted=True)
+
+    assert merged == apply_each(updates)
+    assert merged["created_at"] == turns[0]["created_at"]
+    assert merged["last_turn_id"] == turns[-1]["_id"]
+    assert merged["chain_head"] == turns[-1]["chain_hash"]
+    assert merged["turn_count"] == len(turns)
+    assert merged["recent_intents"] == [f"intent-{n}" for n in range(5, RECENT_INTENTS + 5)]
+
+def test_turn_without_intent_pushes_nothing():
+    turn = make_turn(1)
+    turn["classification"] = None
+    assert "$push" not in session_header_update(turn)
@@ -0,0 +1,135 @@
+# Chat routes: turn persistence, the integrity chain and the delta protocol, with a stand-in workflow
+
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from backend.utils.hash import GENESIS_HASH
+from backend.utils.session_history import chain_heads
+
+class EchoWorkflow:
+    """Stands in for MedicalWorkflow: answers every query without calling an LLM"""
+
+    def process_query(self, user_input, doc_pages=None, chat_history=None):
+        new_messages = [
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": f"echo: {user_input}"},
+        ]
+        chat_history.extend(new_messages)
+        return {
+            "classification": {"intent": "general_inquiry"},
+            "final_response": f"echo: {user_input}",
+            "new_messages": new_messages,
+        }
+
+def user():
+    return {"id": str(ObjectId())}
+
+async def send(chat, current_user, message, **fields):
+    request = chat.ChatRequest(message=message, **fields)
+    return await chat.send_message(request, current_user=current_user, workflow=EchoWorkflow())
+
+def test_concurrent_turns_form_one_valid_chain(chat_routes, memory_storage):
+    chat, current_user = chat_routes, user()
+
+    async def main():
+        await asyncio.gather(*(send(chat, current_user, f"question {n}") for n in range(5)))
+        # Queued turns already verify before they are written
+        queued = await chat.verify_history(current_user=current_user, storage=memory_storage)
+        await chat.chat_write_queue.stop()
+        stored = await chat.verify_history(current_user=current_user, storage=memory_storage)
+        return queued, stored
+
+    queued, stored = asyncio.run(main())
+    assert (queued["valid"], queued["verified_turns"]) == (True, 5)
+    assert (stored["valid"], stored["verified_turns"]) == (True, 5)
+    header = asyncio.run(memory_storage.get_session_header(current_user["id"]))
+    assert header["chain_head"] == stored["head"]
+
+def test_chain_continues_from_the_header_after_a_cache_miss(chat_routes, memory_storage):
+    chat, current_user = chat_routes, user()
+
+    async def main():
+        await send(chat, current_user, "first")
+        await chat.chat_write_queue.flush()
+        chain_heads.clear()
+        await send(chat, current_user, "second")
+        await chat.chat_write_queue.stop()
+        return await chat.verify_history(current_user=current_user, storage=memory_storage)
+
+    result = asyncio.run(main())
+    assert (result["valid"], result["verified_turns"]) == (True, 2)
+
+def test_new_session_links_to_genesis(chat_routes, memory_storage):
+    chat, current_user = chat_routes, user()
+
+    async def main():
+        await send(chat, current_user, "hello")
+        turns = chat.chat_write_queue.pending_turns(current_user["id"])
+        await chat.chat_write_queue.stop()
+        return turns
+
+    assert asyncio.run(main())[0]["prev_hash"] == GENESIS_HASH
+
+def test_delta_requests_carry_only_new_turns(chat_routes):
+    chat, current_user = chat_routes, user()
+    seen = []
+
+    class RecordingWorkflow(EchoWorkflow):
+        def process_query(self, user_input, doc_pages=None, chat_history=None):
+            seen.append([m["content"] for m in chat_history])
+            return super().process_query(user_input, doc_pages=doc_pages, chat_history=chat_history)
+
+    async def main():
+        first = await chat.send_message(
+            chat.ChatRequest(message="one", delta=True), current_user=current_user, workflow=RecordingWorkflow()
+        )
+        second = await chat.send_message(
+            chat.ChatRequest(message="two", delta=True, last_turn_id=first.turn_id),
+            current_user=current_user, workflow=RecordingWorkflow(),
+        )
+        await chat.chat_write_queue.stop()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first.chat_history is None
+    assert [t.turn_id for t in first.new_turns] == [first.turn_id]
+    assert [t.turn_id for t in second.new_turns] == [second.turn_id]
+    assert [m.content for m in second.new_turns[0].messages] == ["two", "echo: two"]
+    # The workflow still saw the whole conversation, held by the server
+    assert seen[1] == ["one", "echo: one"]
+
+def test_unknown_last_turn_requires_a_resync(chat_routes):
+    chat, current_user = chat_routes, user()
+
+    async def main():
+        first = await send(chat, current_user, "one", delta=True)
+        chat.forget_session(current_user["id"])
+        with pytest.raises(HTTPException) as excinfo:
+            await send(chat, current_user, "two", delta=True, last_turn_id=first.turn_id)
+        # The client resends its full history and continues
+        resynced = await send(
+            chat, current_user, "two", delta=True, last_turn_id=first.turn_id,
+            chat_history=[{"role": "user", "content": "one"}, {"role": "assistant", "content": "echo: one"}],
+        )
+        await chat.chat_write_queue.stop()
+        return excinfo.value, resynced
+
+    error, resynced = asyncio.run(main())
+    assert (error.status_code, error.detail) == (409, chat.HISTORY_RESYNC_REQUIRED)
+    assert [t.turn_id for t in resynced.new_turns] == [resynced.turn_id]
+
+def test_legacy_requests_get_the_full_history(chat_routes):
+    chat, current_user = chat_routes, user()
+
+    async def main():
+        history = [{"role": "user", "content": "one"}, {"role": "assistant", "content": "a"}]
+        response = await send(chat, current_user, "two", chat_history=history)
+        await chat.chat_write_queue.stop()
+        return response
+
+    response = asyncio.run(main())
+    assert response.new_turns is None
+    assert [m.content for m in response.chat_history] == ["one", "a", "two", "echo: two"]
@@ -0,0 +1,46 @@
+# Content-addressed embedding reuse
+
+import pytest
+
+from embedding_store import CachedEmbeddings, EmbeddingStore, text_hash
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path / "embedding_store.sqlite3"))
+
+def test_each_distinct_text_is_embedded_once(store, fake_embeddings):
+    cached = CachedEmbeddings(fake_embeddings, store)
+
+    vectors, stats = cached.embed_with_stats(["header", "body", "header"])
+    assert fake_embeddings.embedded == ["header", "body"]
+    assert vectors[0] == vectors[2]
+    assert (stats["unique_texts"], stats["cache_hits"], stats["embedded"]) == (2, 0, 2)
+
+    vectors_again, stats = cached.embed_with_stats(["body", "footer"])
+    assert fake_embeddings.embedded == ["header", "body", "footer"]
+    assert vectors_again[0] == pytest.approx(vectors[1])
+    assert (stats["cache_hits"], stats["embedded"], stats["dedup_ratio"]) == (1, 1, 0.5)
+
+def test_vectors_survive_reopening_the_store(tmp_path, fake_embeddings):
+    path = str(tmp_path / "embedding_store.sqlite3")
+    CachedEmbeddings(fake_embeddings, EmbeddingStore(path)).embed_documents(["header"])
+
+    reopened = EmbeddingStore(path)
+    found = reopened.get_many(fake_embeddings.model, [text_hash("header")])
+    assert found[text_hash("header")] == pytest.approx(fake_embeddings.embed_query("header"), abs=1e-6)
+
+def test_models_do_not_share_vectors(store, fake_embeddings):
+    CachedEmbeddings(fake_embeddings, store).embed_documents(["header"])
+    fake_embeddings.model = "other-model"
+    _, stats = CachedEmbeddings(fake_embeddings, store).embed_with_stats(["header"])
+    assert stats["embedded"] == 1
+    assert store.count() == 2
+
+def test_text_shared_between_documents_is_embedded_once(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("MediConnect letterhead\nalpha\n")
+    (data_dir / "b.pdf").write_text("MediConnect letterhead\nbeta\n")
+
+    report = ingest.ingest_directory(data_dir, persist_dir=persist_dir, max_workers=1)
+    assert sorted(embeddings.embedded) == ["MediConnect letterhead", "alpha", "beta"]
+    assert report["totals"]["embedding"]["reused"] == 1
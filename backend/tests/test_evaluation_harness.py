@@ -0,0 +1,83 @@
+# Evaluation harness: agents are built once and reused, cold start is reported apart
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+# Imported as a module: its test_individual_agents is a harness step, not a pytest test
+from backend.evaluations import test_agents as harness
+
+class FakeAgent:
+    """Counts calls; one instance serves every case"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result(*args, **kwargs) if callable(self.result) else self.result
+
+def classification(query):
+    rag = "hours" in query
+    return {"intent": "center_information" if rag else "conversation",
+            "required_resources": {"rag_needed": rag, "summarization_needed": False}}
+
+@pytest.fixture
+def agents():
+    return {
+        "query_classifier": SimpleNamespace(classify_query=FakeAgent(classification)),
+        "solution_agent": SimpleNamespace(generate_unified_response=FakeAgent("A helpful answer for the patient.")),
+        "followup_agent": SimpleNamespace(generate_followup=FakeAgent("Anything else?")),
+        "rag_agent": FakeAgent({"answer": "We are open from 8am to 8pm.", "sources": []}),
+        "document_summarizer": None,
+    }
+
+def test_case_runs_every_needed_stage(agents):
+    results = harness.test_individual_agents("What are your opening hours?", agents, verbose=False)
+
+    assert results["workflow_success"] and results["rag_needed"]
+    assert (results["qc_success"], results["sol_success"], results["followup_success"], results["rag_success"]) \
+        == (1, 1, 1, 1)
+    assert results["final_response"] == "A helpful answer for the patient. Anything else?"
+
+def test_parallel_cases_reuse_the_same_agents_in_order(agents):
+    cases = [f"Hello {n}" for n in range(6)] + ["What are your opening hours?"]
+
+    results = harness.run_cases(cases, agents, workers=4)
+
+    assert [r["test_query"] for r in results] == cases
+    assert agents["query_classifier"].classify_query.calls == 7
+    assert agents["rag_agent"].calls == 1
+
+def test_warm_up_times_each_component_once(agents, capsys):
+    agents["rag_agent"] = FakeAgent(RuntimeError("index missing"))
+
+    first_call = harness.warm_up(agents)
+
+    assert set(first_call) == {"query_classifier", "solution_agent", "followup_agent", "rag_agent"}
+    assert agents["solution_agent"].generate_unified_response.calls == 1
+    assert "Warm-up of rag_agent failed: index missing" in capsys.readouterr().out
+
+def test_failed_component_fails_its_cases(agents):
+    agents["solution_agent"] = None
+
+    results = harness.test_individual_agents("Hello", agents, verbose=False)
+
+    assert not results["workflow_success"] and results["final_response"] == "No response generated"
+
+def test_steady_state_only_counts_stages_that_ran():
+    def case(total, rag=0.0):
+        return {"qc_time": 0.1, "sol_time": total - 0.1 - rag, "followup_time": 0.0, "rag_time": rag,
+                "doc_sum_time": 0.0, "total_time": total, "rag_needed": rag > 0, "doc_sum_needed": False}
+
+    summary = harness.summarize_stages([case(1.0), case(2.0, rag=0.5), case(3.0)])
+
+    assert set(summary) == {"query_classifier", "solution_agent", "rag_agent", "total"}
+    assert summary["rag_agent"]["runs"] == 1
+    assert summary["total"] == {"runs": 3, "mean_s": 2.0, "p50_s": 2.0, "p95_s": 3.0, "max_s": 3.0}
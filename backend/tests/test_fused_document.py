@@ -0,0 +1,67 @@
+# Fused document generation: parsing its output and caching its summary
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from fused_document import SUMMARY_SECTIONS, FusedParseError, parse_fused_response
+
+SUMMARY = "\n".join(f"{section}:\nNone reported." for section in SUMMARY_SECTIONS)
+
+def fused_text(summary=SUMMARY, guidance="Your results look stable.", followup="When did the cough start?"):
+    return f"### SUMMARY\n{summary}\n\n### GUIDANCE\n{guidance}\n\n### FOLLOW_UP\n{followup}\n"
+
+def test_parses_the_three_parts():
+    parts = parse_fused_response(fused_text())
+    assert parts == {
+        "summary": SUMMARY, "guidance": "Your results look stable.", "followup": "When did the cough start?",
+    }
+
+def test_marker_variants_are_accepted():
+    text = fused_text().replace("### FOLLOW_UP", "## Follow-up:").replace("### GUIDANCE", "#### guidance")
+    assert parse_fused_response(text)["followup"] == "When did the cough start?"
+
+def test_missing_part_is_an_error():
+    with pytest.raises(FusedParseError, match="GUIDANCE"):
+        parse_fused_response(f"### SUMMARY\n{SUMMARY}\n\n### FOLLOW_UP\nA question?")
+
+def test_missing_summary_section_is_an_error():
+    summary = SUMMARY.replace("Disclaimer:", "Notes:")
+    with pytest.raises(FusedParseError, match="Disclaimer"):
+        parse_fused_response(fused_text(summary=summary))
+
+class FakeFusedAgent:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, report, chat_history=None, conversation_stage="initial"):
+        self.calls.append((report, list(chat_history or [])))
+        return parse_fused_response(fused_text())
+
+@pytest.fixture
+def workflow(tmp_path, monkeypatch):
+    pytest.importorskip("crewai")
+    pytest.importorskip("langchain_community")
+    import medical_workflow
+    from summary_cache import SummaryCache
+
+    cache = SummaryCache(str(tmp_path / "summary_cache.sqlite3"))
+    monkeypatch.setattr(medical_workflow, "get_summary_cache", lambda: cache)
+    monkeypatch.setattr(medical_workflow, "prepare_report_input", lambda text=None, pages=None: text)
+    flow = medical_workflow.MedicalWorkflow.__new__(medical_workflow.MedicalWorkflow)
+    flow.fused_document_agent = FakeFusedAgent()
+    flow.document_mode = "fused"
+    flow.chat_history = []
+    return flow, cache, medical_workflow
+
+def test_fused_summary_is_cached_only_without_chat_history(workflow):
+    flow, cache, medical_workflow = workflow
+    key = medical_workflow.summary_key("Report text", medical_workflow.FUSED_PROMPT_VERSION,
+                                       medical_workflow.SUMMARY_INPUT_SETTINGS)
+
+    history = [{"role": "user", "content": "I have a cough"}, {"role": "assistant", "content": "Since when?"}]
+    flow._handle_document_query("doc:Report text", chat_history=history)
+    assert cache.get(key) is None
+
+    flow._handle_document_query("doc:Report text", chat_history=[])
+    assert cache.get(key) == SUMMARY
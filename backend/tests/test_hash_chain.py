@@ -0,0 +1,64 @@
+# Incremental integrity chain over chat turns
+
+from datetime import datetime
+
+from bson import ObjectId
+
+from backend.utils.hash import GENESIS_HASH, chain_hash, turn_digest, verify_chain
+
+def build_chain(count, anchor=GENESIS_HASH):
+    turns, head = [], anchor
+    for n in range(count):
+        turn = {
+            "_id": ObjectId(),
+            "session_id": "s",
+            "user_id": "u",
+            "messages": [{"role": "user", "content": f"hashed-{n}"}],
+            "classification": {"intent": "general_inquiry"},
+            "created_at": datetime(2026, 1, 1, 12, 0, n, 123456),
+        }
+        turn["hashed_details"] = turn_digest(turn)
+        turn["prev_hash"] = head
+        turn["chain_hash"] = head = chain_hash(head, turn["hashed_details"])
+        turns.append(turn)
+    return turns
+
+def test_intact_chain_verifies_to_its_head():
+    turns = build_chain(4)
+    result = verify_chain(turns)
+    assert result == {"valid": True, "verified_turns": 4, "head": turns[-1]["chain_hash"], "broken_at": None,
+                      "reason": None}
+
+def test_suffix_verifies_from_its_anchor():
+    turns = build_chain(4)
+    assert verify_chain(turns[2:], anchor=turns[1]["chain_hash"])["valid"]
+    assert not verify_chain(turns[2:])["valid"]
+
+def test_edited_turn_is_detected():
+    turns = build_chain(3)
+    turns[1]["messages"][0]["content"] = "edited"
+    result = verify_chain(turns)
+    assert (result["valid"], result["verified_turns"], result["broken_at"]) == (False, 1, str(turns[1]["_id"]))
+    assert result["reason"] == "turn content does not match its digest"
+
+def test_removed_or_reordered_turns_are_detected():
+    turns = build_chain(3)
+    assert verify_chain([turns[0], turns[2]])["reason"] == "turn does not follow the previous chain head"
+    assert verify_chain([turns[1], turns[0], turns[2]])["broken_at"] == str(turns[1]["_id"])
+
+def test_forged_link_is_detected():
+    turns = build_chain(2)
+    turns[1]["chain_hash"] = "f" * 64
+    assert verify_chain(turns)["reason"] == "chain hash mismatch"
+
+def test_digest_is_stable_across_a_mongodb_round_trip():
+    turn = build_chain(1)[0]
+    # MongoDB keeps milliseconds only
+    stored = {**turn, "created_at": turn["created_at"].replace(microsecond=123000)}
+    assert turn_digest(stored) == turn["hashed_details"]
+
+def test_migrated_legacy_turn_starts_the_chain():
+    legacy = {"_id": ObjectId(), "session_id": "s", "migrated_from_legacy": True}
+    turns = build_chain(2)
+    assert verify_chain([legacy] + turns)["valid"]
+    assert verify_chain(turns + [legacy])["reason"] == "missing chain link"
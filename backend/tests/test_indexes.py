@@ -0,0 +1,61 @@
+# Startup index management against a recording collection double
+
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+from backend.core.config import settings
+from backend.database.indexes import ensure_indexes, index_registry
+
+class RecordingCollection:
+    def __init__(self, existing, fail=()):
+        self.existing = existing
+        self.fail = set(fail)
+        self.created, self.dropped = [], []
+
+    async def index_information(self):
+        return dict(self.existing)
+
+    async def create_indexes(self, models):
+        for model in models:
+            name = model.document["name"]
+            if name in self.fail:
+                raise OperationFailure("E11000 duplicate key error")
+            self.created.append(name)
+            self.existing[name] = {"key": model.document["key"]}
+
+    async def drop_index(self, name):
+        self.dropped.append(name)
+        self.existing.pop(name, None)
+
+class RecordingDatabase(dict):
+    def __missing__(self, collection):
+        self[collection] = RecordingCollection({"_id_": {}})
+        return self[collection]
+
+def test_missing_indexes_are_created_once(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_RETENTION_DAYS", 0)
+    db = RecordingDatabase()
+
+    summary = asyncio.run(ensure_indexes(db))
+    declared = [f"{c}.{spec['name']}" for c, specs in index_registry().items() for spec in specs]
+    assert sorted(summary["created"]) == sorted(declared)
+    assert "users.email_1" in declared and "chat_turns.session_id_1__id_1" in declared
+
+    again = asyncio.run(ensure_indexes(db))
+    assert again == {"created": [], "updated": [], "dropped": [], "failed": []}
+
+def test_retention_adds_the_sweep_index(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_RETENTION_DAYS", 30)
+    names = [spec["name"] for spec in index_registry()["chat_details"]]
+    assert "updated_at_1" in names
+
+def test_stale_ttl_indexes_are_dropped_and_failures_reported(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_RETENTION_DAYS", 0)
+    db = RecordingDatabase()
+    db["chat_turns"] = RecordingCollection({"_id_": {}, "created_at_ttl": {"expireAfterSeconds": 60}})
+    db["users"] = RecordingCollection({"_id_": {}}, fail={"email_1"})
+
+    summary = asyncio.run(ensure_indexes(db))
+    assert summary["dropped"] == ["chat_turns.created_at_ttl"]
+    assert summary["failed"] == ["users.email_1"]
@@ -0,0 +1,85 @@
+# Ingestion into published index generations
+
+import pytest
+
+pytest.importorskip("langchain.vectorstores")
+
+import vector_index
+
+def indexed_sources(ingest, persist_dir, embeddings):
+    """source -> chunk texts in the published generation"""
+    generation = vector_index.read_pointer(persist_dir)["generation"]
+    rows = vector_index._open(generation, embeddings, persist_dir)._collection.get(include=["documents", "metadatas"])
+    sources = {}
+    for text, metadata in zip(rows["documents"], rows["metadatas"]):
+        sources.setdefault(metadata["source"], []).append(text)
+    return {source: sorted(texts) for source, texts in sources.items()}
+
+def test_bulk_ingest_publishes_one_generation_and_skips_duplicates(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("alpha one\nalpha two\n")
+    (data_dir / "b.pdf").write_text("beta one\n")
+    (data_dir / "copy_of_a.pdf").write_text("alpha one\nalpha two\n")
+
+    report = ingest.ingest_directory(data_dir, persist_dir=persist_dir, max_workers=3)
+
+    assert report["generation"] == 1
+    assert {k: report["totals"][k] for k in ("ingested", "duplicate", "failed", "chunks")} == {
+        "ingested": 2, "duplicate": 1, "failed": 0, "chunks": 3,
+    }
+    duplicate = next(r for r in report["files"] if r["status"] == "duplicate")
+    assert (duplicate["source"], duplicate["duplicate_of"]) == ("copy_of_a.pdf", "a.pdf")
+    assert indexed_sources(ingest, persist_dir, embeddings) == {
+        "a.pdf": ["alpha one", "alpha two"], "b.pdf": ["beta one"],
+    }
+    assert set(ingest.load_manifest(persist_dir)["sources"]) == {"a.pdf", "b.pdf"}
+
+def test_unchanged_directory_publishes_nothing(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("alpha one\n")
+    ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+
+    report = ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+    assert report["generation"] is None
+    assert report["totals"]["skipped"] == 1
+    assert vector_index.read_pointer(persist_dir)["generation"] == 1
+
+def test_file_that_becomes_a_copy_loses_its_chunks(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("alpha one\n")
+    (data_dir / "b.pdf").write_text("beta one\n")
+    ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+
+    (data_dir / "b.pdf").write_text("alpha one\n")
+    report = ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+    assert next(r for r in report["files"] if r["source"] == "b.pdf")["removed_chunks"]
+    assert indexed_sources(ingest, persist_dir, embeddings) == {"a.pdf": ["alpha one"]}
+
+def test_batch_of_changes_shares_one_generation(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    for name in ("a.pdf", "b.pdf"):
+        (data_dir / name).write_text(f"{name} text\n")
+    ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+
+    (data_dir / "a.pdf").write_text("a.pdf revised\n")
+    (data_dir / "c.pdf").write_text("c.pdf text\n")
+    (data_dir / "b.pdf").unlink()
+    rows = ingest.ingest_changes(
+        [str(data_dir / "a.pdf"), str(data_dir / "c.pdf")], removed_sources=["b.pdf", "never-indexed.pdf"],
+        persist_dir=persist_dir,
+    )
+
+    assert {r["source"]: r["status"] for r in rows} == {
+        "a.pdf": "ingested", "c.pdf": "ingested", "b.pdf": "removed", "never-indexed.pdf": "ignored",
+    }
+    assert vector_index.read_pointer(persist_dir)["generation"] == 2
+    assert indexed_sources(ingest, persist_dir, embeddings) == {"a.pdf": ["a.pdf revised"], "c.pdf": ["c.pdf text"]}
+
+def test_batch_without_changes_needs_no_generation(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("alpha\n")
+    ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+
+    rows = ingest.ingest_changes([str(data_dir / "a.pdf")], removed_sources=["gone.pdf"], persist_dir=persist_dir)
+    assert [r["status"] for r in rows] == ["skipped", "ignored"]
+    assert vector_index.read_pointer(persist_dir)["generation"] == 1
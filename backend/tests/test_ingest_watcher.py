@@ -0,0 +1,62 @@
+# Watch-folder ingestion, driven step by step instead of by its threads
+
+import os
+
+import pytest
+
+pytest.importorskip("langchain.vectorstores")
+
+import vector_index
+from ingest_watcher import IngestWatcher
+
+def test_scan_ingests_new_files_and_removes_deleted_ones(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("alpha\n")
+    (data_dir / "b.pdf").write_text("beta\n")
+    (data_dir / "notes.txt").write_text("not a pdf\n")
+    watcher = IngestWatcher(str(data_dir), persist_dir, debounce=0, use_inotify=False)
+
+    watcher._scan()
+    watcher._process(watcher._due_paths())
+    status = watcher.status()
+    assert sorted(r["source"] for r in status["recent"]) == ["a.pdf", "b.pdf"]
+    assert {r["action"] for r in status["recent"]} == {"ingested"}
+    assert vector_index.read_pointer(persist_dir)["generation"] == 1
+
+    (data_dir / "b.pdf").unlink()
+    (data_dir / "c.pdf").write_text("gamma\n")
+    watcher._scan()
+    watcher._process(watcher._due_paths())
+    status = watcher.status()
+    assert {r["source"]: r["action"] for r in status["recent"][:2]} == {"b.pdf": "removed", "c.pdf": "ingested"}
+    assert (status["processed"], status["failed"]) == (4, 0)
+    # Both changes of the window landed in one generation
+    assert vector_index.read_pointer(persist_dir)["generation"] == 2
+    assert set(ingest.load_manifest(persist_dir)["sources"]) == {"a.pdf", "c.pdf"}
+
+def test_files_wait_for_the_debounce_window_and_a_stable_size(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    path = data_dir / "a.pdf"
+    path.write_text("alpha\n")
+
+    watcher = IngestWatcher(str(data_dir), persist_dir, debounce=60, use_inotify=False)
+    watcher.notify(str(path))
+    assert watcher._due_paths() == []
+
+    watcher.debounce = 0
+    # Still growing since the last event: the window starts over
+    path.write_text("alpha\nmore\n")
+    assert watcher._due_paths() == []
+    assert watcher._due_paths() == [os.path.abspath(path)]
+
+def test_first_scan_removes_sources_deleted_while_stopped(ingest_env):
+    ingest, data_dir, persist_dir, embeddings = ingest_env
+    (data_dir / "a.pdf").write_text("alpha\n")
+    ingest.ingest_directory(data_dir, persist_dir=persist_dir)
+    (data_dir / "a.pdf").unlink()
+
+    watcher = IngestWatcher(str(data_dir), persist_dir, debounce=0, use_inotify=False)
+    watcher._scan()
+    watcher._process(watcher._due_paths())
+    assert watcher.status()["recent"][0]["action"] == "removed"
+    assert ingest.load_manifest(persist_dir)["sources"] == {}
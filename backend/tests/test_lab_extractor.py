@@ -0,0 +1,84 @@
+# Deterministic lab-row parsing and the structured fast path of the summarizer
+
+import pytest
+
+import lab_extractor
+from lab_extractor import classify, extract_lab_results, parse_lab_line, structured_report_input
+
+CBC = """Complete Blood Count
+Test Result Unit Reference Range
+Hemoglobin 11.2 g/dL 13.0 - 17.0 L
+WBC Count: 7.4 10^3/uL 4.0-11.0
+Platelets 450 10^3/uL 150–400 H
+HbA1c 5.4 % < 5.7
+Comment: mild anaemia, please correlate clinically."""
+
+def test_row_with_range_unit_and_flag():
+    row = parse_lab_line("Hemoglobin 11.2 g/dL 13.0 - 17.0 L")
+
+    assert row == {"test": "Hemoglobin", "value": 11.2, "unit": "g/dL", "reference": "13.0-17.0",
+                   "low": 13.0, "high": 17.0, "flag": "low"}
+
+def test_names_with_digits_and_one_sided_bounds():
+    row = parse_lab_line("HbA1c 5.4 % < 5.7")
+    assert (row["test"], row["value"], row["unit"], row["low"], row["high"]) == ("HbA1c", 5.4, "%", None, 5.7)
+
+    row = parse_lab_line("Vitamin B12 180 pg/mL >200")
+    assert (row["test"], row["value"], row["low"], row["high"]) == ("Vitamin B12", 180.0, 200.0, None)
+
+@pytest.mark.parametrize("line", [
+    "Page 2 of 3",
+    "Age 54",
+    "Patient was given 500 mg daily.",
+    "Take metformin 500 mg twice a day with food for the next month",
+    "Sodium 140",
+    "12.5 g/dL 13.0-17.0",
+])
+def test_non_result_lines_are_rejected(line):
+    assert parse_lab_line(line) is None
+
+def test_range_decides_over_the_report_flag():
+    assert classify(parse_lab_line("Platelets 450 10^3/uL 150-400")) == "high"
+    assert classify(parse_lab_line("Hemoglobin 11.2 g/dL 13.0-17.0")) == "low"
+    # The report's own flag is only used when there is no range to compare with
+    assert classify(parse_lab_line("Glucose 98 mg/dL 70-100 H")) == "normal"
+    assert classify(parse_lab_line("CRP 12 mg/L H")) == "high"
+    assert classify(parse_lab_line("Ferritin 30 ng/mL")) == "unknown"
+
+def test_rows_are_deduplicated_across_pages():
+    rows, other = extract_lab_results([CBC, "Hemoglobin 11.2 g/dL 13.0-17.0 L\nEnd of report"])
+
+    assert [r["test"] for r in rows] == ["Hemoglobin", "WBC Count", "Platelets", "HbA1c"]
+    assert [r["status"] for r in rows] == ["low", "normal", "high", "normal"]
+    assert other[-1] == "End of report"
+
+def test_structured_input_lists_out_of_range_rows_in_full():
+    text, stats = structured_report_input([CBC])
+
+    assert stats["structured"] and stats["lab_rows"] == 4 and stats["out_of_range"] == 2
+    assert "Hemoglobin 11.2 g/dL (ref 13.0-17.0) LOW" in text
+    assert "Platelets 450 10^3/uL (ref 150-400) HIGH" in text
+    assert "Within range: WBC Count 7.4 10^3/uL; HbA1c 5.4 %" in text
+    # Prose survives, the table header does not
+    assert "Other report text:\nComplete Blood Count\nComment: mild anaemia" in text
+    assert "Test Result Unit" not in text
+
+def test_prose_reports_fall_back_to_text():
+    report = "Discharge summary\nThe patient recovered well.\nHemoglobin 13.5 g/dL 13.0-17.0\n" \
+             "Follow up in two weeks.\nContinue current medication."
+
+    text, stats = structured_report_input([report])
+
+    assert text is None
+    assert not stats["structured"] and stats["lab_rows"] == 1
+
+def test_thresholds_decide_the_fast_path(monkeypatch):
+    report = "Hemoglobin 14.0 g/dL 13.0-17.0\nWBC 7.0 10^3/uL 4.0-11.0\nSome note\nAnother note"
+    _, stats = structured_report_input([report])
+    assert stats["row_share"] == 0.5 and not stats["structured"]  # 2 rows < MIN_ROWS
+
+    monkeypatch.setattr(lab_extractor, "MIN_ROWS", 2)
+    assert structured_report_input([report])[1]["structured"]
+
+    monkeypatch.setattr(lab_extractor, "MIN_ROW_SHARE", 0.6)
+    assert structured_report_input([report])[0] is None
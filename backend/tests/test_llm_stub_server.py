@@ -0,0 +1,92 @@
+# Offline OpenAI-compatible stand-in used for load tests
+
+import json
+import math
+import base64
+from array import array
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from backend.evaluations.llm_stub_server import Latency, classification, create_app, embed
+
+@pytest.fixture
+def client():
+    return TestClient(create_app(Latency("fixed", 0, 0), Latency("fixed", 0, 0), tokens_per_second=0))
+
+def chat(client, content, **body):
+    return client.post("/v1/chat/completions", json={"model": "gpt-4o-mini",
+                                                     "messages": [{"role": "user", "content": content}], **body})
+
+def test_classifier_prompt_gets_classification_json(client):
+    prompt = "You are a Medical Query Classification Specialist.\nAnalyze the patient query: I have a fever and a cough"
+
+    body = chat(client, prompt).json()
+
+    result = json.loads(body["choices"][0]["message"]["content"])
+    assert (result["intent"], result["urgency"]) == ("symptom_inquiry", "medium")
+    assert result["symptoms"] == ["fever", "cough"]
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+
+@pytest.mark.parametrize("query, intent", [
+    ("I have chest pain", "emergency"),
+    ("Can I book an appointment with a cardiologist?", "doctor_inquiry"),
+    ("What are your opening hours?", "center_information"),
+    ("hello", "greeting"),
+    ("Is sleep important?", "general_health"),
+])
+def test_intent_rules(query, intent):
+    assert classification(query)["intent"] == intent
+
+def test_fused_prompt_output_parses(client):
+    pytest.importorskip("langchain_openai")
+    from fused_document import parse_fused_response
+
+    body = chat(client, "Reply with ### SUMMARY, ### GUIDANCE and ### FOLLOW_UP").json()
+
+    parts = parse_fused_response(body["choices"][0]["message"]["content"])
+    assert parts["followup"].endswith("?")
+
+def test_crewai_prompts_get_a_final_answer(client):
+    body = chat(client, "You are a Medical Follow-up Specialist.\nFinal Answer: the question").json()
+    content = body["choices"][0]["message"]["content"]
+    assert content.startswith("Thought:") and "\nFinal Answer: " in content
+
+def test_streamed_completion_reassembles_with_usage(client):
+    prompt = "You are a Medical Solution Specialist. I feel tired."
+    plain = chat(client, prompt).json()["choices"][0]["message"]["content"]
+
+    response = chat(client, prompt, stream=True, stream_options={"include_usage": True})
+
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"]) == plain
+    assert chunks[-1]["choices"] == [] and chunks[-1]["usage"]["completion_tokens"] > 0
+
+def test_embeddings_are_deterministic_and_unit_length(client):
+    body = client.post("/v1/embeddings", json={"input": ["blood test results", "blood test"], "dimensions": 64}).json()
+
+    first, second = (item["embedding"] for item in body["data"])
+    assert len(first) == 64 and math.isclose(sum(v * v for v in first), 1.0)
+    assert first == embed("blood test results", 64)
+    # Texts sharing words are close, unrelated ones are not
+    assert sum(a * b for a, b in zip(first, second)) > 0.5
+    assert sum(a * b for a, b in zip(first, embed("appointment booking", 64))) < 0.5
+
+def test_single_and_base64_embedding_inputs(client):
+    body = client.post("/v1/embeddings", json={"input": "fever", "dimensions": 16, "encoding_format": "base64"}).json()
+
+    (item,) = body["data"]
+    vector = array("f", base64.b64decode(item["embedding"])).tolist()
+    assert vector == pytest.approx(embed("fever", 16))
+    assert client.get("/stats").json()["embedded_inputs"] == 1
+
+def test_latency_samplers():
+    assert Latency("fixed", 0, 100).sample() == 0.0
+    assert Latency("fixed", 250, 100).sample() == 0.25
+    samples = [Latency("uniform", 100, 50, seed=1).sample() for _ in range(3)]
+    assert samples == [samples[0]] * 3 and 0.05 <= samples[0] <= 0.15
+    assert all(s > 0 for s in (Latency("lognormal", 100, 300, seed=n).sample() for n in range(20)))
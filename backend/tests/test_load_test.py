@@ -0,0 +1,97 @@
+# Load-test harness: percentiles, the report and a simulated user against a fake API
+
+import json
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+EVALUATIONS = Path(__file__).resolve().parents[1] / "evaluations"
+
+@pytest.fixture
+def load_test(monkeypatch):
+    # The harness imports its sibling scripts flat, as when run from backend/evaluations
+    monkeypatch.syspath_prepend(str(EVALUATIONS))
+    import load_test
+    return load_test
+
+def test_percentiles_and_report(load_test):
+    values = [i / 1000 for i in range(1, 101)]
+    assert (load_test.percentile(values, 0.5), load_test.percentile(values, 0.99)) == (0.051, 0.1)
+    assert load_test.percentile([0.2], 0.95) == 0.2
+
+    recorder = load_test.Recorder()
+    for seconds in values:
+        recorder.add("endpoints", "/api/chat/message", seconds, ok=seconds != 0.1)
+    recorder.add("categories", "symptom", 0.5, ok=True)
+
+    report = recorder.report(elapsed=2.0)
+
+    assert report["endpoints"]["/api/chat/message"] == {
+        "requests": 100, "throughput_rps": 50.0, "error_rate": 0.01,
+        "p50_ms": 51.0, "p95_ms": 96.0, "p99_ms": 100.0, "max_ms": 100.0,
+    }
+    assert report["categories"]["symptom"]["requests"] == 1
+
+def fake_api(swap_history=False, fail_turn=None):
+    """Transport answering auth and chat turns like the API's delta protocol"""
+    state = {"turns": 0, "last_turn_ids": []}
+
+    def handle(request):
+        if request.url.path == "/auth/signup":
+            return httpx.Response(201, json={})
+        if request.url.path == "/auth/login":
+            return httpx.Response(200, json={"access_token": "token"})
+        body = json.loads(request.content)
+        state["last_turn_ids"].append(body["last_turn_id"])
+        state["turns"] += 1
+        if state["turns"] == fail_turn:
+            return httpx.Response(500, json={"detail": "boom"})
+        sent = body.get("message") or "doc:" + body.get("document_content", "")
+        if swap_history:
+            sent = "someone else's message"
+        turn = {"messages": [{"role": "user", "content": sent}, {"role": "assistant", "content": "ok"}]}
+        return httpx.Response(200, json={"turn_id": f"t{state['turns']}", "new_turns": [turn]})
+
+    return httpx.MockTransport(handle), state
+
+def simulate(load_test, transport, **options):
+    args = SimpleNamespace(**{"seed": 1, "run_id": "test", "turns": 4, "document_share": 0.5, "think_ms": 0,
+                              **options})
+    recorder = load_test.Recorder()
+    reports = [("lab", ["Hemoglobin 13.5 g/dL 13.0-17.0"])]
+
+    async def main():
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            await load_test.simulate_user(client, recorder, args, 0, reports)
+
+    asyncio.run(main())
+    return recorder
+
+def test_user_continues_its_session_through_the_delta_protocol(load_test):
+    transport, state = fake_api()
+
+    recorder = simulate(load_test, transport)
+
+    assert state["last_turn_ids"] == [None, "t1", "t2", "t3"]
+    assert recorder.history_mismatches == 0
+    endpoints = {name for group, name in recorder.samples if group == "endpoints"}
+    assert "/auth/login" in endpoints and len(recorder.samples[("endpoints", "/auth/login")]) == 1
+    assert sum(len(s) for (group, _), s in recorder.samples.items() if group == "categories") == 4
+
+def test_other_sessions_history_is_counted(load_test):
+    transport, _ = fake_api(swap_history=True)
+
+    assert simulate(load_test, transport).history_mismatches == 4
+
+def test_failed_turn_restarts_the_session(load_test):
+    transport, state = fake_api(fail_turn=3)
+
+    recorder = simulate(load_test, transport)
+
+    assert state["last_turn_ids"] == [None, "t1", "t2", None]
+    errors = sum(1 for (group, _), s in recorder.samples.items() if group == "endpoints" for _, ok in s if not ok)
+    assert errors == 1 and recorder.history_mismatches == 0
@@ -0,0 +1,55 @@
+# Map-reduce summarization of long reports (no LLM calls: the map step is replaced)
+
+import time
+
+import pytest
+
+from report_compression import count_tokens
+
+@pytest.fixture
+def summarizer():
+    pytest.importorskip("crewai")
+    pytest.importorskip("langchain_openai")
+    pytest.importorskip("langchain_community")
+    import Doc_Summerize
+    return Doc_Summerize
+
+def page(n, words=200):
+    return " ".join(f"page{n}word{i}" for i in range(words))
+
+def test_pages_are_grouped_in_order_within_the_chunk_size(summarizer):
+    pages = [page(n) for n in range(1, 8)]
+    limit = sum(count_tokens(p) for p in pages[:3])
+
+    groups = summarizer.split_page_groups(pages, max_tokens=limit)
+
+    assert [(first, last) for first, last, _ in groups] == [(1, 3), (4, 6), (7, 7)]
+    assert "\n".join(text for _, _, text in groups) == "\n".join(pages)
+
+def test_oversized_page_is_cut_into_pieces(summarizer):
+    big = page(2, words=2000)
+    groups = summarizer.split_page_groups([page(1), big], max_tokens=count_tokens(big) // 3)
+
+    assert groups[0][:2] == (1, 1)
+    pieces = [text for first, last, text in groups if (first, last) == (2, 2)]
+    assert len(pieces) >= 3
+    assert "".join(pieces) == big
+
+def test_map_step_runs_concurrently_and_keeps_report_order(summarizer, monkeypatch):
+    def slow_summary(group):
+        first, last, _ = group
+        # Earlier groups finish last
+        time.sleep(0.05 * (5 - first))
+        return f"notes {first}-{last}"
+
+    monkeypatch.setattr(summarizer, "summarize_page_group", slow_summary)
+    groups = [(n, n, page(n)) for n in range(1, 5)]
+
+    started = time.perf_counter()
+    notes = summarizer.map_page_groups(groups)
+    assert notes == ["notes 1-1", "notes 2-2", "notes 3-3", "notes 4-4"]
+    assert time.perf_counter() - started < 0.05 * (4 + 3 + 2 + 1)
+
+def test_short_report_is_not_map_reduced(summarizer, monkeypatch):
+    monkeypatch.setattr(summarizer, "map_page_groups", lambda groups: pytest.fail("map step called"))
+    assert summarizer.prepare_report_input(pages=["Diagnosis: mild anaemia."]) == "Diagnosis: mild anaemia."
@@ -0,0 +1,62 @@
+# Extraction time budgets: opening the document, each page, and the whole job
+
+import time
+import asyncio
+import signal
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+from backend.core.config import settings
+from backend.utils import pdf_extract
+
+needs_alarm = pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="SIGALRM is not available")
+
+def blank_pdf(path, pages=2):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=72, height=72)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+def test_extracts_every_page(tmp_path):
+    result = pdf_extract.extract_pdf_pages(blank_pdf(tmp_path / "a.pdf", pages=3), page_timeout=5)
+    assert result["page_count"] == 3
+    assert result["skipped_pages"] == []
+
+@needs_alarm
+def test_opening_the_document_is_under_the_time_budget(tmp_path, monkeypatch):
+    def slow_reader(path):
+        time.sleep(5)
+
+    monkeypatch.setattr(pypdf, "PdfReader", slow_reader)
+    started = time.perf_counter()
+    with pytest.raises(pdf_extract.ParseTimeout):
+        pdf_extract.extract_pdf_pages(str(tmp_path / "a.pdf"), page_timeout=0.05)
+    assert time.perf_counter() - started < 2
+
+def test_document_timeout_kills_the_worker(tmp_path, monkeypatch):
+    path = blank_pdf(tmp_path / "a.pdf")
+    monkeypatch.setattr(settings, "PDF_EXTRACT_TIMEOUT_SECONDS", 30.0)
+
+    async def main():
+        # Warm a worker, then give the next job less time than a worker needs to answer
+        await pdf_extract.extract_pdf(path)
+        worker = pdf_extract._idle[-1]
+        processes = list(worker._processes.values())
+        monkeypatch.setattr(settings, "PDF_EXTRACT_TIMEOUT_SECONDS", 0.0001)
+        with pytest.raises(asyncio.TimeoutError):
+            await pdf_extract.extract_pdf(path)
+        return worker, processes
+
+    try:
+        worker, processes = asyncio.run(main())
+        assert worker not in pdf_extract._idle
+        for process in processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+    finally:
+        pdf_extract.shutdown_extract_pool()
+        pdf_extract._slots = None
@@ -0,0 +1,81 @@
+# Local report compression and how prepare_report_input combines it with map-reduce
+
+import random
+
+import pytest
+
+import report_compression
+from report_compression import compress_report, count_tokens, strip_boilerplate
+
+WORDS = (
+    "fever cough chest pain consolidation lobe antibiotics oxygen saturation ward review discharge clinic "
+    "imaging glucose metformin breathing leaflet physiotherapy mobilisation intake appetite sleep"
+).split()
+
+def prose(rng, sentences):
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(sentences)
+    )
+
+def long_report(pages=30, seed=3):
+    rng = random.Random(seed)
+    return [prose(rng, 40) for _ in range(pages)]
+
+def test_boilerplate_is_stripped_and_repeated_lab_rows_kept_once():
+    pages = [
+        f"St. Mary's Hospital\nHemoglobin 10.1 g/dL 13.0 - 17.0\nNote {n}: {word} seen.\nPage {n} of 3"
+        for n, word in enumerate(["cough", "fever", "rash"], start=1)
+    ]
+    stripped, removed = strip_boilerplate(pages)
+    assert removed == 8
+    assert stripped[0] == "Hemoglobin 10.1 g/dL 13.0 - 17.0\nNote 1: cough seen."
+    assert stripped[1] == "Note 2: fever seen."
+
+def test_lab_lines_survive_and_report_order_is_kept():
+    rng = random.Random(1)
+    before, after = prose(rng, 30), prose(rng, 30)
+    lab = "Hemoglobin 10.1 L g/dL 13.0 - 17.0"
+    compressed, stats = compress_report([f"{before}\n{lab}\n{after}"], budget=200)
+
+    assert stats["extractive"]
+    assert stats["compressed_tokens"] <= 200
+    lines = compressed[0].splitlines()
+    assert lab in lines
+    position = lines.index(lab)
+    # Kept sentences stay on their side of the lab line
+    assert all(line in before for line in lines[:position])
+    assert all(line in after for line in lines[position + 1:])
+
+def test_budget_zero_disables_compression():
+    pages = long_report(pages=2)
+    compressed, stats = compress_report(pages, budget=0)
+    assert compressed == pages
+    assert stats["compression_ratio"] == 1.0
+
+def test_reports_above_max_tokens_are_not_cut():
+    pages = long_report()
+    compressed, stats = compress_report(pages, budget=1000, max_tokens=5000)
+    assert not stats["extractive"]
+    assert compressed == pages
+
+def test_default_budget_is_below_the_map_reduce_threshold():
+    Doc_Summerize = import_summarizer()
+    assert report_compression.TOKEN_BUDGET < Doc_Summerize.MAP_REDUCE_THRESHOLD_TOKENS
+
+def test_report_over_the_threshold_reaches_map_page_groups(monkeypatch):
+    Doc_Summerize = import_summarizer()
+    pages = long_report()
+    assert count_tokens("\n".join(pages)) > Doc_Summerize.MAP_REDUCE_THRESHOLD_TOKENS
+
+    mapped = []
+    monkeypatch.setattr(Doc_Summerize, "map_page_groups", lambda groups: mapped.append(groups) or ["Notes"])
+    assert Doc_Summerize.prepare_report_input(pages=pages) == "Notes"
+    # Every page reaches the map step whole
+    assert "\n".join(text for _, _, text in mapped[0]) == "\n".join(pages)
+
+def import_summarizer():
+    pytest.importorskip("crewai")
+    pytest.importorskip("langchain_openai")
+    pytest.importorskip("langchain_community")
+    import Doc_Summerize
+    return Doc_Summerize
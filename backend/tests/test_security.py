@@ -0,0 +1,61 @@
+# Cached user resolution in get_current_user
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from backend.core import security
+from backend.core.config import settings
+from backend.core.security import create_access_token, get_current_user, invalidate_user, user_token_claims
+
+@pytest.fixture
+def user(memory_storage, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_EMBED_USER_CLAIMS", False)
+    security.user_cache.clear()
+    created = asyncio.run(memory_storage.create_user(
+        {"email": "patient@example.com", "hashed_password": "x", "created_at": datetime(2026, 1, 1)}
+    ))
+    yield created
+    security.user_cache.clear()
+    security.deactivated_users.discard(str(created["_id"]))
+
+def resolve(token, storage):
+    return asyncio.run(get_current_user(token=token, storage=storage))
+
+def test_resolved_user_is_served_from_the_cache(user, memory_storage):
+    token = create_access_token(str(user["_id"]))
+    first = resolve(token, memory_storage)
+    assert first == {"id": str(user["_id"]), "email": "patient@example.com", "created_at": datetime(2026, 1, 1)}
+
+    # No storage needed once cached, and callers get their own copy
+    first["email"] = "changed"
+    assert resolve(token, None)["email"] == "patient@example.com"
+
+def test_deactivated_user_is_refused_even_with_claims(user, memory_storage, monkeypatch):
+    user_id = str(user["_id"])
+    resolve(create_access_token(user_id), memory_storage)
+    monkeypatch.setattr(settings, "JWT_EMBED_USER_CLAIMS", True)
+    claims_token = create_access_token(user_id, user_token_claims(user))
+
+    asyncio.run(memory_storage.update_user(user_id, {"is_active": False}))
+    invalidate_user(user_id, deactivated=True)
+    for token in (create_access_token(user_id), claims_token):
+        with pytest.raises(HTTPException) as excinfo:
+            resolve(token, memory_storage)
+        assert excinfo.value.status_code == 401
+
+    asyncio.run(memory_storage.update_user(user_id, {"is_active": True}))
+    invalidate_user(user_id)
+    assert resolve(claims_token, memory_storage)["id"] == user_id
+
+def test_claims_token_needs_no_lookup(user, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_EMBED_USER_CLAIMS", True)
+    token = create_access_token(str(user["_id"]), user_token_claims(user))
+    assert resolve(token, None)["email"] == "patient@example.com"
+
+def test_invalid_tokens_are_refused(user, memory_storage):
+    for token in ("not-a-jwt", create_access_token("not-an-object-id")):
+        with pytest.raises(HTTPException):
+            resolve(token, memory_storage)
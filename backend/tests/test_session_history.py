@@ -0,0 +1,32 @@
+# Server-held chat history for the delta protocol
+
+from backend.utils.session_history import SessionHistory, SessionHistoryStore
+
+def messages(n):
+    return [{"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}]
+
+def test_turns_after_returns_only_newer_turns():
+    history = SessionHistory([{"role": "user", "content": "resent"}])
+    for n in range(3):
+        history.append_turn(f"t{n}", messages(n))
+
+    assert [turn_id for turn_id, _ in history.turns_after(None)] == ["t0", "t1", "t2"]
+    assert history.turns_after("t1") == [("t2", messages(2))]
+    assert history.turns_after("t2") == []
+    assert history.turns_after("unknown") is None
+    assert len(history.messages) == 7
+
+def test_history_copies_the_messages_it_is_given():
+    resent = [{"role": "user", "content": "hi"}]
+    history = SessionHistory(resent)
+    resent[0]["content"] = "changed"
+    assert history.messages[0]["content"] == "hi"
+
+def test_store_reset_and_drop():
+    store = SessionHistoryStore(maxsize=2, ttl=60)
+    store.reset("a").append_turn("t0", messages(0))
+    assert store.get("a").turns_after(None) == [("t0", messages(0))]
+    assert store.reset("a").turns == []
+
+    store.drop("a")
+    assert store.get("a") is None
@@ -0,0 +1,124 @@
+# The memory and SQLite backends must behave the same for every Storage operation
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from backend.database.storage import Storage, MemoryStorage, SQLiteStorage, apply_update
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryStorage()
+    else:
+        backend = SQLiteStorage(str(tmp_path / "storage.sqlite3"))
+    asyncio.run(backend.connect())
+    yield backend
+    asyncio.run(backend.close())
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_incomplete_backend_fails_at_instantiation():
+    class Partial(Storage):
+        available = True
+
+        async def get_user_by_email(self, email):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_users(storage):
+    user = run(storage.create_user({
+        "email": "a@example.com", "hashed_password": "h", "created_at": datetime(2026, 1, 1),
+    }))
+    assert isinstance(user["_id"], ObjectId)
+    with pytest.raises(DuplicateKeyError):
+        run(storage.create_user({"email": "a@example.com", "hashed_password": "x"}))
+
+    assert run(storage.get_user_by_email("a@example.com"))["_id"] == user["_id"]
+    assert run(storage.get_user_by_email("missing@example.com")) is None
+    assert run(storage.update_user(str(user["_id"]), {"hashed_password": "new"}))
+    assert run(storage.get_user_by_id(str(user["_id"])))["hashed_password"] == "new"
+    assert not run(storage.update_user(str(ObjectId()), {"hashed_password": "new"}))
+
+def test_returned_documents_are_copies(storage):
+    user = run(storage.create_user({"email": "a@example.com", "tags": ["x"]}))
+    user["tags"].append("y")
+    assert run(storage.get_user_by_id(str(user["_id"])))["tags"] == ["x"]
+
+def test_chat_turns_are_idempotent_and_ordered(storage):
+    turns = [{"_id": ObjectId(), "session_id": "s", "messages": [{"content": str(i)}]} for i in range(4)]
+    assert run(storage.insert_chat_turns(turns[:2])) == []
+    # A retried batch overlapping stored turns counts as written
+    assert run(storage.insert_chat_turns(turns)) == []
+    run(storage.insert_chat_turns([{"_id": ObjectId(), "session_id": "other", "messages": []}]))
+
+    stored = run(storage.get_session_turns("s"))
+    assert [t["messages"][0]["content"] for t in stored] == ["0", "1", "2", "3"]
+    after = run(storage.get_session_turns("s", after_turn_id=turns[1]["_id"], limit=1))
+    assert [t["_id"] for t in after] == [turns[2]["_id"]]
+    assert run(storage.get_session_turns("missing")) == []
+
+def test_session_header_updates(storage):
+    first = {
+        "$setOnInsert": {"created_at": 1},
+        "$set": {"chain_head": "a"},
+        "$inc": {"turn_count": 1},
+        "$push": {"recent_intents": {"$each": ["x"], "$slice": -2}},
+    }
+    second = {
+        "$setOnInsert": {"created_at": 2},
+        "$set": {"chain_head": "b"},
+        "$inc": {"turn_count": 1},
+        "$push": {"recent_intents": {"$each": ["y", "z"], "$slice": -2}},
+    }
+    assert run(storage.apply_session_updates([("s", first)])) == []
+    assert run(storage.apply_session_updates([("s", second)])) == []
+    header = run(storage.get_session_header("s"))
+    assert header["session_id"] == "s"
+    assert header["created_at"] == 1
+    assert header["chain_head"] == "b"
+    assert header["turn_count"] == 2
+    assert header["recent_intents"] == ["y", "z"]
+    assert run(storage.get_session_header("missing")) is None
+
+def test_usage_updates_add_up(storage):
+    update = {"$setOnInsert": {"user_id": "u"}, "$inc": {"requests": 1, "agents.solution.total_tokens": 5}}
+    run(storage.apply_usage_updates([(("u", "2026-01-01"), update)]))
+    run(storage.apply_usage_updates([(("u", "2026-01-01"), update), (("u", "2026-01-02"), update)]))
+    if isinstance(storage, MemoryStorage):
+        doc = storage.usage["u:2026-01-01"]
+    else:
+        doc = run(storage._run(storage._load, "SELECT doc FROM llm_usage WHERE id = ?", ("u:2026-01-01",)))
+    assert doc["requests"] == 2
+    assert doc["agents"] == {"solution": {"total_tokens": 10}}
+
+def test_upsert_pdf_keeps_created_at(storage):
+    run(storage.upsert_pdf("kb.pdf", {"uploaded_at": 1, "size": 10}))
+    run(storage.upsert_pdf("kb.pdf", {"uploaded_at": 2, "size": 20}))
+    if isinstance(storage, MemoryStorage):
+        doc = storage.pdfs["kb.pdf"]
+    else:
+        doc = run(storage._run(storage._load, "SELECT doc FROM pdfs WHERE title = ?", ("kb.pdf",)))
+    assert (doc["created_at"], doc["uploaded_at"], doc["size"]) == (1, 2, 20)
+
+def test_sqlite_data_survives_reconnect(tmp_path):
+    path = str(tmp_path / "storage.sqlite3")
+    first = SQLiteStorage(path)
+    run(first.connect())
+    run(first.create_user({"email": "a@example.com"}))
+    run(first.close())
+
+    second = SQLiteStorage(path)
+    run(second.connect())
+    assert run(second.get_user_by_email("a@example.com")) is not None
+    run(second.close())
+
+def test_apply_update_unset_and_nested_inc():
+    doc = apply_update({"a": 1, "b": 2}, {"$unset": {"b": ""}, "$inc": {"x.y": 2}}, inserted=False)
+    assert doc == {"a": 1, "x": {"y": 2}}
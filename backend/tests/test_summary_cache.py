@@ -0,0 +1,56 @@
+# Document summary cache keys and its two bounded tiers
+
+import itertools
+
+import pytest
+
+import summary_cache
+from summary_cache import SummaryCache, summary_key
+
+@pytest.fixture
+def ticking_clock(monkeypatch):
+    ticks = itertools.count(1)
+    monkeypatch.setattr(summary_cache.time, "time", lambda: next(ticks))
+
+def test_key_ignores_cosmetic_differences():
+    key = summary_key("Hemoglobin  10.1 g/dL\nDiagnosis: anaemia", "v1", "budget=4000")
+    assert summary_key(" Hemoglobin 10.1 g/dL  Diagnosis:\tanaemia ", "v1", "budget=4000") == key
+    # Full-width characters normalize to their ASCII forms
+    assert summary_key("Ｈemoglobin 10.1 g/dL Diagnosis: anaemia", "v1", "budget=4000") == key
+
+def test_key_changes_with_text_prompt_version_and_input_settings():
+    keys = {
+        summary_key("report", "v1", "budget=4000"),
+        summary_key("report 2", "v1", "budget=4000"),
+        summary_key("report", "v2", "budget=4000"),
+        summary_key("report", "v1", "budget=3000"),
+    }
+    assert len(keys) == 4
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "summary_cache.sqlite3")
+    SummaryCache(path).put("k", "summary")
+
+    reopened = SummaryCache(path)
+    assert reopened.get("k") == "summary"
+    assert reopened.get("k") == "summary"
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+def test_both_tiers_evict_least_recently_used(tmp_path, ticking_clock):
+    cache = SummaryCache(str(tmp_path / "summary_cache.sqlite3"), memory_entries=1, max_disk_bytes=20)
+    cache.put("a", "x" * 8)
+    cache.put("b", "y" * 8)
+    assert cache.get("a") == "x" * 8
+    cache.put("c", "z" * 8)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 8
+    stats = cache.stats()
+    assert (stats["memory_entries"], stats["disk_entries"], stats["evictions"]) == (1, 2, 1)
+
+def test_disabled_disk_tier(tmp_path):
+    cache = SummaryCache(str(tmp_path / "unused.sqlite3"), memory_entries=0, max_disk_bytes=0)
+    cache.put("k", "summary")
+    assert cache.get("k") is None
+    assert not (tmp_path / "unused.sqlite3").exists()
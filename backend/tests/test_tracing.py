@@ -0,0 +1,62 @@
+# Stage histogram, error counter and trace export of span()
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+from prometheus_client import REGISTRY
+
+from backend.utils import tracing
+
+def sample(name, stage):
+    return REGISTRY.get_sample_value(name, {"stage": stage}) or 0.0
+
+def test_span_observes_its_duration():
+    before = sample("mediconnect_stage_duration_seconds_count", "test.ok")
+
+    with tracing.span("test.ok"):
+        pass
+
+    assert sample("mediconnect_stage_duration_seconds_count", "test.ok") == before + 1
+    assert sample("mediconnect_stage_errors_total", "test.ok") == 0
+
+def test_failing_stage_is_counted_and_reraised():
+    before = sample("mediconnect_stage_errors_total", "test.fail")
+
+    with pytest.raises(ValueError):
+        with tracing.span("test.fail"):
+            raise ValueError("boom")
+
+    assert sample("mediconnect_stage_errors_total", "test.fail") == before + 1
+    assert sample("mediconnect_stage_duration_seconds_count", "test.fail") >= 1
+
+def test_metrics_payload_is_the_text_exposition():
+    with tracing.span("test.payload"):
+        pass
+
+    body, content_type = tracing.metrics_payload()
+
+    assert content_type.startswith("text/plain")
+    assert b'mediconnect_stage_duration_seconds_bucket{le="0.0005",stage="test.payload"}' in body
+
+def test_tracing_is_off_without_an_endpoint():
+    assert tracing.configure_tracing("", "mediconnect") is False
+    assert tracing._tracer is None
+
+def test_stages_are_exported_as_nested_spans(monkeypatch):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer(__name__))
+
+    with tracing.span("test.outer"):
+        with tracing.span("test.inner"):
+            pass
+
+    inner, outer = exporter.get_finished_spans()
+    assert (inner.name, outer.name) == ("test.inner", "test.outer")
+    assert inner.parent.span_id == outer.context.span_id
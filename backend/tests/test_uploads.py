@@ -0,0 +1,36 @@
+# Streaming uploads are hashed and size-checked in the pass that writes them
+
+import io
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from backend.utils import uploads
+from backend.utils.uploads import stream_upload_to_disk
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="report.pdf")
+
+def test_hash_and_size_match_the_written_file(tmp_path, monkeypatch):
+    # Small chunks, so the hash is built across several reads
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 7)
+    data = b"%PDF-1.4 " + bytes(range(256)) * 3
+    dest = tmp_path / "upload.pdf"
+
+    digest, size = asyncio.run(stream_upload_to_disk(upload(data), dest, max_bytes=len(data)))
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    assert dest.read_bytes() == data
+
+def test_oversized_upload_is_refused_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 4)
+    dest = tmp_path / "upload.pdf"
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(stream_upload_to_disk(upload(b"x" * 10), dest, max_bytes=8))
+
+    assert excinfo.value.status_code == 413
+    assert not dest.exists()
@@ -0,0 +1,100 @@
+# Per-request LLM usage accounting and its coalesced daily totals
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from backend.database.mongodb import merge_usage_updates, usage_update
+from backend.database.write_queue import ChatWriteQueue
+from backend.utils.usage import (
+    UsageRecorder, cost_usd, record_crew_usage, record_message_usage, record_usage, track_usage,
+)
+
+def test_cost_is_priced_per_million_tokens():
+    assert cost_usd("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert cost_usd("gpt-4o", 2000, 500) == pytest.approx(0.01)
+    assert cost_usd("unknown-model", 1000, 1000) == 0.0
+
+def test_summary_totals_the_agents():
+    recorder = UsageRecorder()
+    recorder.add("classifier", 100, 10, 1, 0.0001)
+    recorder.add("solution", 1000, 200, 1, 0.0003)
+    recorder.add("classifier", 50, 5, 1, 0.00005)
+
+    summary = recorder.summary()
+
+    assert (summary["prompt_tokens"], summary["completion_tokens"], summary["total_tokens"]) == (1150, 215, 1365)
+    assert summary["llm_calls"] == 3 and summary["cost_usd"] == pytest.approx(0.00045)
+    assert summary["agents"]["classifier"] == {"prompt_tokens": 150, "completion_tokens": 15, "total_tokens": 165,
+                                               "llm_calls": 2, "cost_usd": 0.00015}
+
+def test_calls_are_recorded_only_inside_track_usage():
+    record_usage("outside", 10, 10)
+    with track_usage() as usage:
+        record_usage("solution", 100, 20)
+        # Worker threads running in a copy of the context record to the same request
+        with ThreadPoolExecutor(2) as pool:
+            for future in [pool.submit(copy_context().run, record_usage, "map", 10, 5) for _ in range(4)]:
+                future.result()
+    with track_usage() as other:
+        record_usage("solution", 1, 1)
+
+    summary = usage.summary()
+    assert set(summary["agents"]) == {"solution", "map"}
+    assert summary["agents"]["map"]["llm_calls"] == 4 and summary["total_tokens"] == 180
+    assert other.summary()["total_tokens"] == 2
+
+def test_usage_is_read_from_chat_messages_and_crew_outputs():
+    with track_usage() as usage:
+        record_message_usage("a", SimpleNamespace(usage_metadata={"input_tokens": 30, "output_tokens": 7}))
+        record_message_usage("b", SimpleNamespace(
+            usage_metadata=None, response_metadata={"token_usage": {"prompt_tokens": 20, "completion_tokens": 4}}
+        ))
+        metrics = SimpleNamespace(prompt_tokens=300, completion_tokens=60, successful_requests=2)
+        record_crew_usage("crew", SimpleNamespace(), SimpleNamespace(token_usage=metrics))
+        # Nothing to record
+        record_crew_usage("none", SimpleNamespace(), SimpleNamespace(token_usage=None))
+
+    agents = usage.summary()["agents"]
+    assert agents["a"]["total_tokens"] == 37 and agents["b"]["total_tokens"] == 24
+    assert (agents["crew"]["total_tokens"], agents["crew"]["llm_calls"]) == (360, 2)
+    assert "none" not in agents
+
+def summary(prompt, completion, agent="solution"):
+    recorder = UsageRecorder()
+    recorder.add(agent, prompt, completion, 1, cost_usd("gpt-4o-mini", prompt, completion))
+    return recorder.summary()
+
+def test_usage_updates_merge_like_sequential_increments():
+    first = usage_update("u", "2026-01-01", summary(100, 10))
+    second = usage_update("u", "2026-01-01", summary(50, 5, agent="classifier"))
+
+    merged = merge_usage_updates(first, second)
+
+    assert merged["$setOnInsert"] == {"user_id": "u", "day": "2026-01-01"}
+    assert merged["$inc"]["requests"] == 2 and merged["$inc"]["total_tokens"] == 165
+    assert merged["$inc"]["agents.solution.prompt_tokens"] == 100
+    assert merged["$inc"]["agents.classifier.prompt_tokens"] == 50
+    # The inputs are left untouched
+    assert first["$inc"]["requests"] == 1
+
+def test_queue_writes_one_coalesced_update_per_user_and_day(memory_storage):
+    async def main():
+        queue = ChatWriteQueue(batch_size=100, flush_interval=60, max_retries=1, retry_delay=0.001)
+        for _ in range(3):
+            queue.enqueue_usage("u", summary(100, 10))
+        queue.enqueue_usage("v", summary(1, 1))
+        assert queue.stats()["pending_usage"] == 2
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(main())
+
+    assert (stats["pending_usage"], stats["usage_updates"]) == (0, 2)
+    (doc,) = [d for key, d in memory_storage.usage.items() if key.startswith("u:")]
+    assert (doc["requests"], doc["total_tokens"], doc["agents"]["solution"]["llm_calls"]) == (3, 330, 3)
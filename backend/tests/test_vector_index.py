@@ -0,0 +1,66 @@
+# Index generations: atomic publish, reader leases and garbage collection
+
+import os
+
+import pytest
+
+pytest.importorskip("langchain.vectorstores")
+
+import vector_index
+from vector_index import (
+    build_lock, begin_generation, publish_generation, read_pointer, current_pointer, lease_store,
+    collect_garbage, collection_name,
+)
+
+def build(persist_dir, embeddings, texts):
+    """Publish a new generation holding texts on top of the current one"""
+    with build_lock(persist_dir):
+        generation, store = begin_generation(embeddings, persist_dir)
+        store._collection.add(
+            ids=[f"{generation}-{i}" for i in range(len(texts))],
+            embeddings=[embeddings.embed_query(t) for t in texts],
+            documents=list(texts),
+            metadatas=[{"source": "kb.pdf"} for _ in texts],
+        )
+        publish_generation(generation, persist_dir)
+    return generation
+
+def test_publish_replaces_the_pointer_atomically(tmp_path, monkeypatch):
+    persist_dir = str(tmp_path)
+    assert read_pointer(persist_dir)["generation"] == 0
+
+    publish_generation(3, persist_dir)
+    assert read_pointer(persist_dir)["collection"] == collection_name(3)
+    assert os.listdir(persist_dir) == ["index_pointer.json"]
+
+    def interrupted(*args, **kwargs):
+        raise OSError("disk full")
+
+    # A publish that fails while writing leaves the previous pointer in place
+    monkeypatch.setattr(vector_index.json, "dump", interrupted)
+    with pytest.raises(OSError):
+        publish_generation(4, persist_dir)
+    assert read_pointer(persist_dir)["generation"] == 3
+
+def test_next_generation_starts_from_a_copy_of_the_current_one(tmp_path, fake_embeddings):
+    persist_dir = str(tmp_path)
+    build(persist_dir, fake_embeddings, ["first"])
+    second = build(persist_dir, fake_embeddings, ["second"])
+
+    assert current_pointer(persist_dir)["generation"] == second
+    documents = vector_index._open(second, fake_embeddings, persist_dir)._collection.get(include=["documents"])
+    assert sorted(documents["documents"]) == ["first", "second"]
+
+def test_leased_generation_outlives_a_publish_until_released(tmp_path, fake_embeddings):
+    persist_dir = str(tmp_path)
+    first = build(persist_dir, fake_embeddings, ["first"])
+
+    with lease_store(fake_embeddings, persist_dir) as (leased, _):
+        assert leased == first
+        second = build(persist_dir, fake_embeddings, ["second"])
+        # New readers see the new generation while the old lease is held
+        with lease_store(fake_embeddings, persist_dir) as (newer, _):
+            assert newer == second
+        assert collection_name(first) not in collect_garbage(fake_embeddings, persist_dir, keep=1)
+
+    assert collection_name(first) in collect_garbage(fake_embeddings, persist_dir, keep=1)
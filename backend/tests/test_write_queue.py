@@ -0,0 +1,83 @@
+# Write-behind chat persistence against the in-process storage
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from backend.database import storage
+from backend.database.write_queue import ChatWriteQueue
+
+def make_turn(session_id, n):
+    return {
+        "_id": ObjectId(),
+        "session_id": session_id,
+        "user_id": session_id,
+        "messages": [{"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}],
+        "classification": {"intent": "general_inquiry"},
+        "chain_hash": f"head-{n}",
+        "created_at": datetime(2026, 1, 1) + timedelta(minutes=n),
+    }
+
+def make_queue(**kwargs):
+    options = {"batch_size": 100, "flush_interval": 60, "max_retries": 1, "retry_delay": 0.001}
+    return ChatWriteQueue(**{**options, **kwargs})
+
+def test_turns_are_written_in_order_with_one_coalesced_header(memory_storage):
+    async def main():
+        queue = make_queue()
+        turns = [make_turn("s", n) for n in range(3)]
+        for turn in turns:
+            queue.enqueue(turn)
+        # Readers see queued turns before they are written
+        assert [t["_id"] for t in queue.pending_turns("s")] == [t["_id"] for t in turns]
+        assert await memory_storage.get_session_turns("s") == []
+
+        await queue.stop()
+        return queue, turns
+
+    queue, turns = asyncio.run(main())
+    stored = asyncio.run(memory_storage.get_session_turns("s"))
+    header = asyncio.run(memory_storage.get_session_header("s"))
+    assert [t["_id"] for t in stored] == [t["_id"] for t in turns]
+    assert (header["turn_count"], header["message_count"], header["chain_head"]) == (3, 6, "head-2")
+    stats = queue.stats()
+    assert (stats["depth"], stats["written_turns"], stats["coalesced_updates"]) == (0, 3, 2)
+    assert not queue.has_pending("s")
+
+def test_turns_survive_an_unavailable_database(memory_storage):
+    async def main():
+        storage.set_storage(None)
+        queue = make_queue()
+        for n in range(2):
+            queue.enqueue(make_turn("s", n))
+        await queue.flush()
+        # Still queued, never dropped
+        assert queue.stats()["depth"] == 2
+        assert queue.stats()["last_error"] == "No database connection available"
+        queue.enqueue(make_turn("s", 2))
+
+        storage.set_storage(memory_storage)
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(main())
+    stored = asyncio.run(memory_storage.get_session_turns("s"))
+    assert [t["messages"][0]["content"] for t in stored] == ["q0", "q1", "q2"]
+    assert asyncio.run(memory_storage.get_session_header("s"))["turn_count"] == 3
+    assert queue.stats()["depth"] == 0
+
+def test_full_queue_refuses_new_turns_until_it_drains(memory_storage):
+    async def main():
+        queue = make_queue(max_depth=2)
+        for n in range(2):
+            assert queue.admit()
+            queue.enqueue(make_turn("s", n))
+        assert not queue.admit()
+        assert queue.stats()["rejected"] == 1
+
+        await queue.flush()
+        assert queue.admit()
+        await queue.stop()
+
+    asyncio.run(main())
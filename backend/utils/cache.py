@@ -0,0 +1,101 @@
+# Bounded in-process TTL cache, and an expiring set that never evicts early
+
+import time
+import threading
+from collections import OrderedDict
+
+class TTLCache:
+    """LRU cache whose entries also expire after ttl seconds (ttl <= 0 disables caching)"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hit_ratio": round(self._stats["hits"] / lookups, 3) if lookups else None,
+                **self._stats,
+            }
+
+class ExpiringSet:
+    """Set whose members expire ttl seconds after they were added.
+
+    Unlike TTLCache it has no size bound and ignores the cache settings, so a
+    member stays until it expires; expired members are pruned on add.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._expires = {}  # member -> monotonic expiry
+        self._lock = threading.Lock()
+
+    def add(self, member):
+        with self._lock:
+            now = time.monotonic()
+            for key in [key for key, expires_at in self._expires.items() if expires_at <= now]:
+                del self._expires[key]
+            self._expires[member] = now + self.ttl
+
+    def discard(self, member):
+        with self._lock:
+            self._expires.pop(member, None)
+
+    def __contains__(self, member):
+        with self._lock:
+            expires_at = self._expires.get(member)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._expires[member]
+                return False
+            return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._expires)
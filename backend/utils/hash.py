@@ -1,10 +1,22 @@
 # Password hashing utilities using bcrypt and data hashing using SHA256
 
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
 import hashlib
+import json
 
-# Password context with bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.core.config import settings
+
+# Password context with bcrypt; hashes made with another cost are flagged for rehashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Dedicated pool for bcrypt, which releases the GIL while hashing. Bounding it keeps a
+# login storm from occupying every thread of the default executor.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
 
 def hash_password(password: str) -> str:
     """Hash plaintext password using bcrypt"""
@@ -14,6 +26,20 @@ def verify_password(password: str, hashed: str) -> bool:
     """Verify plaintext password against hash"""
     return pwd_context.verify(password, hashed)
 
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, hash_password, password)
+
+async def verify_and_update_password(password: str, hashed: str):
+    """Verify a password on the password pool.
+
+    Returns (valid, new_hash); new_hash is set when the stored hash uses an
+    outdated bcrypt cost and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify_and_update, password, hashed)
+
 def hash_chat_details(data: str) -> str:
     """Hash chat details JSON string using SHA256 for integrity"""
     return hashlib.sha256(data.encode('utf-8')).hexdigest()
@@ -21,3 +47,57 @@ def hash_chat_details(data: str) -> str:
 def verify_chat_hash(plain_data: str, stored_hash: str) -> bool:
     """Verify if the plain data matches the stored hash"""
     return hash_chat_details(plain_data) == stored_hash
+
+# Chat integrity hash chain:
+#   chain_hash(turn) = SHA256(prev chain head + turn digest)
+# Each turn only hashes its own messages, so the cost per message is constant,
+# while changing, removing or reordering any stored turn breaks every later link.
+GENESIS_HASH = "0" * 64
+TURN_DIGEST_FIELDS = (
+    "_id", "session_id", "user_id", "messages", "classification",
+    "rag_context", "followup_questions", "created_at",
+)
+
+def _canonical(value):
+    # MongoDB stores datetimes with millisecond precision and without tzinfo
+    if isinstance(value, datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000, tzinfo=None).isoformat()
+    return str(value)
+
+def turn_digest(turn: dict) -> str:
+    """SHA256 of one turn's canonical content (stable across a MongoDB round trip)"""
+    content = {field: turn.get(field) for field in TURN_DIGEST_FIELDS}
+    return hash_chat_details(json.dumps(content, sort_keys=True, default=_canonical))
+
+def chain_hash(prev_hash: str, digest: str) -> str:
+    """Link a turn digest to the previous chain head"""
+    return hash_chat_details(prev_hash + digest)
+
+def verify_chain(turns: list, anchor: str = GENESIS_HASH) -> dict:
+    """Verify a run of consecutive turns, e.g. any prefix of a session.
+
+    anchor is the chain head before the first turn (GENESIS_HASH for a prefix).
+    Turns migrated from the legacy layout carry no link and start the chain.
+    """
+    head = anchor
+    verified = 0
+    for turn in turns:
+        turn_id = str(turn.get("_id"))
+        if "chain_hash" not in turn:
+            if turn.get("migrated_from_legacy") and verified == 0:
+                continue
+            return {"valid": False, "verified_turns": verified, "head": head,
+                    "broken_at": turn_id, "reason": "missing chain link"}
+        digest = turn_digest(turn)
+        if digest != turn.get("hashed_details"):
+            return {"valid": False, "verified_turns": verified, "head": head,
+                    "broken_at": turn_id, "reason": "turn content does not match its digest"}
+        if turn.get("prev_hash") != head:
+            return {"valid": False, "verified_turns": verified, "head": head,
+                    "broken_at": turn_id, "reason": "turn does not follow the previous chain head"}
+        if chain_hash(head, digest) != turn["chain_hash"]:
+            return {"valid": False, "verified_turns": verified, "head": head,
+                    "broken_at": turn_id, "reason": "chain hash mismatch"}
+        head = turn["chain_hash"]
+        verified += 1
+    return {"valid": True, "verified_turns": verified, "head": head, "broken_at": None, "reason": None}
@@ -0,0 +1,128 @@
+# PDF text extraction in a bounded set of worker processes
+#
+# Parsing is CPU-bound, so it runs in at most PDF_EXTRACT_WORKERS processes instead
+# of on the event loop or a UI thread. Each page has a time budget (SIGALRM inside
+# the worker); pages that exceed it, or fail to parse, are skipped and reported.
+# Opening the document gets the same budget. Every worker is its own single-process
+# executor, so a document that exceeds PDF_EXTRACT_TIMEOUT_SECONDS is stopped by
+# killing just its worker; the other extractions keep running.
+
+import time
+import signal
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class ParseTimeout(Exception):
+    """Opening the document exceeded its time budget"""
+
+class PageTimeout(BaseException):
+    """A page exceeded its extraction time budget (not an Exception, so parser code cannot swallow it)"""
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+def extract_pdf_pages(path: str, page_timeout: float) -> dict:
+    """Extract the text of each page (runs in a worker process)"""
+    from pypdf import PdfReader
+
+    use_alarm = page_timeout > 0 and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+    started = time.perf_counter()
+    # PdfReader parses the trailer and cross-reference table up front, which can hang on a crafted file
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, page_timeout)
+        reader = PdfReader(path)
+    except PageTimeout:
+        raise ParseTimeout(f"Opening the PDF took longer than {page_timeout}s")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    pages, skipped = [], []
+    for number, page in enumerate(reader.pages, start=1):
+        text = ""
+        try:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            text = page.extract_text() or ""
+        except PageTimeout:
+            skipped.append({"page": number, "reason": "timeout"})
+        except Exception as e:
+            skipped.append({"page": number, "reason": str(e)[:200]})
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        pages.append(text)
+    return {
+        "pages": pages,
+        "page_count": len(pages),
+        "skipped_pages": skipped,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+# Idle single-process executors, reused across requests; at most PDF_EXTRACT_WORKERS exist
+_idle: list[ProcessPoolExecutor] = []
+_slots: asyncio.Semaphore | None = None
+
+def _new_worker() -> ProcessPoolExecutor:
+    # Spawned workers do not inherit the server's threads or open connections
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+def _kill_worker(worker: ProcessPoolExecutor):
+    """Stop a worker that is still parsing; shutdown() alone waits for the running job"""
+    for process in list((getattr(worker, "_processes", None) or {}).values()):
+        process.kill()
+    worker.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_extract_pool():
+    while _idle:
+        _idle.pop().shutdown(wait=False, cancel_futures=True)
+
+async def extract_pdf(path) -> dict:
+    """Extract page texts from the PDF at path in a worker process.
+
+    Raises asyncio.TimeoutError when the whole document exceeds
+    PDF_EXTRACT_TIMEOUT_SECONDS (the worker is killed), and the parser's error
+    for unreadable files.
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.PDF_EXTRACT_WORKERS)
+    async with _slots:
+        worker = _idle.pop() if _idle else _new_worker()
+        healthy = False
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                worker, extract_pdf_pages, str(path), settings.PDF_PAGE_TIMEOUT_SECONDS
+            )
+            result = await asyncio.wait_for(future, timeout=settings.PDF_EXTRACT_TIMEOUT_SECONDS)
+            healthy = True
+        except asyncio.TimeoutError:
+            logger.error(f"PDF extraction exceeded {settings.PDF_EXTRACT_TIMEOUT_SECONDS}s, killing its worker")
+            raise
+        except BrokenProcessPool:
+            # The worker died (e.g. out of memory); the next request starts a fresh one
+            logger.error("PDF extraction worker crashed, replacing it")
+            raise
+        except Exception:
+            # The parser raised inside the worker; the process itself is fine
+            healthy = True
+            raise
+        finally:
+            if healthy:
+                _idle.append(worker)
+            else:
+                _kill_worker(worker)
+    if result["skipped_pages"]:
+        logger.warning(f"Skipped {len(result['skipped_pages'])} PDF page(s) during extraction: {result['skipped_pages']}")
+    return result
@@ -0,0 +1,77 @@
+# Server-held chat history for the delta chat protocol
+#
+# Stored turns only keep hashed message contents, so the plaintext history the
+# agents need lives here, in process memory, bounded by idle TTL and session count.
+# A client whose session is no longer held is asked to resend its full history.
+#
+# The head of each session's integrity chain is cached the same way, so a turn
+# can be linked without reading the session header; a miss re-reads the header.
+# Both are per process: with several workers a session has to stick to one of
+# them, or a worker holding an older head would fork the session's chain.
+
+from backend.core.config import settings
+from backend.utils.cache import TTLCache
+
+class SessionHistory:
+    """Plaintext messages of one session, split into identified turns"""
+
+    def __init__(self, messages=None):
+        self.messages = [dict(m) for m in (messages or [])]
+        self.turns = []  # (turn_id, index of the turn's first message)
+
+    def append_turn(self, turn_id: str, messages: list):
+        self.turns.append((turn_id, len(self.messages)))
+        self.messages.extend(dict(m) for m in messages)
+
+    def turns_after(self, turn_id: str | None):
+        """[(turn_id, messages)] following turn_id (all turns when turn_id is None)"""
+        start = 0
+        if turn_id is not None:
+            start = next((i + 1 for i, (known_id, _) in enumerate(self.turns) if known_id == turn_id), None)
+            if start is None:
+                return None
+        result = []
+        for i in range(start, len(self.turns)):
+            turn_id_i, first = self.turns[i]
+            last = self.turns[i + 1][1] if i + 1 < len(self.turns) else len(self.messages)
+            result.append((turn_id_i, self.messages[first:last]))
+        return result
+
+class SessionHistoryStore:
+    """Session id -> SessionHistory with idle expiry"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, session_id: str):
+        history = self._sessions.get(session_id)
+        if history is not None:
+            # Refresh the idle timer on access
+            self._sessions.set(session_id, history)
+        return history
+
+    def reset(self, session_id: str, messages=None) -> SessionHistory:
+        """Start the session over from a client-supplied history"""
+        history = SessionHistory(messages)
+        self._sessions.set(session_id, history)
+        return history
+
+    def drop(self, session_id: str):
+        self._sessions.invalidate(session_id)
+
+    def stats(self) -> dict:
+        return self._sessions.stats()
+
+# Global store instance
+session_histories = SessionHistoryStore(
+    maxsize=settings.CHAT_SESSION_MAX_ENTRIES,
+    ttl=settings.CHAT_SESSION_TTL_SECONDS,
+)
+
+# Session id -> chain_head of its newest turn
+chain_heads = TTLCache(maxsize=settings.CHAT_SESSION_MAX_ENTRIES, ttl=settings.CHAT_SESSION_TTL_SECONDS)
+
+def forget_session(session_id: str):
+    """Drop what this process holds for a session (cleared, archived or deleted)"""
+    session_histories.drop(session_id)
+    chain_heads.invalidate(session_id)
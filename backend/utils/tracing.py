@@ -0,0 +1,86 @@
+# Per-stage latency instrumentation
+#
+# Each stage of a request (classification, retrieval, solution, follow-up,
+# hashing, persistence, ...) runs inside span(stage):
+# - Its duration is observed in the mediconnect_stage_duration_seconds
+#   Prometheus histogram, served on /metrics (p95 per stage via histogram_quantile)
+# - Stages that raise are counted in mediconnect_stage_errors_total
+# - When configure_tracing() was given an OTLP endpoint and OpenTelemetry is
+#   installed, the same stages are exported as nested trace spans
+#
+# Settings are passed in by the caller so the agents can import this module
+# without the backend configuration.
+
+import time
+import logging
+from contextlib import contextmanager, nullcontext
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+except ImportError:
+    trace = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# LLM stages take seconds, hashing and local parsing take well under a millisecond
+STAGE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+STAGE_DURATION = Histogram(
+    "mediconnect_stage_duration_seconds",
+    "Duration of one request stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "mediconnect_stage_errors_total",
+    "Request stages that raised",
+    ["stage"],
+)
+
+_tracer = None
+_provider = None
+
+def configure_tracing(endpoint: str, service_name: str) -> bool:
+    """Export spans over OTLP/HTTP to endpoint; returns whether tracing is active"""
+    global _tracer, _provider
+    if not endpoint:
+        return False
+    if trace is None:
+        logger.warning("OTEL_TRACES_ENDPOINT is set but OpenTelemetry is not installed; only /metrics is served")
+        return False
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    _tracer = _provider.get_tracer(__name__)
+    logger.info(f"Exporting trace spans to {endpoint}")
+    return True
+
+def shutdown_tracing():
+    """Flush spans still buffered for export"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+@contextmanager
+def span(stage: str):
+    """Time one stage into the stage histogram (and a trace span when tracing is on)"""
+    started = time.perf_counter()
+    try:
+        with _tracer.start_as_current_span(stage) if _tracer is not None else nullcontext():
+            yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+def metrics_payload():
+    """(body, content type) of the Prometheus text exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
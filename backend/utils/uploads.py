@@ -0,0 +1,38 @@
+# Streaming upload helpers: hash and size-check uploads in the same pass that writes them to disk
+
+import hashlib
+import os
+from pathlib import Path
+from fastapi import HTTPException, UploadFile
+from starlette.status import HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+# Read uploads in 1 MiB chunks
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def stream_upload_to_disk(upload: UploadFile, dest_path: Path, max_bytes: int) -> tuple[str, int]:
+    """Write upload to dest_path chunk by chunk and return (sha256 hex digest, size in bytes).
+
+    Raises HTTP 413 and removes the partial file as soon as max_bytes is exceeded.
+    """
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as buffer:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                    )
+                h.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        # Never leave a partial upload behind
+        if os.path.exists(dest_path):
+            os.unlink(dest_path)
+        raise
+    return h.hexdigest(), size
@@ -0,0 +1,118 @@
+# LLM token and cost accounting
+#
+# Every LLM call of the agents reports its prompt and completion tokens here:
+# - Totals per agent are counted in Prometheus (mediconnect_llm_tokens_total,
+#   mediconnect_llm_cost_usd_total, mediconnect_llm_calls_total) on /metrics
+# - Calls made inside track_usage() are also added to that request's
+#   UsageRecorder, which the chat routes return and persist per user and day
+#
+# Like tracing.py this module needs no backend configuration, so the agents can
+# import it directly.
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# USD per million (prompt, completion) tokens; models not listed are counted at 0
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+LLM_TOKENS = Counter("mediconnect_llm_tokens_total", "LLM tokens used", ["agent", "kind"])
+LLM_COST = Counter("mediconnect_llm_cost_usd_total", "Estimated LLM cost in USD", ["agent"])
+LLM_CALLS = Counter("mediconnect_llm_calls_total", "LLM calls made", ["agent"])
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def _empty() -> dict:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "llm_calls": 0, "cost_usd": 0.0}
+
+class UsageRecorder:
+    """Token usage of one request, per agent and in total"""
+
+    def __init__(self):
+        self._agents = {}
+        # Map-step summaries record from worker threads
+        self._lock = threading.Lock()
+
+    def add(self, agent: str, prompt_tokens: int, completion_tokens: int, calls: int, cost: float):
+        with self._lock:
+            entry = self._agents.setdefault(agent, _empty())
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["total_tokens"] += prompt_tokens + completion_tokens
+            entry["llm_calls"] += calls
+            entry["cost_usd"] += cost
+
+    def summary(self) -> dict:
+        """{"prompt_tokens", "completion_tokens", "total_tokens", "llm_calls", "cost_usd", "agents": {...}}"""
+        with self._lock:
+            agents = {name: dict(entry) for name, entry in self._agents.items()}
+        total = _empty()
+        for entry in agents.values():
+            for field in total:
+                total[field] += entry[field]
+            entry["cost_usd"] = round(entry["cost_usd"], 6)
+        total["cost_usd"] = round(total["cost_usd"], 6)
+        return {**total, "agents": agents}
+
+_current: ContextVar[UsageRecorder | None] = ContextVar("llm_usage", default=None)
+
+@contextmanager
+def track_usage():
+    """Collect the usage of LLM calls made in this context (and contexts copied from it)"""
+    recorder = UsageRecorder()
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+def record_usage(agent: str, prompt_tokens: int, completion_tokens: int, calls: int = 1, model: str = DEFAULT_MODEL):
+    """Account for one or more LLM calls of an agent"""
+    if calls <= 0 and not prompt_tokens and not completion_tokens:
+        return
+    cost = cost_usd(model, prompt_tokens, completion_tokens)
+    LLM_TOKENS.labels(agent, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(agent, "completion").inc(completion_tokens)
+    LLM_COST.labels(agent).inc(cost)
+    LLM_CALLS.labels(agent).inc(calls)
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(agent, prompt_tokens, completion_tokens, calls, cost)
+
+def record_message_usage(agent: str, message, model: str = DEFAULT_MODEL):
+    """Usage of a LangChain chat model response (llm.invoke)"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        record_usage(agent, usage.get("input_tokens", 0), usage.get("output_tokens", 0), model=model)
+        return
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    record_usage(agent, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), model=model)
+
+def record_crew_usage(agent: str, crew, output, model: str = DEFAULT_MODEL):
+    """Usage of one crew.kickoff(), from its output's token_usage
+
+    CrewAI counts tokens per agent over the crew's lifetime, so the crew must be
+    used for this one kickoff only (crew.copy() per call, like kickoff_for_each);
+    with a shared crew, overlapping requests would be charged each other's tokens.
+    """
+    metrics = getattr(output, "token_usage", None) or getattr(crew, "usage_metrics", None)
+    if metrics is None:
+        return
+    if not isinstance(metrics, dict):
+        metrics = metrics.model_dump() if hasattr(metrics, "model_dump") else vars(metrics)
+    record_usage(
+        agent,
+        metrics.get("prompt_tokens", 0),
+        metrics.get("completion_tokens", 0),
+        metrics.get("successful_requests", 0),
+        model=model,
+    )
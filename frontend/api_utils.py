@@ -62,6 +62,7 @@ def clear_auth_session():
     """Clear authentication data from session"""
     st.session_state.token = None
     st.session_state.user = None
+    st.session_state.last_turn_id = None
 
 def clear_admin_session():
     st.session_state.admin_token = None
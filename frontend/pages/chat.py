@@ -1,14 +1,9 @@
 import streamlit as st
 import sys
 import os
-import io
+import json
 import uuid
 
-try:
-    import pdfplumber  # Prefer pdfplumber for robust text extraction
-except Exception:  # Fallback if not available; Streamlit will surface error on use
-    pdfplumber = None
-
 # Add frontend directory to path
 frontend_dir = os.path.join(os.path.dirname(__file__), '..')
 sys.path.insert(0, frontend_dir)
@@ -363,59 +358,45 @@ def chat_page():
                     st.markdown("**Upload PDF**")
                     uploaded_file_inline = st.file_uploader("Select a PDF", type=["pdf"], accept_multiple_files=False, key="pdf_uploader_inline")
                     if uploaded_file_inline is not None:
-                        if pdfplumber is None:
-                            st.error("pdfplumber not installed. Please install it to process PDFs.")
-                        else:
-                            if st.button("Summarize", key="summarize_pdf_inline"):
-                                try:
-                                    with st.spinner("Summarizing PDF..."):
-                                        # Extract text
-                                        file_bytes = uploaded_file_inline.read()
-                                        extracted_text_parts_inline = []
-                                        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                                            for page in pdf.pages:
-                                                page_text = page.extract_text() or ""
-                                                if page_text.strip():
-                                                    extracted_text_parts_inline.append(page_text)
-                                        extracted_text_inline = "\n\n".join(extracted_text_parts_inline).strip()
-
-                                        if not extracted_text_inline:
-                                            st.warning("No extractable text found in the PDF.")
-                                        else:
-                                            from api_utils import make_api_request, get_auth_headers
-                                            chat_history_inline = [
-                                                {"role": msg["role"], "content": msg["content"]}
-                                                for msg in st.session_state.get("messages", [])
-                                            ]
-                                            data_inline = {
-                                                "document_content": extracted_text_inline,
-                                                "document_type": "text",
-                                                "chat_history": chat_history_inline
-                                            }
-                                            headers_inline = get_auth_headers()
-                                            success_inline, response_data_inline, error_inline = make_api_request(
-                                                "/api/chat/document",
-                                                method="POST",
-                                                data=data_inline,
-                                                headers=headers_inline,
-                                                timeout=120
-                                            )
-                                            if success_inline and response_data_inline:
-                                                document_summary_inline = response_data_inline.get("rag_context") or "No summary returned."
-                                                assistant_response_inline = response_data_inline.get("response", "")
+                        if st.button("Summarize", key="summarize_pdf_inline"):
+                            try:
+                                with st.spinner("Summarizing PDF..."):
+                                    # The backend streams the upload and extracts the text in its worker pool
+                                    from api_utils import post_multipart, get_auth_headers
+                                    chat_history_inline = [
+                                        {"role": msg["role"], "content": msg["content"]}
+                                        for msg in st.session_state.get("messages", [])
+                                    ]
+                                    files_inline = {
+                                        "file": (uploaded_file_inline.name, uploaded_file_inline.getvalue(), "application/pdf")
+                                    }
+                                    data_inline = {"chat_history": json.dumps(chat_history_inline)}
+                                    headers_inline = get_auth_headers()
+                                    success_inline, response_data_inline, error_inline = post_multipart(
+                                        "/api/chat/document/upload",
+                                        files=files_inline,
+                                        data=data_inline,
+                                        headers=headers_inline,
+                                        timeout=180
+                                    )
+                                    if success_inline and response_data_inline:
+                                        document_summary_inline = response_data_inline.get("rag_context") or "No summary returned."
+                                        assistant_response_inline = response_data_inline.get("response", "")
 
-                                                if "messages" not in st.session_state:
-                                                    st.session_state.messages = []
-                                                st.session_state.messages.append({"role": "assistant", "content": f"Here is the summary of your PDF:\n\n{document_summary_inline}"})
-                                                if assistant_response_inline:
-                                                    st.session_state.messages.append({"role": "assistant", "content": assistant_response_inline})
+                                        if "messages" not in st.session_state:
+                                            st.session_state.messages = []
+                                        st.session_state.messages.append({"role": "assistant", "content": f"Here is the summary of your PDF:\n\n{document_summary_inline}"})
+                                        # The displayed history now differs from the backend's; resync on the next message
+                                        st.session_state.last_turn_id = None
+                                        if assistant_response_inline:
+                                            st.session_state.messages.append({"role": "assistant", "content": assistant_response_inline})
 
-                                                st.success("PDF summarized successfully.")
-                                                st.rerun()
-                                            else:
-                                                st.error(f"Failed to summarize PDF: {error_inline}")
-                                except Exception as e:
-                                    st.error(f"Error processing PDF: {str(e)}")
+                                        st.success("PDF summarized successfully.")
+                                        st.rerun()
+                                    else:
+                                        st.error(f"Failed to summarize PDF: {error_inline}")
+                            except Exception as e:
+                                st.error(f"Error processing PDF: {str(e)}")
             
             with input_col:
                 # Chat input
@@ -438,11 +419,13 @@ def chat_page():
                             for msg in st.session_state.messages[:-1]  # Exclude current user message
                         ]
                         
-                        # Prepare request data
-                        data = {
-                            "message": prompt,
-                            "chat_history": chat_history
-                        }
+                        # Prepare request data: the backend holds the conversation, so only
+                        # the new message and the last turn id are sent once it has one
+                        data = {"message": prompt, "delta": True}
+                        if st.session_state.get("last_turn_id") and chat_history:
+                            data["last_turn_id"] = st.session_state.last_turn_id
+                        else:
+                            data["chat_history"] = chat_history
                         
                         # Make API request with increased timeout
                         headers = get_auth_headers()
@@ -454,7 +437,19 @@ def chat_page():
                             timeout=60
                         )
                         
+                        # The backend lost the conversation (e.g. restart): resend the full history
+                        if not success and error == "history_resync_required":
+                            data = {"message": prompt, "delta": True, "chat_history": chat_history}
+                            success, response_data, error = make_api_request(
+                                "/api/chat/message",
+                                method="POST",
+                                data=data,
+                                headers=headers,
+                                timeout=60
+                            )
+                        
                         if success:
+                            st.session_state.last_turn_id = response_data.get("turn_id")
                             assistant_response = response_data.get("response", "No response from assistant")
                         else:
                             assistant_response = f"Sorry, I encountered an error: {error}. Please try again."